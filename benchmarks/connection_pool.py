@@ -0,0 +1,78 @@
+"""
+Compares one session per request with the shared pooled session of :class:`ClientManager`.
+Run from the repository root with: python -m benchmarks.connection_pool [image_count]
+"""
+import asyncio
+import sys
+import time
+import tomllib
+
+import aiohttp
+
+from benchmarks.mock_bing_server import MockBingServer
+from utilities.client_manager import ClientManager
+from utilities.config import Config
+from utilities.network_utility import NetworkUtility
+
+
+def create_connection_counter(counter: dict) -> aiohttp.TraceConfig:
+    """
+    Creates a trace config counting newly opened connections, i.e. handshakes.
+    :param counter: Dictionary to increment the 'connections' key of.
+    :return: The trace config.
+    """
+    async def on_connection_create_end(_session, _context, _params):
+        counter['connections'] += 1
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+
+async def fetch_with_session_per_request(urls: list, counter: dict) -> None:
+    async def fetch(url):
+        async with aiohttp.ClientSession(trace_configs=[create_connection_counter(counter)]) as session:
+            async with NetworkUtility.create_retry_client(session).get(url) as response:
+                await response.read()
+
+    semaphore = asyncio.Semaphore(ClientManager().connection_limit)
+
+    async def bounded_fetch(url):
+        async with semaphore:
+            await fetch(url)
+
+    await asyncio.gather(*[bounded_fetch(url) for url in urls])
+
+
+async def fetch_with_shared_session(urls: list, counter: dict) -> None:
+    async def fetch(url):
+        async with ClientManager().create_retry_client().get(url) as response:
+            await response.read()
+
+    ClientManager().add_trace_config(create_connection_counter(counter))
+    async with ClientManager():
+        await asyncio.gather(*[fetch(url) for url in urls])
+
+
+async def main(image_count: int) -> None:
+    server = MockBingServer()
+    await server.start()
+    urls = [f"{server.base_url}/th/id/OIG.{index}" for index in range(image_count)]
+    try:
+        for name, benchmark in [('session per request', fetch_with_session_per_request),
+                                ('shared session', fetch_with_shared_session)]:
+            counter = {'connections': 0}
+            start = time.perf_counter()
+            await benchmark(urls, counter)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>20}: {image_count} images, {counter['connections']} connections opened, "
+                  f"{elapsed:.2f} seconds")
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    # The retry policy and the rate limits are read from the config.
+    with open('config.toml', 'rb') as config_file:
+        Config(tomllib.load(config_file))
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,61 @@
+"""
+Compares the event loop lag while the per-image CPU work runs inline on the event loop, in a thread pool or in a
+process pool. Each image formats its file name and adds the EXIF metadata to the head of a JPEG, like a download does.
+Run from the repository root with: python -m benchmarks.cpu_offload [image_count]
+"""
+import asyncio
+import sys
+import time
+import tomllib
+
+from benchmarks.mock_bing_server import MockBingServer
+from utilities.config import Config
+from utilities.cpu_executor import CpuExecutor
+from utilities.image_utility import ImageUtility
+from utilities.loop_lag_monitor import LoopLagMonitor
+
+CONCURRENCY = 32
+
+
+async def process_images(image_count: int, image_head: bytes) -> dict:
+    """
+    Processes the images like the download workers and measures the event loop lag meanwhile.
+    :param image_count: The number of images.
+    :param image_head: The JPEG that is processed for every image.
+    :return: Dictionary containing the statistics of the :class:`LoopLagMonitor`.
+    """
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def process_image(index: int) -> None:
+        async with semaphore:
+            # Stands in for the network I/O between the steps of a download.
+            await asyncio.sleep(0.001)
+            await CpuExecutor().run(ImageUtility.format_file_name, 'a cute cat sitting on a windowsill',
+                                    '2023-11-11T1512Z', str(index).zfill(4), Config().filename_pattern, True)
+            await asyncio.sleep(0.001)
+            await CpuExecutor().run(ImageUtility.process_image_head, image_head, {'prompt': f"a cute cat {index}"})
+
+    async with LoopLagMonitor() as monitor:
+        await asyncio.gather(*[process_image(index) for index in range(image_count)])
+    await asyncio.to_thread(CpuExecutor().shutdown)
+    return monitor.statistics()
+
+
+def main(image_count: int) -> None:
+    with open('config.toml', 'rb') as config_file:
+        config = tomllib.load(config_file)
+    Config(config)
+    image_head = MockBingServer.create_jpeg(1024, 1024)
+    print(f"{image_count} images with a head of {len(image_head) / 1024:.0f} KiB")
+    for executor in ['inline', 'thread', 'process']:
+        # The config singleton keeps the dictionary, so changing it switches the executor of the next run.
+        config['performance']['cpu_executor'] = executor
+        start = time.perf_counter()
+        statistics = asyncio.run(process_images(image_count, image_head))
+        elapsed = time.perf_counter() - start
+        print(f"{executor:>7}: {elapsed:.2f} s, event loop lag mean {statistics['mean_ms']:.1f} ms, "
+              f"max {statistics['max_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
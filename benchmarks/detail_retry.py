@@ -0,0 +1,94 @@
+"""
+Compares the number of detail API requests when every retry round fetches all images again with only retrying the
+images that failed. The detail API of the local mock server answers the first request of a given share of the image
+sets without data.
+Run from the repository root with: python -m benchmarks.detail_retry [image_count] [failure_rate]
+"""
+import asyncio
+import random
+import sys
+import time
+import tomllib
+
+from benchmarks.mock_bing_server import MockBingServer
+from strategies.image_source.file_image_source_strategy import FileImageSourceStrategy
+from utilities.client_manager import ClientManager
+from utilities.config import Config
+from utilities.rate_limiter import RateLimiter
+from utilities.request_coalescer import RequestCoalescer
+
+ATTEMPTS = 5
+
+
+async def retry_all(image_id_list: list) -> int:
+    """
+    The previous approach: gather all images again on every round and merge the results.
+    :return: Number of images with data.
+    """
+    async def gather_all() -> list:
+        # A new coalescer per round, as every round requested all images again.
+        coalescer = RequestCoalescer()
+        return await asyncio.gather(*[
+            FileImageSourceStrategy.get_image_data(image_ids, coalescer, index)
+            for index, image_ids in enumerate(image_id_list)
+        ])
+
+    current_images = await gather_all()
+    attempts_made = 1
+    while None in current_images and attempts_made < ATTEMPTS:
+        new_images = await gather_all()
+        current_images = [current if current is not None else new for current, new in zip(current_images, new_images)]
+        attempts_made += 1
+    return len([image for image in current_images if image is not None])
+
+
+async def retry_failed(image_id_list: list) -> int:
+    """
+    The current approach: only the failed images are requested again.
+    :return: Number of images with data.
+    """
+    images = [
+        image
+        async for image
+        in FileImageSourceStrategy.iter_image_data_retry(image_id_list, RequestCoalescer(), ATTEMPTS)
+    ]
+    return len(images)
+
+
+async def main(image_count: int, failure_rate: float) -> None:
+    with open('config.toml', 'rb') as config_file:
+        config = tomllib.load(config_file)
+    Config(config)
+    config['cache']['use_metadata_cache'] = False
+    # Keeps the benchmark about request counts instead of waiting for the backoff and the rate limit.
+    config['rate_limit']['detail_per_second'] = 0
+    FileImageSourceStrategy.RETRY_BACKOFF_BASE = 0.01
+    server = MockBingServer()
+    await server.start()
+    config['network']['base_url'] = server.base_url
+    server.create_catalog(image_count)
+    image_id_list = [{'image_set_id': image['image_set_id'], 'image_id': image['image_id']}
+                     for image in server.collections[0]['images']]
+    image_set_ids = sorted({image_ids['image_set_id'] for image_ids in image_id_list})
+    failing_set_ids = random.Random(0).sample(image_set_ids, int(len(image_set_ids) * failure_rate))
+    print(f"{image_count} images in {len(image_set_ids)} sets, "
+          f"{len(failing_set_ids)} sets fail on their first attempt")
+    try:
+        for name, benchmark in [('retry all', retry_all), ('retry failed', retry_failed)]:
+            server.failing_detail_requests.clear()
+            server.fail_detail_requests(failing_set_ids)
+            server.reset_counts()
+            RateLimiter().reset()
+            start = time.perf_counter()
+            async with ClientManager():
+                image_count_with_data = await benchmark(image_id_list)
+            elapsed = time.perf_counter() - start
+            print(f"{name:>12}: {server.request_counts['detail']} requests, "
+                  f"{image_count_with_data} images with data in {elapsed:.2f} s")
+    finally:
+        await server.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+                     float(sys.argv[2]) if len(sys.argv) > 2 else 0.01))
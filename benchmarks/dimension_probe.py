@@ -0,0 +1,38 @@
+"""
+Compares reading the image width from the first 64 KiB with the header probe against opening the whole image with PIL.
+Run from the repository root with: python -m benchmarks.dimension_probe [iterations]
+"""
+import sys
+import timeit
+from io import BytesIO
+
+from PIL import Image as PIL_Image
+
+from utilities.dimension_probe import DimensionProbe
+
+
+def create_image(image_format: str) -> bytes:
+    buffered = BytesIO()
+    PIL_Image.effect_noise((1024, 1024), 40).convert('RGB').save(buffered, format=image_format)
+    return buffered.getvalue()
+
+
+def open_with_pil(image_bytes: bytes) -> int:
+    with PIL_Image.open(BytesIO(image_bytes)) as pil_image:
+        return pil_image.width
+
+
+def probe_head(image_bytes: bytes) -> int:
+    return DimensionProbe.probe(image_bytes[:64 * 1024])[0]
+
+
+def main(iterations: int) -> None:
+    for image_format in ['JPEG', 'PNG', 'WEBP']:
+        image_bytes = create_image(image_format)
+        for name, function in [('PIL', open_with_pil), ('probe', probe_head)]:
+            elapsed = timeit.timeit(lambda: function(image_bytes), number=iterations)
+            print(f"{image_format:>5} {name:>6}: {elapsed / iterations * 1_000_000:.2f} µs per image")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
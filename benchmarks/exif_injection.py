@@ -0,0 +1,71 @@
+"""
+Compares adding the EXIF metadata by rewriting the saved JPEG with splicing it into the bytes before the single write.
+Run from the repository root with: python -m benchmarks.exif_injection [image_count]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import piexif
+from PIL import Image as PIL_Image
+
+from utilities.image_utility import ImageUtility
+
+USER_COMMENT = {
+    'prompt': 'a cute cat sitting on a windowsill, digital art',
+    'image_url': 'https://th.bing.com/th/id/OIG.abcdefghijklmnopqrstuvwxyz',
+    'creation_date': '2023-11-11T1512Z'
+}
+
+
+def create_image() -> bytes:
+    buffered = BytesIO()
+    PIL_Image.effect_noise((1024, 1024), 40).convert('RGB').save(buffered, format='JPEG', quality=95)
+    return buffered.getvalue()
+
+
+def rewrite_on_disk(image_bytes: bytes, file_name: str) -> int:
+    """
+    The previous approach: write the image, read it again, and let piexif rewrite the whole file.
+    :return: Number of bytes written.
+    """
+    with open(file_name, 'wb') as f:
+        f.write(image_bytes)
+    with open(file_name, 'rb') as f:
+        exif_dict = piexif.load(f.read())
+    exif_dict['Exif'][piexif.ExifIFD.UserComment] = json.dumps(USER_COMMENT, ensure_ascii=False).encode('utf-8')
+    exif_dict['0th'][piexif.ImageIFD.XPComment] = json.dumps(USER_COMMENT, ensure_ascii=False).encode('utf-16le')
+    piexif.insert(piexif.dump(exif_dict), file_name)
+    return len(image_bytes) + os.path.getsize(file_name)
+
+
+def splice_in_memory(image_bytes: bytes, file_name: str) -> int:
+    """
+    The current approach: splice the metadata into the bytes and write the image once.
+    :return: Number of bytes written.
+    """
+    output = ImageUtility.insert_exif_metadata(image_bytes, USER_COMMENT)
+    with open(file_name, 'wb') as f:
+        f.write(output)
+    return len(output)
+
+
+def main(image_count: int) -> None:
+    image_bytes = create_image()
+    print(f"Image size: {len(image_bytes) / 1024:.0f} KiB, {image_count} images")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, benchmark in [('rewrite on disk', rewrite_on_disk), ('splice in memory', splice_in_memory)]:
+            bytes_written = 0
+            start = time.perf_counter()
+            for index in range(image_count):
+                bytes_written += benchmark(image_bytes, os.path.join(temp_dir, f"{index}.jpg"))
+            elapsed = time.perf_counter() - start
+            print(f"{name:>17}: {elapsed / image_count * 1000:.2f} ms and "
+                  f"{bytes_written / image_count / 1024:.0f} KiB written per image")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
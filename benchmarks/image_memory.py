@@ -0,0 +1,120 @@
+"""
+Compares the memory of a large catalog held as the previous plain dataclass with the current slots based Image.
+The collections are paged like the collection API returns them, so every page brings its own copy of the strings.
+Run from the repository root with: python -m benchmarks.image_memory [image_count]
+"""
+import json
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from models.image import Image
+
+COLLECTION_COUNT = 20
+PAGE_SIZE = 1000
+
+
+@dataclass
+class LegacyImage:
+    """
+    The previous representation of an image.
+    """
+    image_urls: List[Tuple[int, str]]
+    index: str
+    prompt: str
+    page_url: str
+    collection_name: str = 'Collection'
+    collection_id: str = None
+    date_modified: str = None
+    creation_date: str = None
+    used_image_url: str = None
+    file_name: str = None
+    is_thumbnail: bool = False
+    is_success: bool = False
+    status_code: int = None
+    reason: str = None
+    attempts: int = 0
+
+
+def create_pages(image_count: int) -> List[dict]:
+    """
+    Creates the pages of a synthetic catalog, each parsed from its own JSON like a response of the collection API.
+    :param image_count: The total number of images.
+    :return: The parsed pages.
+    """
+    pages = []
+    for start in range(0, image_count, PAGE_SIZE):
+        collection_index = start // PAGE_SIZE % COLLECTION_COUNT
+        page = {
+            'id': f"{collection_index:032x}",
+            'title': f"Collection {collection_index}",
+            'items': [{
+                'MediaUrl': f"https://th.bing.com/th/id/OIG.{index:024x}",
+                'thumbnailUrl': f"https://th.bing.com/th/id/OIG.{index:024x}?w=270&h=270",
+                'contentUrl': f"https://th.bing.com/th/id/OIG2.{index:024x}",
+                'detailThumbnailUrl': f"https://th.bing.com/th/id/OIG2.{index:024x}?pid=ImgGn",
+                'PageUrl': f"https://www.bing.com/images/create/a-cute-cat/1-{index:032x}?id={index:024x}",
+                'ToolTip': f"a cute cat sitting on a windowsill, digital art {index // 4}",
+                'dateModified': '2023-11-11T15:12:00.0000000Z'
+            } for index in range(start, min(start + PAGE_SIZE, image_count))]
+        }
+        pages.append(json.loads(json.dumps(page)))
+    return pages
+
+
+def create_legacy_images(pages: List[dict]) -> list:
+    images = []
+    for page in pages:
+        for item in page['items']:
+            image_urls = [(1, item['MediaUrl']), (3, item['thumbnailUrl'])]
+            image_urls.append((2, item['contentUrl']))
+            image_urls.append((4, item['detailThumbnailUrl']))
+            image_urls = sorted(image_urls, key=lambda url: url[0])
+            images.append(LegacyImage(
+                image_urls=image_urls,
+                index=str(len(images) + 1).zfill(4),
+                prompt=item['ToolTip'],
+                page_url=item['PageUrl'],
+                collection_name=f"{page['title']}",
+                collection_id=f"{page['id']}",
+                date_modified=item['dateModified']
+            ))
+    return images
+
+
+def create_images(pages: List[dict]) -> list:
+    images = []
+    for page in pages:
+        for item in page['items']:
+            image = Image(
+                index=str(len(images) + 1).zfill(4),
+                prompt=item['ToolTip'],
+                page_url=item['PageUrl'],
+                collection_name=f"{page['title']}",
+                collection_id=f"{page['id']}",
+                date_modified=item['dateModified']
+            )
+            image.add_image_url(1, item['MediaUrl'])
+            image.add_image_url(3, item['thumbnailUrl'])
+            image.add_image_url(2, item['contentUrl'])
+            image.add_image_url(4, item['detailThumbnailUrl'])
+            images.append(image)
+    return images
+
+
+def main(image_count: int) -> None:
+    pages = create_pages(image_count)
+    print(f"{image_count} images in {COLLECTION_COUNT} collections")
+    for name, create in [('dataclass', create_legacy_images), ('slots', create_images)]:
+        tracemalloc.start()
+        images = create(pages)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>9}: {size / 1024 / 1024:.1f} MiB, {size / len(images):.0f} bytes per image "
+              f"(without the strings shared with the parsed pages)")
+        del images
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
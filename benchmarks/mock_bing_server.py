@@ -0,0 +1,271 @@
+import asyncio
+import json
+import random
+import re
+import struct
+from collections import Counter
+from io import BytesIO
+from typing import Dict, Iterable, List, Set
+
+from PIL import Image as PIL_Image
+from aiohttp import web
+
+
+class MockBingServer:
+    """
+    Local stand-in for the Bing hosts, used to run benchmarks without network access or a cookie.
+    It serves a synthetic catalog through the collection, detail, delete and add APIs and its images through the CDN.
+    Latency, server errors, missing images and truncated bodies can be injected to benchmark the failure handling.
+    """
+    IMAGES_PER_SET = 4
+    THUMBNAIL_SIZE = 270
+    DATE = '2023-11-11T15:12:00.0000000Z'
+
+    def __init__(
+            self,
+            image_width: int = 1024,
+            image_height: int = 1024,
+            latency: float = 0.0,
+            error_rate: float = 0.0,
+            not_found_rate: float = 0.0,
+            truncate_rate: float = 0.0,
+            seed: int = 0):
+        """
+        :param image_width: Width of the served images in pixels.
+        :param image_height: Height of the served images in pixels.
+        :param latency: Seconds every request is delayed by.
+        :param error_rate: Share of all requests that are answered with 503 Service Unavailable.
+        :param not_found_rate: Share of the images of the catalog whose URLs are answered with 404 Not Found.
+        :param truncate_rate: Share of the image responses whose body is cut off in the middle.
+        :param seed: Seed of the random decisions, so runs are repeatable.
+        """
+        self.image_bytes = MockBingServer.create_jpeg(image_width, image_height)
+        self.thumbnail_bytes = MockBingServer.create_jpeg(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.not_found_rate = not_found_rate
+        self.truncate_rate = truncate_rate
+        self.__random = random.Random(seed)
+        self.collections: List[dict] = []
+        self.__image_sets: Dict[str, List[dict]] = {}
+        self.not_found_image_ids: Set[str] = set()
+        # Maps image set ids to the number of their upcoming detail requests that are answered without data.
+        self.failing_detail_requests: Counter = Counter()
+        self.deleted_collection_ids: List[str] = []
+        self.added_items: List[dict] = []
+        # Requests of the image CDN, kept separately as the first benchmarks only used the CDN.
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.request_counts: Counter = Counter()
+        self.__runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @staticmethod
+    def create_jpeg(width: int, height: int) -> bytes:
+        """
+        Creates a JPEG image in memory.
+        :param width: Width of the image in pixels.
+        :param height: Height of the image in pixels.
+        :return: The encoded JPEG.
+        """
+        buffered = BytesIO()
+        PIL_Image.new('RGB', (width, height), color=(40, 90, 160)).save(buffered, format='JPEG')
+        return buffered.getvalue()
+
+    def create_catalog(self, image_count: int, collection_count: int = 1) -> None:
+        """
+        Replaces the catalog with the given number of images, spread evenly over the collections.
+        The images are grouped in sets like the images of one prompt, which share a detail API response.
+        :param image_count: The total number of images.
+        :param collection_count: The number of collections.
+        :return: None
+        """
+        self.collections = [{
+            'id': f"{collection_index:032x}",
+            'title': 'Saved Images' if collection_index == 0 else f"Collection {collection_index}",
+            'images': []
+        } for collection_index in range(collection_count)]
+        self.not_found_image_ids = set()
+        self.__image_sets = {}
+        for index in range(image_count):
+            set_index = index // self.IMAGES_PER_SET
+            image = {
+                'image_id': f"OIG.{index:024x}",
+                'image_set_id': f"{set_index:032x}",
+                'prompt': f"a cute cat sitting on a windowsill, digital art {set_index}"
+            }
+            self.collections[index * collection_count // image_count]['images'].append(image)
+            self.__image_sets.setdefault(image['image_set_id'], []).append(image)
+            if self.__random.random() < self.not_found_rate:
+                self.not_found_image_ids.add(image['image_id'])
+
+    def fail_detail_requests(self, image_set_ids: Iterable[str], times: int = 1) -> None:
+        """
+        Answers the next detail requests of the image sets without data, like the detail API sometimes does.
+        :param image_set_ids: The ids of the image sets whose requests fail.
+        :param times: How many requests of each image set fail.
+        :return: None
+        """
+        for image_set_id in image_set_ids:
+            self.failing_detail_requests[image_set_id] += times
+
+    def reset_counts(self) -> None:
+        """
+        Resets the request counts, e.g. between benchmark runs.
+        :return: None
+        """
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.request_counts.clear()
+
+    async def start(self, port: int = 0) -> None:
+        """
+        Starts the server on a local port.
+        :param port: The port to listen on. By default a free port is chosen.
+        :return: None
+        """
+        app = web.Application(middlewares=[self.__inject_faults])
+        app.router.add_post('/mysaves/collections/get', self.__handle_collections, name='collections')
+        app.router.add_post('/mysaves/collections/delete', self.__handle_delete, name='delete')
+        app.router.add_post('/mysaves/collections/items/add', self.__handle_add, name='add')
+        app.router.add_get('/images/create/detail/async/{image_set_id}/', self.__handle_detail, name='detail')
+        app.router.add_get('/th/id/{image_id}', self.__handle_image, name='cdn')
+        self.__runner = web.AppRunner(app, access_log=None)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, '127.0.0.1', port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        """
+        Stops the server.
+        :return: None
+        """
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+
+    def get_image_bytes(self, image_id: str, thumbnail: bool = False) -> bytes:
+        """
+        Returns the image with the id in a comment segment, so every image has a different content.
+        :param image_id: The id of the image.
+        :param thumbnail: Whether to return the small version of the image.
+        :return: The encoded JPEG.
+        """
+        image_bytes = self.thumbnail_bytes if thumbnail else self.image_bytes
+        comment = image_id.encode('utf-8')
+        return b''.join([image_bytes[:2], b'\xff\xfe', struct.pack('>H', len(comment) + 2), comment,
+                         image_bytes[2:]])
+
+    def __get_page_url(self, image: dict) -> str:
+        slug = image['prompt'].replace(' ', '-').replace(',', '')
+        return f"{self.base_url}/images/create/{slug}/1-{image['image_set_id']}?id={image['image_id']}"
+
+    def __create_item(self, image: dict) -> dict:
+        """
+        Creates an item of a collection page like the collection API returns it.
+        :param image: The image of the catalog.
+        :return: The item dictionary.
+        """
+        custom_data = {
+            'MediaUrl': f"{self.base_url}/th/id/{image['image_id']}",
+            'ToolTip': f"{image['prompt']} Image 1 of 4",
+            'PageUrl': self.__get_page_url(image)
+        }
+        return {
+            'dateModified': self.DATE,
+            'content': {
+                'title': image['prompt'],
+                'url': custom_data['PageUrl'],
+                'contentId': image['image_id'],
+                'itemTagPath': 'images',
+                'customData': json.dumps(custom_data),
+                'thumbnails': [{
+                    'thumbnailUrl': f"{self.base_url}/th/id/{image['image_id']}"
+                                    f"?w={self.THUMBNAIL_SIZE}&h={self.THUMBNAIL_SIZE}&pid=ImgDetMain"
+                }]
+            }
+        }
+
+    @web.middleware
+    async def __inject_faults(self, request: web.Request, handler) -> web.StreamResponse:
+        self.request_counts[request.match_info.route.name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.__random.random() < self.error_rate:
+            return web.Response(status=503, reason='Service Unavailable')
+        return await handler(request)
+
+    async def __handle_collections(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        page_size = body.get('maxItemsToFetch', 1000)
+        if 'collectionIds' in body:
+            collections = [collection for collection in self.collections
+                           if collection['id'] in body['collectionIds']]
+            offset = int(body.get('continuationToken') or 0)
+        else:
+            collections = self.collections
+            offset = 0
+        response_collections = []
+        for collection in collections:
+            images = collection['images'][offset:offset + page_size]
+            collection_page = {'items': [self.__create_item(image) for image in images]}
+            if offset + page_size < len(collection['images']):
+                collection_page['continuationToken'] = str(offset + page_size)
+            response_collection = {'id': collection['id'], 'title': collection['title'],
+                                   'collectionPage': collection_page}
+            if collection['title'] == 'Saved Images':
+                response_collection['knownCollectionType'] = 'SavedImages'
+            response_collections.append(response_collection)
+        return web.json_response({'collections': response_collections})
+
+    async def __handle_detail(self, request: web.Request) -> web.Response:
+        # The page URLs prefix the image set id like Bing does, e.g. 1-<image set id>.
+        image_set_id = re.sub(r'^\d-', '', request.match_info['image_set_id'])
+        if self.failing_detail_requests[image_set_id] > 0:
+            self.failing_detail_requests[image_set_id] -= 1
+            return web.json_response({'value': []})
+        images = self.__image_sets.get(image_set_id, [])
+        return web.json_response({'value': [{
+            'imageId': image['image_id'],
+            'contentUrl': f"{self.base_url}/th/id/{image['image_id'].replace('OIG.', 'OIG2.')}",
+            'thumbnailUrl': f"{self.base_url}/th/id/{image['image_id']}?w={self.THUMBNAIL_SIZE}",
+            'imageAltText': image['prompt'],
+            'hostPageUrl': self.__get_page_url(image),
+            'datePublished': self.DATE
+        } for image in images]})
+
+    async def __handle_delete(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        collection_ids = [collection['collectionId'] for collection in body['targetCollections']]
+        self.deleted_collection_ids.extend(collection_ids)
+        self.collections = [collection for collection in self.collections if collection['id'] not in collection_ids]
+        return web.json_response({'isSuccess': True})
+
+    async def __handle_add(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.added_items.extend(body['Items'])
+        return web.json_response({'isSuccess': True})
+
+    async def __handle_image(self, request: web.Request) -> web.StreamResponse:
+        self.request_count += 1
+        image_id = request.match_info['image_id']
+        if image_id.replace('OIG2.', 'OIG.') in self.not_found_image_ids:
+            return web.Response(status=404, reason='Not Found')
+        etag = f'"{image_id}"'
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified_count += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        body = self.get_image_bytes(image_id, thumbnail='w' in request.query)
+        if self.truncate_rate and self.__random.random() < self.truncate_rate:
+            # Announces the whole image, but drops the connection after the first half.
+            response = web.StreamResponse(headers={'ETag': etag, 'Content-Type': 'image/jpeg',
+                                                   'Content-Length': str(len(body))})
+            await response.prepare(request)
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+        return web.Response(body=body, content_type='image/jpeg', headers={'ETag': etag})
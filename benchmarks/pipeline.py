@@ -0,0 +1,146 @@
+"""
+Runs the whole download pipeline, i.e. ImageDownload.run with the collection API, against the local mock server and
+reports the throughput, the peak memory and the number of requests per endpoint for each catalog size.
+Every run happens in its own process, so the peak memory isn't carried over, while the mock server stays in this one.
+Run from the repository root with: python -m benchmarks.pipeline [image_count ...] [--latency 0.02] [--error-rate 0.01]
+[--sink directory]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tomllib
+from multiprocessing.connection import Connection
+
+from tabulate import tabulate
+
+from benchmarks.mock_bing_server import MockBingServer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the peak memory isn't reported.
+    resource = None
+
+
+def get_peak_rss_megabytes() -> float | None:
+    """
+    Returns the peak resident memory of the current process.
+    :return: The peak memory in megabytes or None if it can't be measured on this platform.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return max_rss / 1024 / 1024 if sys.platform == 'darwin' else max_rss / 1024
+
+
+def run_pipeline(base_url: str, destination_folder: str, sink: str, connection: Connection) -> None:
+    """
+    Runs a download against the mock server without caches and sends the results back. Runs in a child process.
+    :param base_url: The address of the mock server.
+    :param destination_folder: The folder the output is written to.
+    :param sink: The output sink, i.e. zip, tar or directory.
+    :param connection: The pipe to send the results to.
+    :return: None
+    """
+    from models.image_download import ImageDownload
+    from utilities.config import Config
+
+    with open('config.toml', 'rb') as config_file:
+        config = tomllib.load(config_file)
+    config['network']['base_url'] = base_url
+    config['output']['sink'] = sink
+    config['output']['tar_to_stdout'] = False
+    config['image_source']['method'] = 'api'
+    config['collection']['collections_to_include'] = []
+    config['collection']['delete_collection_after_download']['toggle'] = False
+    config['cache']['use_metadata_cache'] = False
+    config['cache']['use_blob_cache'] = False
+    config['metrics']['write_report'] = False
+    config['debug']['detailed_statistics'] = False
+    Config(config)
+    os.environ['COOKIE'] = 'benchmark'
+    os.environ['DESTINATION_FOLDER'] = destination_folder
+    logging.basicConfig(level=logging.ERROR)
+
+    image_download = ImageDownload()
+    start = time.perf_counter()
+    asyncio.run(image_download.run())
+    elapsed = time.perf_counter() - start
+    connection.send({
+        'elapsed': elapsed,
+        'total': image_download.total_image_count,
+        'successful': image_download.successful_image_count,
+        'peak_rss': get_peak_rss_megabytes()
+    })
+
+
+async def benchmark(image_count: int, sink: str, server: MockBingServer) -> dict:
+    """
+    Runs the pipeline for a catalog of the given size.
+    :param image_count: The number of images in the catalog.
+    :param sink: The output sink, i.e. zip, tar or directory.
+    :param server: The started mock server.
+    :return: Dictionary containing the results of the run and the request counts of the server.
+    """
+    server.create_catalog(image_count, collection_count=max(1, image_count // 2500))
+    server.reset_counts()
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    with tempfile.TemporaryDirectory() as destination_folder:
+        process = context.Process(target=run_pipeline, args=(server.base_url, destination_folder, sink, sender))
+        process.start()
+        # The server keeps answering on this loop while the child process runs.
+        result = await asyncio.to_thread(receiver.recv)
+        await asyncio.to_thread(process.join)
+
+    return {**result, 'requests': dict(server.request_counts)}
+
+
+async def main(image_counts: list, latency: float, error_rate: float, not_found_rate: float,
+               truncate_rate: float, sink: str) -> None:
+    server = MockBingServer(latency=latency, error_rate=error_rate, not_found_rate=not_found_rate,
+                            truncate_rate=truncate_rate)
+    await server.start()
+    rows = []
+    try:
+        for image_count in image_counts:
+            result = await benchmark(image_count, sink, server)
+            requests = result['requests']
+            rows.append([
+                image_count,
+                result['successful'],
+                f"{result['elapsed']:.2f}",
+                f"{result['successful'] / result['elapsed']:.0f}",
+                f"{result['peak_rss']:.0f}" if result['peak_rss'] is not None else 'n/a',
+                requests.get('collections', 0),
+                requests.get('detail', 0),
+                requests.get('cdn', 0)
+            ])
+            print(f"{image_count} images done in {result['elapsed']:.2f} s")
+    finally:
+        await server.stop()
+    print(f"{sink} sink, latency {latency * 1000:.0f} ms, error rate {error_rate:.1%}, not found rate {not_found_rate:.1%}, "
+          f"truncate rate {truncate_rate:.1%}")
+    print(tabulate(rows, headers=["Images", "Successful", "Seconds", "Images/s", "Peak RSS MB", "Collection Requests",
+                                  "Detail Requests", "Image Requests"], tablefmt='pipe'))
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the download pipeline against a mock server.")
+    argument_parser.add_argument('image_counts', nargs='*', type=int, default=[100, 1000, 10000])
+    argument_parser.add_argument('--latency', type=float, default=0.0, help="Seconds every request is delayed by.")
+    argument_parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 503.")
+    argument_parser.add_argument('--not-found-rate', type=float, default=0.0, help="Share of images that are 404.")
+    argument_parser.add_argument('--truncate-rate', type=float, default=0.0,
+                                 help="Share of image bodies that are cut off.")
+    argument_parser.add_argument('--sink', choices=['zip', 'tar', 'directory'], default='zip',
+                                 help="The output the images are written to.")
+    arguments = argument_parser.parse_args()
+    asyncio.run(main(arguments.image_counts, arguments.latency, arguments.error_rate, arguments.not_found_rate,
+                     arguments.truncate_rate, arguments.sink))
@@ -14,6 +14,8 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from dotenv import load_dotenv
 from models.image_download import ImageDownload
 from utilities.config import Config
+from utilities.progress_bus import ProgressBus, ProgressSnapshot
+from utilities.run_control import RunControl
 
 # Configuration file path
 CONFIG_FILE = Path.home() / '.bing_image_downloader_config.json'
@@ -32,9 +34,12 @@ TRANSLATIONS = {
         'use_local_time': "Use Local Time Zone",
         'delete_collection': "Delete Collection After Download",
         'detailed_stats': "Generate Detailed Statistics",
+        'resume_download': "Resume Previous Run",
         'progress_group': "Progress",
         'start_download': "Start Download",
         'cancel': "Cancel",
+        'pause': "Pause",
+        'resume': "Resume",
         'select_folder': "Select Download Folder",
         'error_no_cookie': "Please enter your cookie for API method",
         'error_no_collections': "Please enter at least one collection name",
@@ -45,9 +50,20 @@ TRANSLATIONS = {
         'successful_downloads': "Successfully downloaded {} of {} images",
         'time_elapsed': "Time elapsed: {:.2f} seconds",
         'download_cancelled': "Download cancelled",
+        'cancelling': "Cancelling, the running downloads are finished first...",
+        'paused': "Paused, the running downloads are finished first.",
+        'resumed': "Resumed.",
+        'resume_hint': "The remaining images are downloaded when the download is started again with \"Resume Previous Run\".",
         'system_limits': "System Limits (macOS)",
         'max_connections': "Max Connections:",
-        'memory_limit': "Memory Limit (MB):"
+        'memory_limit': "Memory Limit (MB):",
+        'download_group': "Download",
+        'max_concurrent_downloads': "Max Concurrent Downloads:",
+        'max_concurrent_downloads_per_host': "Max Concurrent Downloads per Host:",
+        'adaptive_downloads': "Adapt Concurrency When Throttled",
+        'deduplicate_downloads': "Download Duplicate Images Only Once",
+        'progress_status': "{} of {} images, {} failed, {:.1f} MB, {:.1f} images/s",
+        'progress_eta': ", about {} left"
     },
     'pt_BR': {
         'window_title': "Bing Image Downloader",
@@ -61,9 +77,12 @@ TRANSLATIONS = {
         'use_local_time': "Usar Fuso Horário Local",
         'delete_collection': "Excluir Coleção Após Download",
         'detailed_stats': "Gerar Estatísticas Detalhadas",
+        'resume_download': "Retomar Execução Anterior",
         'progress_group': "Progresso",
         'start_download': "Iniciar Download",
         'cancel': "Cancelar",
+        'pause': "Pausar",
+        'resume': "Retomar",
         'select_folder': "Selecionar Pasta de Download",
         'error_no_cookie': "Por favor, insira seu cookie para o método API",
         'error_no_collections': "Por favor, insira pelo menos um nome de coleção",
@@ -74,9 +93,20 @@ TRANSLATIONS = {
         'successful_downloads': "Download bem-sucedido de {} de {} imagens",
         'time_elapsed': "Tempo decorrido: {:.2f} segundos",
         'download_cancelled': "Download cancelado",
+        'cancelling': "Cancelando, os downloads em andamento são concluídos primeiro...",
+        'paused': "Pausado, os downloads em andamento são concluídos primeiro.",
+        'resumed': "Retomado.",
+        'resume_hint': "As imagens restantes são baixadas quando o download for iniciado novamente com \"Retomar Execução Anterior\".",
         'system_limits': "Limites do Sistema (macOS)",
         'max_connections': "Conexões Máximas:",
-        'memory_limit': "Limite de Memória (MB):"
+        'memory_limit': "Limite de Memória (MB):",
+        'download_group': "Download",
+        'max_concurrent_downloads': "Máximo de Downloads Simultâneos:",
+        'max_concurrent_downloads_per_host': "Máximo de Downloads Simultâneos por Host:",
+        'adaptive_downloads': "Adaptar Simultaneidade Quando Limitado",
+        'deduplicate_downloads': "Baixar Imagens Duplicadas Apenas Uma Vez",
+        'progress_status': "{} de {} imagens, {} falharam, {:.1f} MB, {:.1f} imagens/s",
+        'progress_eta': ", cerca de {} restantes"
     }
 }
 
@@ -89,14 +119,21 @@ def get_system_language():
         return 'en_US'
 
 class DownloadThread(QThread):
+    # Updating the progress bar more often only floods the Qt event queue on large runs.
+    PROGRESS_INTERVAL = 0.2
+
     progress = pyqtSignal(int)
+    progress_snapshot = pyqtSignal(object)
     finished = pyqtSignal(int, int, float)
+    cancelled = pyqtSignal(int, int, float)
     error = pyqtSignal(str)
 
-    def __init__(self, config, connection_limit=None, memory_limit=None, destination_folder=None):
+    def __init__(self, config, connection_limit=None, memory_limit=None, destination_folder=None, resume=False):
         super().__init__()
         self.config = config
-        self.image_download = ImageDownload()
+        # Pauses and cancels the download through its event loop, so the output is always finalized.
+        self.run_control = RunControl()
+        self.image_download = ImageDownload(resume=resume, run_control=self.run_control)
         self.start_time = None
         self.connection_limit = connection_limit
         self.memory_limit = memory_limit
@@ -146,11 +183,16 @@ class DownloadThread(QThread):
             asyncio.set_event_loop(loop)
             
             self.start_time = loop.time()
-            loop.run_until_complete(self.image_download.run())
+            progress_subscription = ProgressBus().subscribe(self.publish_progress, self.PROGRESS_INTERVAL)
+            try:
+                loop.run_until_complete(self.image_download.run())
+            finally:
+                ProgressBus().unsubscribe(progress_subscription)
             end_time = loop.time()
             elapsed_time = end_time - self.start_time
             
-            self.finished.emit(
+            signal = self.cancelled if self.image_download.is_cancelled else self.finished
+            signal.emit(
                 self.image_download.successful_image_count,
                 self.image_download.total_image_count,
                 elapsed_time
@@ -162,6 +204,11 @@ class DownloadThread(QThread):
             if 'loop' in locals():
                 loop.close()
 
+    def publish_progress(self, snapshot: ProgressSnapshot):
+        # Called on the thread of the event loop, the signals are delivered on the thread of the window.
+        self.progress.emit(snapshot.percent)
+        self.progress_snapshot.emit(snapshot)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -234,6 +281,36 @@ class MainWindow(QMainWindow):
         pattern_layout.addWidget(self.pattern_input)
         config_layout.addLayout(pattern_layout)
 
+        # Download Concurrency
+        download_group = QGroupBox(self.translations['download_group'])
+        download_layout = QVBoxLayout()
+
+        max_downloads_layout = QHBoxLayout()
+        max_downloads_layout.addWidget(QLabel(self.translations['max_concurrent_downloads']))
+        self.max_concurrent_downloads = QSpinBox()
+        self.max_concurrent_downloads.setRange(1, 1024)
+        self.max_concurrent_downloads.setValue(64)
+        max_downloads_layout.addWidget(self.max_concurrent_downloads)
+        download_layout.addLayout(max_downloads_layout)
+
+        max_downloads_per_host_layout = QHBoxLayout()
+        max_downloads_per_host_layout.addWidget(QLabel(self.translations['max_concurrent_downloads_per_host']))
+        self.max_concurrent_downloads_per_host = QSpinBox()
+        self.max_concurrent_downloads_per_host.setRange(1, 1024)
+        self.max_concurrent_downloads_per_host.setValue(32)
+        max_downloads_per_host_layout.addWidget(self.max_concurrent_downloads_per_host)
+        download_layout.addLayout(max_downloads_per_host_layout)
+
+        self.adaptive_downloads = QCheckBox(self.translations['adaptive_downloads'])
+        self.adaptive_downloads.setChecked(True)
+        download_layout.addWidget(self.adaptive_downloads)
+        self.deduplicate_downloads = QCheckBox(self.translations['deduplicate_downloads'])
+        self.deduplicate_downloads.setChecked(True)
+        download_layout.addWidget(self.deduplicate_downloads)
+
+        download_group.setLayout(download_layout)
+        config_layout.addWidget(download_group)
+
         # System Limits (macOS only)
         if platform.system() == 'Darwin':
             limits_group = QGroupBox(self.translations['system_limits'])
@@ -268,9 +345,11 @@ class MainWindow(QMainWindow):
         self.use_local_time.setChecked(True)
         self.delete_collection = QCheckBox(self.translations['delete_collection'])
         self.detailed_stats = QCheckBox(self.translations['detailed_stats'])
+        self.resume_download = QCheckBox(self.translations['resume_download'])
         options_layout.addWidget(self.use_local_time)
         options_layout.addWidget(self.delete_collection)
         options_layout.addWidget(self.detailed_stats)
+        options_layout.addWidget(self.resume_download)
         config_layout.addLayout(options_layout)
 
         config_group.setLayout(config_layout)
@@ -283,6 +362,9 @@ class MainWindow(QMainWindow):
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 100)
         progress_layout.addWidget(self.progress_bar)
+
+        self.progress_label = QLabel()
+        progress_layout.addWidget(self.progress_label)
         
         self.log_output = QTextEdit()
         self.log_output.setReadOnly(True)
@@ -297,6 +379,11 @@ class MainWindow(QMainWindow):
         self.start_button.clicked.connect(self.start_download)
         button_layout.addWidget(self.start_button)
         
+        self.pause_button = QPushButton(self.translations['pause'])
+        self.pause_button.clicked.connect(self.toggle_pause)
+        self.pause_button.setEnabled(False)
+        button_layout.addWidget(self.pause_button)
+
         self.cancel_button = QPushButton(self.translations['cancel'])
         self.cancel_button.clicked.connect(self.cancel_download)
         self.cancel_button.setEnabled(False)
@@ -330,6 +417,10 @@ class MainWindow(QMainWindow):
                 self.use_local_time.setChecked(config.get('use_local_time', True))
                 self.delete_collection.setChecked(config.get('delete_collection', False))
                 self.detailed_stats.setChecked(config.get('detailed_stats', False))
+                self.max_concurrent_downloads.setValue(config.get('max_concurrent_downloads', 64))
+                self.max_concurrent_downloads_per_host.setValue(config.get('max_concurrent_downloads_per_host', 32))
+                self.adaptive_downloads.setChecked(config.get('adaptive_downloads', True))
+                self.deduplicate_downloads.setChecked(config.get('deduplicate_downloads', True))
                 
                 if platform.system() == 'Darwin':
                     self.connection_limit.setValue(config.get('connection_limit', 1024))
@@ -347,7 +438,11 @@ class MainWindow(QMainWindow):
                 'pattern': self.pattern_input.text(),
                 'use_local_time': self.use_local_time.isChecked(),
                 'delete_collection': self.delete_collection.isChecked(),
-                'detailed_stats': self.detailed_stats.isChecked()
+                'detailed_stats': self.detailed_stats.isChecked(),
+                'max_concurrent_downloads': self.max_concurrent_downloads.value(),
+                'max_concurrent_downloads_per_host': self.max_concurrent_downloads_per_host.value(),
+                'adaptive_downloads': self.adaptive_downloads.isChecked(),
+                'deduplicate_downloads': self.deduplicate_downloads.isChecked()
             }
             
             if platform.system() == 'Darwin':
@@ -410,8 +505,58 @@ class MainWindow(QMainWindow):
                 'debug_filename': "bing_image_creator.log",
                 'detailed_statistics': self.detailed_stats.isChecked()
             },
+            'download': {
+                'max_concurrent_downloads': self.max_concurrent_downloads.value(),
+                'max_concurrent_downloads_per_host': self.max_concurrent_downloads_per_host.value(),
+                'adaptive': self.adaptive_downloads.isChecked(),
+                'max_buffered_megabytes': 256,
+                'queue_size': 256,
+                'deduplicate': self.deduplicate_downloads.isChecked()
+            },
             'detail_api': {
                 'max_attempts': 5
+            },
+            'cache': {
+                'use_metadata_cache': True,
+                'metadata_ttl_days': 30,
+                'metadata_max_entries': 200000,
+                'use_blob_cache': True,
+                'blob_max_megabytes': 4096
+            },
+            'performance': {
+                'cpu_executor': 'thread',
+                'cpu_workers': 0,
+                'monitor_loop_lag': True
+            },
+            'rate_limit': {
+                'collections_per_second': 5,
+                'collections_burst': 5,
+                'detail_per_second': 50,
+                'detail_burst': 100,
+                'edit_per_second': 10,
+                'edit_burst': 10,
+                'cdn_per_second': 0,
+                'cdn_burst': 100
+            },
+            'output': {
+                'sink': 'zip',
+                'tar_to_stdout': False,
+                'split_by_collection': False,
+                'max_shard_megabytes': 0
+            },
+            'network': {
+                'base_url': 'https://www.bing.com',
+                'no_retry_statuses': [401, 404, 410],
+                'max_retry_after_seconds': 120,
+                'circuit_breaker_failures': 20,
+                'circuit_breaker_cooldown_seconds': 30
+            },
+            'metrics': {
+                'write_report': True,
+                'export_prometheus': False
+            },
+            'progress': {
+                'log_interval_seconds': 10
             }
         }
 
@@ -441,39 +586,86 @@ class MainWindow(QMainWindow):
             self.log_output.append(f"Memory limit: {self.memory_limit.value()} MB")
 
         # Start download
-        self.download_thread = DownloadThread(config, connection_limit, memory_limit, destination_folder)
+        self.download_thread = DownloadThread(config, connection_limit, memory_limit, destination_folder,
+                                              self.resume_download.isChecked())
+        self.download_thread.progress.connect(self.progress_bar.setValue)
+        self.download_thread.progress_snapshot.connect(self.update_progress)
         self.download_thread.finished.connect(self.download_finished)
+        self.download_thread.cancelled.connect(self.download_cancelled)
         self.download_thread.error.connect(self.download_error)
         self.download_thread.start()
 
         # Update UI
+        self.progress_bar.setValue(0)
+        self.progress_label.clear()
         self.start_button.setEnabled(False)
+        self.pause_button.setEnabled(True)
         self.cancel_button.setEnabled(True)
         self.log_output.append(self.translations['starting_download'])
 
+    def toggle_pause(self):
+        if self.download_thread and self.download_thread.isRunning():
+            run_control = self.download_thread.run_control
+            if run_control.is_paused:
+                run_control.resume()
+                self.pause_button.setText(self.translations['pause'])
+                self.log_output.append(self.translations['resumed'])
+            else:
+                run_control.pause()
+                self.pause_button.setText(self.translations['resume'])
+                self.log_output.append(self.translations['paused'])
+
     def cancel_download(self):
         if self.download_thread and self.download_thread.isRunning():
-            self.download_thread.terminate()
-            self.download_thread.wait()
-            self.log_output.append(self.translations['download_cancelled'])
-            self.start_button.setEnabled(True)
+            # The thread finishes the running downloads and the output, then it reports the cancellation.
+            self.download_thread.run_control.cancel()
+            self.pause_button.setEnabled(False)
             self.cancel_button.setEnabled(False)
+            self.log_output.append(self.translations['cancelling'])
+
+    def reset_buttons(self):
+        self.start_button.setEnabled(True)
+        self.pause_button.setEnabled(False)
+        self.pause_button.setText(self.translations['pause'])
+        self.cancel_button.setEnabled(False)
+
+    def update_progress(self, snapshot: ProgressSnapshot):
+        status = self.translations['progress_status'].format(
+            snapshot.images_finished,
+            snapshot.images_total,
+            snapshot.images_failed,
+            snapshot.bytes_downloaded / 1024 / 1024,
+            snapshot.images_per_second
+        )
+        if snapshot.eta_seconds is not None:
+            status += self.translations['progress_eta'].format(ProgressSnapshot.format_duration(snapshot.eta_seconds))
+        self.progress_label.setText(status)
 
     def download_finished(self, successful, total, elapsed):
         self.log_output.append(f"\n{self.translations['download_completed']}\n"
                              f"{self.translations['successful_downloads'].format(successful, total)}\n"
                              f"{self.translations['time_elapsed'].format(elapsed)}")
-        self.start_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
+        self.reset_buttons()
+
+    def download_cancelled(self, successful, total, elapsed):
+        self.log_output.append(f"\n{self.translations['download_cancelled']}\n"
+                             f"{self.translations['successful_downloads'].format(successful, total)}\n"
+                             f"{self.translations['resume_hint']}")
+        # Starting again continues the run, so the finished images aren't downloaded twice.
+        self.resume_download.setChecked(True)
+        self.reset_buttons()
 
     def download_error(self, error_msg):
         self.log_output.append(f"\nError: {error_msg}")
-        self.start_button.setEnabled(True)
-        self.cancel_button.setEnabled(False)
+        self.reset_buttons()
 
     def closeEvent(self, event):
         # Save configuration when closing the application
         self.save_config()
+        if self.download_thread and self.download_thread.isRunning():
+            # Let the download finalize its output instead of leaving it truncated.
+            self.download_thread.run_control.cancel()
+            self.download_thread.wait()
         event.accept()
 
 def main():
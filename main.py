@@ -1,6 +1,8 @@
+import argparse
 import asyncio
 import logging
 import os
+import signal
 import sys
 import time
 from logging import StreamHandler
@@ -11,18 +13,38 @@ from dotenv import load_dotenv
 
 from models.image_download import ImageDownload
 from utilities.config import Config
+from utilities.progress_bus import ProgressBus
+from utilities.run_control import RunControl
 
 
-async def main() -> None:
+async def main(resume: bool) -> None:
     """
     Entry point for the program. Calls all high level functionality.
+    :param resume: Whether to continue the latest run instead of starting a new one.
     :return: None
     """
     start = time.time()
-    image_download = ImageDownload()
-    await image_download.run()
+    log_interval = Config().progress_log_interval_seconds
+    if log_interval > 0:
+        ProgressBus().subscribe(lambda snapshot: logging.info(f"Progress: {snapshot.describe()}"), log_interval)
+    run_control = RunControl()
+    previous_handler = signal.getsignal(signal.SIGINT)
+
+    def cancel(signum, frame) -> None:
+        # A second Ctrl+C aborts the running downloads as well.
+        signal.signal(signal.SIGINT, previous_handler)
+        run_control.cancel()
+
+    signal.signal(signal.SIGINT, cancel)
+    image_download = ImageDownload(resume=resume, run_control=run_control)
+    try:
+        await image_download.run()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
     end = time.time()
     elapsed = end - start
+    if image_download.is_cancelled:
+        logging.info("Run `python main.py --resume` to download the remaining images.")
     logging.info(f"Successfully downloaded {image_download.successful_image_count}"
                  f" of {image_download.total_image_count} images in"
                  f" {round(elapsed, 2)} seconds.\n")
@@ -33,16 +55,17 @@ def init_logging() -> None:
     Initializes logging for the program.
     :return: None
     """
-    logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("asyncio").setLevel(logging.WARNING)
     logging.getLogger("aiohttp_retry").setLevel(logging.WARNING)
 
     log_level = logging.DEBUG if config['debug']['debug'] else logging.INFO
     log_format = "%(asctime)s %(levelname)s %(message)s"
+    # The standard output is reserved for the archive when it's streamed there.
+    is_streaming_to_stdout = config['output']['sink'] == 'tar' and config['output']['tar_to_stdout']
     logging.basicConfig(
         format=log_format,
         level=log_level,
-        handlers=[StreamHandler(sys.stdout)]
+        handlers=[StreamHandler(sys.stderr if is_streaming_to_stdout else sys.stdout)]
     )
 
     if config['debug']['use_log_file']:
@@ -60,8 +83,12 @@ def init_logging() -> None:
 
 
 if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Downloads all Bing Creator images from a collection.")
+    argument_parser.add_argument('--resume', action='store_true',
+                                 help="Continue the latest run and only download the images that are missing.")
+    arguments = argument_parser.parse_args()
     load_dotenv()
     with open('config.toml', 'rb') as cfg_file:
         config = Config(load(cfg_file)).value
     init_logging()
-    asyncio.run(main())
+    asyncio.run(main(arguments.resume))
@@ -5,14 +5,17 @@ import json
 import logging
 import os
 import re
-from asyncio import Semaphore
 
 import aiohttp
-import requests
 from PIL import Image as PIL_Image
 
+from utilities.client_manager import ClientManager
+from utilities.config import Config
+from utilities.cpu_executor import CpuExecutor
+from utilities.dimension_probe import DimensionProbe
 from utilities.image_validator import ImageValidator
 from utilities.network_utility import NetworkUtility
+from utilities.rate_limiter import RateLimiter
 
 
 class CollectionImport:
@@ -27,54 +30,53 @@ class CollectionImport:
     async def gather_images_to_collection(self) -> None:
         """
         Adds images from the collection_dict to a specified collection.
-        Semaphore to prevent issues from overloading API like getting no backend response.
+        The rate limiter prevents issues from overloading the API like getting no backend response.
         :return: None
         """
-        logging.info("Creating thumbnails...")
-        item_list = await self.__construct_item_list()
-        logging.info(f"Adding {len(item_list)} items to the collection...")
-        semaphore = Semaphore(10)
-        tasks = [self.add_image_to_collection(item, semaphore) for item in item_list]
-        await asyncio.gather(*tasks)
+        RateLimiter().reset()
+        async with ClientManager():
+            logging.info("Creating thumbnails...")
+            item_list = await self.__construct_item_list()
+            logging.info(f"Adding {len(item_list)} items to the collection...")
+            tasks = [self.add_image_to_collection(item) for item in item_list]
+            await asyncio.gather(*tasks)
+        await asyncio.to_thread(CpuExecutor().shutdown)
 
     @staticmethod
-    async def add_image_to_collection(item: dict, semaphore: asyncio.locks.Semaphore) -> None:
+    async def add_image_to_collection(item: dict) -> None:
         """
         Adds a single image to the specified collection. The specified collection is hardcoded for now.
         :param item: The image from the collection_dict formatted for this request.
-        :param semaphore: Used to regulate the maximum number of concurrent tasks.
         :return: None
         """
-        async with semaphore:
-            header = {
-                "content-type": "application/json",
-                "cookie": os.getenv('COOKIE'),
-                "sid": "0"
-            }
-            body = {
-                "Items": [item],
-                "TargetCollection": {
-                    "CollectionId": "3a165902d3a64b6c8f05f52ea2b830ee"
-                }
+        header = {
+            "content-type": "application/json",
+            "cookie": os.getenv('COOKIE'),
+            "sid": "0"
+        }
+        body = {
+            "Items": [item],
+            "TargetCollection": {
+                "CollectionId": "3a165902d3a64b6c8f05f52ea2b830ee"
             }
-            async with (aiohttp.ClientSession() as session):
-                retry_client = NetworkUtility.create_retry_client(session)
-                retry_client.retry_options.evaluate_response_callback = \
-                    NetworkUtility.should_retry_add_collection
-                async with retry_client.post(
-                        url='https://www.bing.com/mysaves/collections/items/add?sid=0',
-                        headers=header,
-                        data=json.dumps(body)
-                ) as response:
-                    logging.info(f"Adding image {item['ClickThroughUrl']} to the collection.")
-                    try:
-                        response_json = await response.json()
-                    except requests.JSONDecodeError:
-                        raise Exception(f"The request to add the item to the collection was unsuccessful:"
-                                        f"{response.status}")
-                    if response.status != 200 or not response_json['isSuccess']:
-                        raise Exception(f"Adding item to collection failed with following response:"
-                                        f"{response_json} for item:{item['ClickThroughUrl']}")
+        }
+        retry_client = ClientManager().create_retry_client()
+        retry_client.retry_options.evaluate_response_callback = \
+            NetworkUtility.should_retry_add_collection
+        async with retry_client.post(
+                url=f"{Config().base_url}/mysaves/collections/items/add?sid=0",
+                headers=header,
+                data=json.dumps(body)
+        ) as response:
+            logging.info(f"Adding image {item['ClickThroughUrl']} to the collection.")
+            try:
+                response_json = await response.json()
+            except (aiohttp.ContentTypeError, json.JSONDecodeError):
+                raise Exception(f"The request to add the item to the collection was unsuccessful:"
+                                f"{response.status}")
+            if response.status != 200 or not response_json['isSuccess']:
+                raise Exception(f"Adding item to collection failed with following response:"
+                                f"{response_json} for item:{item['ClickThroughUrl']}")
 
     async def __construct_item_list(self) -> list[dict]:
         """
@@ -126,17 +128,31 @@ class CollectionImport:
     @staticmethod
     async def __get_thumbnail_base64(thumbnail_url: str) -> str:
         """
-        Gets the thumbnail from the url, resizes it and converts it to base64 for later usage.
+        Gets the thumbnail from the url, resizes it if it is larger than needed and converts it to base64 for later usage.
         :param thumbnail_url: Url to fetch thumbnail from.
         :return: The fetched and resized thumbnail in base64.
         """
-        async with aiohttp.ClientSession() as session:
-            async with NetworkUtility.create_retry_client(session).get(thumbnail_url) as response:
-                thumbnail_content = await response.read()
-                img = PIL_Image.open(io.BytesIO(thumbnail_content))
-                img.thumbnail((468, 468))
-                buffered = io.BytesIO()
-                img.save(buffered, format="JPEG")
-                thumbnail_base64 = str(base64.b64encode(buffered.getvalue()).decode('utf-8'))
+        async with ClientManager().create_retry_client().get(thumbnail_url) as response:
+            thumbnail_content = await response.read()
+        thumbnail_jpeg = await CpuExecutor().run(CollectionImport.create_thumbnail_jpeg, thumbnail_content)
+        thumbnail_base64 = str(base64.b64encode(thumbnail_jpeg).decode('utf-8'))
 
         return thumbnail_base64
+
+    @staticmethod
+    def create_thumbnail_jpeg(image_content: bytes) -> bytes:
+        """
+        Resizes the image to fit the thumbnail size and encodes it as JPEG. Meant to be run in the :class:`CpuExecutor`.
+        :param image_content: The encoded image.
+        :return: The thumbnail as JPEG.
+        """
+        width, height = DimensionProbe.get_size(image_content)
+        if width <= 468 and height <= 468 and image_content[0:2] == b'\xff\xd8':
+            # The thumbnail is already a small enough JPEG, so it doesn't need to be decoded and encoded again.
+            return image_content
+        img = PIL_Image.open(io.BytesIO(image_content))
+        img.thumbnail((468, 468))
+        buffered = io.BytesIO()
+        img.save(buffered, format="JPEG")
+
+        return buffered.getvalue()
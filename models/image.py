@@ -1,16 +1,22 @@
+import bisect
+import sys
 from dataclasses import dataclass
-from typing import List, Tuple
+from typing import Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class Image:
     """
     This class is used to represent a single image and its properties.
+    Large catalogs hold hundreds of thousands of images, so the class uses slots, the collection name and id are
+    interned and the URLs to download the image from are kept as a tuple ordered by priority.
     """
-    image_urls: List[Tuple[int, str]]
     index: str
     prompt: str
     page_url: str
+    image_urls: Tuple[str, ...] = ()
+    # The priority of each URL in image_urls, one byte each.
+    image_url_priorities: bytes = b''
     collection_name: str = 'Collection'
     collection_id: str = None
     date_modified: str = None
@@ -22,3 +28,29 @@ class Image:
     status_code: int = None
     reason: str = None
     attempts: int = 0
+    detail_attempts: int = 0
+    link_target: str = None
+
+    def __post_init__(self):
+        if len(self.image_url_priorities) != len(self.image_urls):
+            # URLs passed without priorities are tried in the given order.
+            self.image_url_priorities = bytes(range(len(self.image_urls)))
+        self.image_urls = tuple(self.image_urls)
+        self.collection_name = sys.intern(self.collection_name)
+        if self.collection_id is not None:
+            self.collection_id = sys.intern(self.collection_id)
+
+    def add_image_url(self, priority: int, url: str) -> None:
+        """
+        Adds a URL to download the image from, unless it was already added.
+        URLs with a lower priority value are tried first.
+        :param priority: The priority of the URL from 0 to 255.
+        :param url: The URL to add.
+        :return: None
+        """
+        if url in self.image_urls:
+            return
+        position = bisect.bisect_right(self.image_url_priorities, priority)
+        self.image_urls = self.image_urls[:position] + (url,) + self.image_urls[position:]
+        self.image_url_priorities = (self.image_url_priorities[:position] + bytes((priority,))
+                                     + self.image_url_priorities[position:])
@@ -1,22 +1,33 @@
 import asyncio
+import contextlib
+import hashlib
 import logging
 import os
-import string
-import zipfile
+import time
 from datetime import date
-from io import BytesIO
-from typing import List
+from typing import Dict, List, Set, Tuple
 
-import aiofiles.tempfile
 import aiohttp
-from PIL import Image as PIL_Image
-from dateutil import parser as dateutil_parser
 
 from models.image import Image
+from strategies.image_source.image_source_strategy import ImageSourceStrategy
+from utilities.archive_writer import ArchiveWriter
+from utilities.blob_cache import BlobCache, BlobReader, BlobWriter
+from utilities.byte_budget import ByteBudget
+from utilities.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utilities.client_manager import ClientManager
 from utilities.collection_utility import CollectionUtility
 from utilities.config import Config
+from utilities.cpu_executor import CpuExecutor
+from utilities.download_scheduler import DownloadScheduler
 from utilities.image_utility import ImageUtility
-from utilities.network_utility import NetworkUtility
+from utilities.loop_lag_monitor import LoopLagMonitor
+from utilities.metadata_cache import MetadataCache
+from utilities.metrics import Metrics
+from utilities.progress_bus import ProgressBus
+from utilities.rate_limiter import RateLimiter
+from utilities.run_control import RunControl
+from utilities.run_journal import RunJournal
 from utilities.statistics import Statistics
 
 
@@ -25,10 +36,23 @@ class ImageDownload:
     This class is used to download all images from the supplied collections.
     It gathers all the necessary data from the collections and downloads the images from them.
     """
+    HEAD_SIZE = 64 * 1024
+    MAX_HEAD_SIZE = 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
 
-    def __init__(self):
+    def __init__(self, resume: bool = False, run_control: RunControl | None = None):
         self.__config = Config()
+        self.__resume = resume
+        self.__run_control = run_control or RunControl()
         self.__images: List[Image] = []
+        self.__scheduler: DownloadScheduler | None = None
+        self.__byte_budget: ByteBudget | None = None
+        self.__journal: RunJournal | None = None
+        self.__archive_writer: ArchiveWriter | None = None
+        # Maps the identity of each image that is downloaded to it and an event that is set once it's finished.
+        self.__unique_images: Dict[str, Tuple[Image, asyncio.Event]] = {}
+        # Maps the hash of each archived image to its path inside the archive.
+        self.__content_hashes: Dict[str, str] = {}
         self.total_image_count = 0
         self.successful_image_count = 0
 
@@ -36,6 +60,10 @@ class ImageDownload:
     def images(self):
         return self.__images
 
+    @property
+    def is_cancelled(self) -> bool:
+        return self.__run_control.is_cancelled
+
     async def run(self):
         """
         High level method that serves as the entry point.
@@ -43,103 +71,414 @@ class ImageDownload:
         """
         strategy_method = self.__config.image_source_method
         image_source_strategy = ImageUtility.get_image_source_strategy(strategy_method)
-        self.__images = await image_source_strategy.get_images()
-        self.total_image_count = len(self.__images)
-        await self.__download_and_zip_images()
+        self.__scheduler = DownloadScheduler(
+            max_in_flight=self.__config.download_max_concurrent,
+            max_per_host=self.__config.download_max_concurrent_per_host,
+            adaptive=self.__config.download_adaptive
+        )
+        self.__byte_budget = ByteBudget(self.__config.download_max_buffered_bytes)
+        Metrics().reset()
+        CircuitBreaker().reset()
+        RateLimiter().reset()
+        ProgressBus().reset()
+        self.__run_control.bind(asyncio.get_running_loop())
+        start = time.perf_counter()
+        loop_lag_monitor = LoopLagMonitor()
+        if self.__config.monitor_loop_lag:
+            loop_lag_monitor.start()
+        try:
+            async with ClientManager():
+                await self.__download_and_write_images(image_source_strategy)
+        finally:
+            ProgressBus().flush()
+            await loop_lag_monitor.stop()
+            if self.__config.monitor_loop_lag:
+                loop_lag_monitor.log_statistics()
+            RateLimiter().log_statistics()
+            if self.__config.metrics_write_report:
+                self.__write_metrics_report(time.perf_counter() - start, loop_lag_monitor)
+            await asyncio.to_thread(CpuExecutor().shutdown)
+            await MetadataCache().close()
+            await BlobCache().close()
+
+    def __write_metrics_report(self, elapsed: float, loop_lag_monitor: LoopLagMonitor) -> None:
+        """
+        Writes the metrics of the run next to the output.
+        :param elapsed: The duration of the run in seconds.
+        :param loop_lag_monitor: The monitor of the event loop, whose statistics are included if it was enabled.
+        :return: None
+        """
+        if self.__archive_writer is None:
+            return
+        counters = Metrics().to_dict()['counters']
+        image_bytes = sum(value for key, value in counters.items() if key.startswith('image_bytes_total'))
+        run = {
+            'outputs': self.__archive_writer.paths,
+            'output_sink': self.__config.output_sink,
+            'image_source_method': self.__config.image_source_method,
+            'elapsed_seconds': round(elapsed, 3),
+            'total_images': self.total_image_count,
+            'successful_images': self.successful_image_count,
+            'images_per_second': round(self.successful_image_count / elapsed, 3) if elapsed else None,
+            'megabytes_per_second': round(image_bytes / 1024 / 1024 / elapsed, 3) if elapsed else None
+        }
+        sections = {
+            'metadata_cache': MetadataCache().statistics(),
+            'blob_cache': BlobCache().statistics(),
+            'rate_limit': RateLimiter().statistics()
+        }
+        if self.__config.monitor_loop_lag:
+            sections['event_loop_lag'] = loop_lag_monitor.statistics()
+        try:
+            Metrics().write_report(self.__journal.base_filename, run,
+                                   self.__config.metrics_export_prometheus, **sections)
+        except OSError as e:
+            logging.warning(f"Failed to write the metrics: {e}")
 
-    async def __download_and_zip_images(self) -> None:
+    async def __download_and_write_images(self, image_source_strategy: ImageSourceStrategy) -> None:
         """
-        Downloads all images from the gathered image data and zips them.
+        Downloads the images as the image source strategy yields them and writes them to the output sink.
+        :param image_source_strategy: The strategy providing the images.
         :return: None
         """
-        logging.info(f"Starting download of {len(self.__images)} images.")
-        
         # Get destination folder from environment or use current directory
         destination_folder = os.environ.get('DESTINATION_FOLDER', os.getcwd())
-        zip_filename = os.path.join(destination_folder, f"bing_images_{date.today()}.zip")
-        
-        with zipfile.ZipFile(zip_filename, "w") as zip_file:
-            async with aiofiles.tempfile.TemporaryDirectory('wb') as temp_dir:
-                tasks = [
-                    self.__download_and_save_image(image, temp_dir)
-                    for image
-                    in self.__images
+        self.__journal = RunJournal.find_latest(destination_folder) if self.__resume else None
+        if self.__journal is None:
+            self.__journal = RunJournal(os.path.join(destination_folder, f"bing_images_{date.today()}"))
+            self.__journal.reset()
+        self.__archive_writer = ArchiveWriter(
+            self.__journal.base_filename,
+            self.__byte_budget,
+            output_sink=self.__config.output_sink,
+            tar_to_stdout=self.__config.output_tar_to_stdout,
+            split_by_collection=self.__config.output_split_by_collection,
+            max_shard_bytes=self.__config.output_max_shard_bytes
+        )
+        completed_entries, recovered_arcnames = await self.__recover_archive()
+        logging.info("Starting download of images as their data arrives.")
+
+        deletion_task: asyncio.Task | None = None
+        output_finalized = asyncio.Event()
+        try:
+            async with self.__archive_writer as archive_writer:
+                queue = asyncio.Queue(maxsize=self.__config.download_queue_size)
+                worker_count = self.__config.download_max_concurrent
+                workers = [
+                    asyncio.create_task(self.__download_worker(queue, archive_writer))
+                    for _
+                    in range(worker_count)
                 ]
-                await asyncio.gather(*tasks)
-                successful_images = [image for image in self.__images if image.is_success]
-                self.successful_image_count = len(successful_images)
-                for image in successful_images:
-                    zip_file.write(
-                        filename=image.file_name,
-                        arcname=os.path.join(image.collection_name, os.path.basename(image.file_name))
-                    )
-                if (self.__config.image_source_method == 'api'
+                duplicate_tasks = []
+                try:
+                    try:
+                        await self.__run_control.run_until_cancelled(self.__produce_images(
+                            image_source_strategy, queue, duplicate_tasks, archive_writer,
+                            completed_entries, recovered_arcnames))
+                    finally:
+                        for _ in range(worker_count):
+                            await queue.put(None)
+                    await asyncio.gather(*workers, *duplicate_tasks)
+                except BaseException:
+                    # The downloads are stopped before the output is finalized, so nothing is written to it afterward.
+                    for task in (*workers, *duplicate_tasks):
+                        task.cancel()
+                    await asyncio.gather(*workers, *duplicate_tasks, return_exceptions=True)
+                    raise
+                self.successful_image_count = len([image for image in self.__images if image.is_success])
+                if self.__run_control.is_cancelled:
+                    logging.warning(f"Cancelled after {self.successful_image_count} of {self.total_image_count} "
+                                    f"gathered images were downloaded.")
+                elif (self.__config.image_source_method == 'api'
                         and self.__config.delete_collection_after_download_toggle):
-                    self.__delete_collection()
+                    # All images are written at this point and only the output has to be finalized,
+                    # so the collections to delete are chosen meanwhile. They are deleted once it was finalized.
+                    deletion_task = asyncio.create_task(
+                        self.__delete_collection(image_source_strategy.incomplete_collection_ids, output_finalized))
+                metadata_cache_statistics = MetadataCache().statistics()
+                logging.info(f"Metadata cache: {metadata_cache_statistics['hits']} hits, "
+                             f"{metadata_cache_statistics['misses']} misses.")
+                blob_cache_statistics = BlobCache().statistics()
+                logging.info(f"Image cache: {blob_cache_statistics['hits']} hits, "
+                             f"{blob_cache_statistics['misses']} misses, "
+                             f"{blob_cache_statistics['bytes_saved'] / 1024 / 1024:.1f} MB not downloaded.")
                 if self.__config.detailed_statistics:
-                    statistics_str = Statistics(self.__images).create_statistics()
-                    logging.info("Statistics zipped.")
-                    zip_file.writestr('detailed_statistics.md', statistics_str)
+                    statistics_str = Statistics(self.__images, metadata_cache_statistics,
+                                                blob_cache_statistics).create_statistics()
+                    await archive_writer.write('detailed_statistics.md', statistics_str)
+                    logging.info("Statistics written.")
+            output_finalized.set()
+        except BaseException:
+            if deletion_task is not None:
+                deletion_task.cancel()
+            raise
+        finally:
+            await self.__journal.close()
+        if deletion_task is not None:
+            await deletion_task
+
+    async def __produce_images(
+            self,
+            image_source_strategy: ImageSourceStrategy,
+            queue: asyncio.Queue,
+            duplicate_tasks: List[asyncio.Task],
+            archive_writer: ArchiveWriter,
+            completed_entries: Dict[str, dict],
+            recovered_arcnames: Set[str]) -> None:
+        """
+        Puts the images into the download queue as the image source strategy yields them.
+        The queue is bounded, so the strategy is paused while the downloads are behind.
+        If deduplication is enabled, only the first appearance of an image is queued. The others are linked to it.
+        Once the strategy moves on to the next collection, the output of the previous one is finalized as soon as its
+        images are done.
+        While the run is paused, no further images are gathered.
+        :param image_source_strategy: The strategy providing the images.
+        :param queue: The queue the download workers take the images from.
+        :param duplicate_tasks: The list the tasks linking the duplicates are added to.
+        :param archive_writer: The writer that archives the links of the duplicates.
+        :param completed_entries: The completed journal entries.
+        :param recovered_arcnames: The paths of the entries that were recovered from the archive.
+        :return: None
+        """
+        restored_image_count = 0
+        collection_name = None
+        async with contextlib.aclosing(image_source_strategy.iter_images()) as images:
+            async for image in images:
+                if not await self.__run_control.proceed():
+                    return
+                if collection_name is not None and image.collection_name != collection_name:
+                    archive_writer.finish_collection(collection_name)
+                collection_name = image.collection_name
+                archive_writer.add_pending_image(image.collection_name)
+                self.__images.append(image)
+                self.total_image_count = len(self.__images)
+                is_restored = ImageDownload.__restore_completed_image(image, completed_entries, recovered_arcnames)
+                if self.__config.download_deduplicate:
+                    identity = ImageUtility.get_image_identity(image)
+                    if identity in self.__unique_images and not is_restored:
+                        duplicate_tasks.append(asyncio.create_task(
+                            self.__link_duplicate_image(image, *self.__unique_images[identity], archive_writer)))
+                        continue
+                    self.__unique_images.setdefault(identity, (image, asyncio.Event()))
+                if is_restored:
+                    restored_image_count += 1
+                    Metrics().increment('images_total', result='restored')
+                    ProgressBus().publish(ProgressBus.IMAGE_RESTORED)
+                    self.__finish_unique_image(image)
+                    archive_writer.finish_image(image.collection_name)
+                else:
+                    await queue.put(image)
+        if collection_name is not None:
+            archive_writer.finish_collection(collection_name)
+        ProgressBus().publish(ProgressBus.GATHERING_FINISHED)
+        logging.info(f"Gathered {self.total_image_count} images, "
+                     f"{restored_image_count} of them were already downloaded.")
+
+    async def __download_worker(self, queue: asyncio.Queue, archive_writer: ArchiveWriter) -> None:
+        """
+        Downloads the images from the queue until it receives None.
+        Before an image is started, the worker waits while the run is paused. Once the run is cancelled, the remaining
+        images are skipped, so a resumed run downloads them.
+        :param queue: The queue containing the images to download.
+        :param archive_writer: The writer that archives the images.
+        :return: None
+        """
+        while (image := await queue.get()) is not None:
+            try:
+                if await self.__run_control.proceed():
+                    await self.__download_and_save_image(image, archive_writer)
+                else:
+                    archive_writer.finish_image(image.collection_name)
+            finally:
+                self.__finish_unique_image(image)
+
+    def __finish_unique_image(self, image: Image) -> None:
+        """
+        Wakes up the duplicates waiting for the image.
+        :param image: The finished :class:`Image`.
+        :return: None
+        """
+        if self.__config.download_deduplicate:
+            unique_image, finished = self.__unique_images[ImageUtility.get_image_identity(image)]
+            if unique_image is image:
+                finished.set()
+
+    async def __link_duplicate_image(
+            self,
+            image: Image,
+            unique_image: Image,
+            finished: asyncio.Event,
+            archive_writer: ArchiveWriter) -> None:
+        """
+        Waits until the first appearance of the image is finished and links the duplicate to it.
+        If the first appearance failed, so does the duplicate. If it was skipped because the run was cancelled, so is the
+        duplicate.
+        :param image: The duplicate :class:`Image`.
+        :param unique_image: The first appearance of the image, which is downloaded.
+        :param finished: Event that is set once the first appearance is finished.
+        :param archive_writer: The writer that archives the link.
+        :return: None
+        """
+        await finished.wait()
+        if not unique_image.is_success and self.__run_control.is_cancelled:
+            archive_writer.finish_image(image.collection_name)
+            return
+        image.status_code = unique_image.status_code
+        image.reason = unique_image.reason
+        try:
+            if unique_image.is_success:
+                image.file_name = unique_image.file_name
+                image.used_image_url = unique_image.used_image_url
+                image.is_thumbnail = unique_image.is_thumbnail
+                await self.__archive_link(image, ImageDownload.__get_arcname(unique_image), archive_writer)
+                image.is_success = True
+            else:
+                logging.error(f"Image #{image.index}: Skipped, because its duplicate #{unique_image.index} failed.")
+        except Exception as e:
+            logging.error(f"Image #{image.index}: Failed to link to its duplicate #{unique_image.index}: {e}")
+        finally:
+            Metrics().increment('images_total', result='linked' if image.is_success else 'failed')
+            ProgressBus().publish(ProgressBus.IMAGE_DONE if image.is_success else ProgressBus.IMAGE_FAILED)
+            arcname = ImageDownload.__get_arcname(image) if image.is_success else None
+            await self.__journal.record(image, arcname)
+            archive_writer.finish_image(image.collection_name)
+
+    @staticmethod
+    async def __archive_link(image: Image, target_arcname: str, archive_writer: ArchiveWriter) -> None:
+        """
+        Archives the image as a link to an entry with the same content.
+        Within the same folder the entry already is the image, so nothing is archived.
+        :param image: The duplicate :class:`Image`, whose file name is set.
+        :param target_arcname: Path of the entry with the same content inside the archive.
+        :param archive_writer: The writer that archives the link.
+        :return: None
+        """
+        arcname = ImageDownload.__get_arcname(image)
+        if arcname != target_arcname:
+            await archive_writer.write_link(arcname, target_arcname, image.collection_name)
+            image.link_target = target_arcname
+
+    async def __recover_archive(self) -> Tuple[Dict[str, dict], Set[str]]:
+        """
+        Restores the output of the earlier run with the images that are archived according to the journal.
+        :return: The completed journal entries and the paths of the entries that were recovered from the output.
+        """
+        completed_entries = self.__journal.completed_entries()
+        if not completed_entries:
+            return completed_entries, set()
+        logging.info(f"Resuming the run of {self.__journal.base_filename}.")
+        recovered_arcnames = await asyncio.to_thread(
+            self.__archive_writer.recover,
+            {entry['arcname'] for entry in completed_entries.values() if not entry.get('link_target')}
+        )
+        logging.info(f"Recovered {len(recovered_arcnames)} images that were already downloaded.")
+
+        return completed_entries, recovered_arcnames
+
+    @staticmethod
+    def __restore_completed_image(image: Image, completed_entries: Dict[str, dict], recovered_arcnames: Set[str]) -> bool:
+        """
+        Marks the image as successful if it is already archived according to the journal.
+        :param image: The :class:`Image` to restore.
+        :param completed_entries: The completed journal entries.
+        :param recovered_arcnames: The paths of the entries that were recovered from the archive.
+        :return: Whether the image was restored and doesn't have to be downloaded.
+        """
+        entry = completed_entries.get(RunJournal.key(image))
+        if entry is None or entry['arcname'] not in recovered_arcnames:
+            return False
+        image.file_name = entry['file_name']
+        image.used_image_url = entry['used_image_url']
+        image.is_thumbnail = entry['is_thumbnail']
+        image.status_code = entry['status_code']
+        image.reason = entry['reason']
+        image.is_success = True
+
+        return True
 
     async def __download_and_save_image(
             self,
             image: Image,
-            temp_dir: aiofiles.tempfile.TemporaryDirectory) -> None:
+            archive_writer: ArchiveWriter) -> None:
         """
-        Downloads an image using the urls in the supplied image.
+        Downloads an image using the urls in the supplied image and records the result in the journal.
         :param image: :class:`BingCreatorImage` containing the necessary properties.
-        :param temp_dir: The directory to save files to before zipping.
+        :param archive_writer: The writer that archives the image once it is downloaded.
         :return: None
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                for index, (_, url) in enumerate(image.image_urls):
-                    async with NetworkUtility.create_retry_client(session).get(url) as response:
-                        logging.info(f"Downloading image #{image.index} from: {url}")
-                        image.attempts = image.attempts + 1
-                        if response.status == 200 and response.content_type == 'image/jpeg':
-                            filename_image_prompt = await ImageUtility.slugify(image.prompt)
-                            if self.__config.use_local_time_zone:
-                                creation_date = (dateutil_parser.parse(image.creation_date)
-                                                 .astimezone()
-                                                 .strftime('%Y-%m-%dT%H%M%z'))
+            with Metrics().timer('image_seconds'):
+                await self.__download_image(image, archive_writer)
+        finally:
+            Metrics().increment('images_total', result='downloaded' if image.is_success else 'failed')
+            ProgressBus().publish(ProgressBus.IMAGE_DONE if image.is_success else ProgressBus.IMAGE_FAILED)
+            arcname = ImageDownload.__get_arcname(image) if image.is_success else None
+            await self.__journal.record(image, arcname)
+            archive_writer.finish_image(image.collection_name)
+
+    async def __download_image(self, image: Image, archive_writer: ArchiveWriter) -> None:
+        """
+        Tries the urls of the image one after another until the image was archived.
+        Every attempt waits for a slot of the download scheduler, which also gets the status of each retry as feedback.
+        Images in the blob cache are requested conditionally and taken from the cache if they are unchanged.
+        :param image: :class:`BingCreatorImage` containing the necessary properties.
+        :param archive_writer: The writer that archives the image once it is downloaded.
+        :return: None
+        """
+        try:
+            retry_client = ClientManager().create_retry_client()
+            blob_cache = BlobCache()
+            for index, url in enumerate(image.image_urls):
+                cached_blob = await blob_cache.get(url)
+                async with self.__scheduler.slot(url):
+                    try:
+                        request_start = time.perf_counter()
+                        async with retry_client.get(url, headers=BlobCache.get_conditional_headers(cached_blob),
+                                                    trace_request_ctx=self.__scheduler.trace_request_ctx()) \
+                                as response:
+                            Metrics().observe('download_response_seconds', time.perf_counter() - request_start)
+                            logging.info(f"Downloading image #{image.index} from: {url}")
+                            image.attempts = image.attempts + 1
+                            if response.status == 304 and cached_blob is not None:
+                                with await blob_cache.open_reader(url, cached_blob) as content:
+                                    await self.__save_image(image, content, str(response.url), archive_writer)
+                                logging.info(f"Image #{image.index} is unchanged, took it from the cache.")
+                                image.is_success = True
+                                # The server confirmed the cached image, so it counts as downloaded, e.g. for the
+                                # collection deletion.
+                                image.status_code = 200
+                                image.reason = 'OK'
+                                return
+                            elif response.status == 200 and response.content_type == 'image/jpeg':
+                                blob_writer = await blob_cache.open_writer(url, response.headers)
+                                try:
+                                    await self.__save_image(image, response.content, str(response.url),
+                                                            archive_writer, blob_writer)
+                                finally:
+                                    if blob_writer is not None:
+                                        # Removes the temporary file unless the image was added to the cache.
+                                        blob_writer.discard()
+                                logging.info(f"Successfully downloaded image #{image.index} from: {url}.")
+                                image.is_success = True
+                                image.status_code = response.status
+                                image.reason = response.reason
+                                return
                             else:
-                                creation_date = image.creation_date
-                            file_name_substitute_dict = {
-                                'date': creation_date,
-                                'index': image.index,
-                                'prompt': filename_image_prompt[:50],
-                                'sep': '_'
-                            }
-                            template = string.Template(self.__config.filename_pattern)
-                            file_name_formatted = template.safe_substitute(file_name_substitute_dict)
-                            image_bytes = await response.read()
-                            with PIL_Image.open(BytesIO(image_bytes)) as pil_image:
-                                image_width = pil_image.width
-                            if image_width < 1024:
-                                file_name_formatted += '_T'
-                                image.is_thumbnail = True
-                            filename = f"{temp_dir}{os.sep}{file_name_formatted}.jpg"
-
-                            async with aiofiles.open(filename, "wb") as f:
-                                await f.write(image_bytes)
-
-                            image.used_image_url = str(response.url)
-                            image.file_name = filename
-                            await ImageUtility.add_exif_metadata(image)
-                            logging.info(f"Successfully downloaded image #{image.index} from: {url}.")
-                            image.is_success = True
-                            image.status_code = response.status
-                            image.reason = response.reason
-                            return
-                        else:
-                            warning_output = (f"Image #{image.index}: Failed to download {url} "
-                                              f"for Reason: {response.status}: {response.reason}")
-                            if index != len(image.image_urls) - 1:
-                                warning_output += " -> Retrying with next URL."
-                            logging.warning(warning_output)
-                    image.status_code = response.status
-                    image.reason = response.reason
+                                warning_output = (f"Image #{image.index}: Failed to download {url} "
+                                                  f"for Reason: {response.status}: {response.reason}")
+                                if index != len(image.image_urls) - 1:
+                                    warning_output += " -> Retrying with next URL."
+                                logging.warning(warning_output)
+                    except asyncio.TimeoutError:
+                        # Timeouts while streaming the body aren't traced, so they are recorded here.
+                        self.__scheduler.record_throttle()
+                        raise
+                    except CircuitOpenError as e:
+                        logging.warning(f"Image #{image.index}: Skipped {url}: {e}")
+                        image.reason = str(e)
+                        continue
+                image.status_code = response.status
+                image.reason = response.reason
             logging.error(f"Image #{image.index}: Failed to download from any sources.")
         except Exception as e:
             if Config().value['debug']['debug']:
@@ -147,14 +486,104 @@ class ImageDownload:
             else:
                 logging.error(e)
 
-    def __delete_collection(self) -> None:
+    async def __save_image(
+            self,
+            image: Image,
+            content: aiohttp.StreamReader | BlobReader,
+            image_url: str,
+            archive_writer: ArchiveWriter,
+            blob_writer: BlobWriter | None = None) -> None:
+        """
+        Streams the image into the archive and adds the EXIF metadata.
+        Only the head of the body is inspected and kept in memory as a whole, the rest is streamed in chunks.
+        If deduplication is enabled and an image with the same content was already archived, a link to it is archived.
+        :param image: :class:`BingCreatorImage` the content belongs to.
+        :param content: The body of the successful response or the cached image.
+        :param image_url: The URL the image was downloaded from.
+        :param archive_writer: The writer that archives the image.
+        :param blob_writer: The writer that adds the original image to the blob cache, discarded by the caller, or None.
+        :return: None
+        """
+        file_name_formatted = await CpuExecutor().run(
+            ImageUtility.format_file_name,
+            image.prompt,
+            image.creation_date,
+            image.index,
+            self.__config.filename_pattern,
+            self.__config.use_local_time_zone
+        )
+        is_downloaded = not isinstance(content, BlobReader)
+        reserved = await self.__byte_budget.reserve(self.MAX_HEAD_SIZE)
+        try:
+            head = await ImageUtility.read_image_head(content, self.HEAD_SIZE, self.MAX_HEAD_SIZE)
+            size = len(head)
+            if is_downloaded:
+                ProgressBus().publish(ProgressBus.BYTES_DOWNLOADED, size)
+            content_hash = hashlib.sha256(head)
+            if blob_writer is not None:
+                await blob_writer.write(head)
+            image.used_image_url = image_url
+            with Metrics().timer('exif_seconds'):
+                image_width, head = await CpuExecutor().run(ImageUtility.process_image_head, head,
+                                                            ImageUtility.get_user_comment(image))
+            if image_width < 1024:
+                file_name_formatted += '_T'
+                image.is_thumbnail = True
+            image.file_name = f"{file_name_formatted}.jpg"
+        finally:
+            self.__byte_budget.release(reserved)
+
+        archive_entry = archive_writer.open_entry(ImageDownload.__get_arcname(image), image.collection_name)
+        try:
+            await archive_entry.write(head)
+            async for chunk in content.iter_chunked(self.CHUNK_SIZE):
+                content_hash.update(chunk)
+                size += len(chunk)
+                if is_downloaded:
+                    ProgressBus().publish(ProgressBus.BYTES_DOWNLOADED, len(chunk))
+                await archive_entry.write(chunk)
+                if blob_writer is not None:
+                    await blob_writer.write(chunk)
+        except BaseException:
+            archive_entry.discard()
+            raise
+        Metrics().increment('image_bytes_total', size, source='network' if is_downloaded else 'cache')
+        if blob_writer is not None:
+            await blob_writer.commit(content_hash.hexdigest())
+        if self.__config.download_deduplicate:
+            # Backstop for duplicates whose identity differs, e.g. because the same image was saved twice.
+            stored_arcname = self.__content_hashes.setdefault(content_hash.hexdigest(), archive_entry.arcname)
+            if stored_arcname != archive_entry.arcname:
+                archive_entry.discard()
+                logging.info(f"Image #{image.index} has the same content as {stored_arcname}, linking to it.")
+                await ImageDownload.__archive_link(image, stored_arcname, archive_writer)
+                return
+        await archive_entry.commit()
+
+    @staticmethod
+    def __get_arcname(image: Image) -> str:
+        """
+        Returns the path of the image inside the archive.
+        :param image: The downloaded :class:`Image`.
+        :return: The path consisting of the collection name and the file name.
+        """
+        return os.path.join(image.collection_name, image.file_name)
+
+    async def __delete_collection(self, incomplete_collection_ids: Set[str], output_finalized: asyncio.Event) -> None:
         """
         Deletes the collection by the method specified in the config.
+        Collections that weren't fetched completely are never deleted.
+        :param incomplete_collection_ids: The ids of the collections that weren't fetched completely.
+        :param output_finalized: Set once the output was finalized, the collections aren't deleted before.
         :return: None
         """
         deletion_strategy = (CollectionUtility
                              .get_collection_deletion_strategy(self.__config.delete_collection_after_download_mode))
+        if incomplete_collection_ids:
+            logging.warning(f"Skipping deletion of {len(incomplete_collection_ids)} incomplete collections.")
         if deletion_strategy:
-            deletion_strategy.delete_collection(self.__images)
+            await deletion_strategy.delete_collection([image for image in self.__images
+                                                       if image.collection_id not in incomplete_collection_ids],
+                                                      output_finalized)
         else:
             logging.warning("Collections will not be deleted as no valid method was specified in the config.")
@@ -1,4 +1,5 @@
 import abc
+import asyncio
 from typing import List
 
 from models.image import Image
@@ -10,7 +11,8 @@ class CollectionDeletionStrategy(abc.ABC):
     """
 
     @abc.abstractmethod
-    def delete_collection(self, images: List[Image]) -> None:
+    async def delete_collection(self, images: List[Image], output_finalized: asyncio.Event = None) -> None:
         """
         Abstract method for deleting collections.
+        The collections are chosen right away, but only deleted once output_finalized is set.
         """
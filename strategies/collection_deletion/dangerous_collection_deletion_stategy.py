@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List
 
@@ -11,13 +12,14 @@ class DangerousCollectionDeletionStrategy(CollectionDeletionStrategy):
     Deletes the collection(s) whether all images were downloaded successfully or not.
     """
 
-    def delete_collection(self, images: List[Image]) -> None:
+    async def delete_collection(self, images: List[Image], output_finalized: asyncio.Event = None) -> None:
         """
         Deletes the collection(s) whether all images were downloaded successfully or not.
         :return: None.
         """
         collection_ids = list(set(image.collection_id for image in images))
         if collection_ids:
-            CollectionUtility.delete_collection(collection_ids=collection_ids)
+            await CollectionUtility.delete_collection(collection_ids=collection_ids,
+                                                      output_finalized=output_finalized)
         else:
             logging.warning("No collections were valid for deletion.")
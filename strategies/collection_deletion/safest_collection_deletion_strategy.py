@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from itertools import groupby
 from typing import List
@@ -12,7 +13,7 @@ class SafestCollectionDeletionStrategy(CollectionDeletionStrategy):
     Deletes the collection(s) if all images were downloaded successfully.
     """
 
-    def delete_collection(self, images: List[Image]) -> None:
+    async def delete_collection(self, images: List[Image], output_finalized: asyncio.Event = None) -> None:
         """
         Deletes the collection(s) only if all images were downloaded successfully.
         """
@@ -21,9 +22,10 @@ class SafestCollectionDeletionStrategy(CollectionDeletionStrategy):
                                            in groupby(images, key=lambda image: image.collection_id)}
         collection_ids_to_delete = []
         for collection_id, image_group in grouped_by_collection_id_images.items():
-            if len(images) != 1000 and all(image.status_code == 200 and image.is_success for image in image_group):
+            if all(image.status_code == 200 and image.is_success for image in image_group):
                 collection_ids_to_delete.append(collection_id)
         if collection_ids_to_delete:
-            CollectionUtility.delete_collection(collection_ids=collection_ids_to_delete)
+            await CollectionUtility.delete_collection(collection_ids=collection_ids_to_delete,
+                                                      output_finalized=output_finalized)
         else:
             logging.warning("No collections were valid for deletion.")
@@ -3,24 +3,26 @@ import json
 import logging
 import os
 import re
-from asyncio import Semaphore
-from datetime import timezone, date
-from typing import List
-
-from dateutil import parser as dateutil_parser
+from datetime import date
+from typing import AsyncIterator, List
 
 from models.image import Image
 from strategies.image_source.image_source_strategy import ImageSourceStrategy
+from utilities.client_manager import ClientManager
 from utilities.config import Config
+from utilities.cpu_executor import CpuExecutor
 from utilities.image_utility import ImageUtility
 from utilities.image_validator import ImageValidator
-from utilities.network_utility import NetworkUtility
+from utilities.metrics import Metrics
+from utilities.progress_bus import ProgressBus
+from utilities.request_coalescer import RequestCoalescer
 
 
 class APIImageSourceStrategy(ImageSourceStrategy):
     """
     Strategy class for getting images from the collection API.
     """
+    PAGE_SIZE = 1000
 
     async def get_images(self) -> List[Image]:
         """
@@ -28,24 +30,111 @@ class APIImageSourceStrategy(ImageSourceStrategy):
         :return: A list containing :class:`BingCreatorImage` objects.
         :rtype: List[Image]
         """
+        return [image async for image in self.iter_images()]
+
+    async def iter_images(self) -> AsyncIterator[Image]:
+        """
+        Pages through all collections and yields the images of each page as soon as their additional data is set.
+        Indices are assigned in collection and item order, so they stay the same across runs.
+        :return: An async iterator of :class:`BingCreatorImage` objects.
+        """
         cookie = os.getenv('COOKIE')
         if cookie:
             logging.debug(f"Loaded cookie ending with: {cookie[-16:]}")
         else:
             raise Exception("No cookie was found in the .env file.")
-        images = APIImageSourceStrategy.get_image_data()
-        await APIImageSourceStrategy.__gather_additional_data(images)
-
-        return images
+        logging.info(f"Fetching metadata of collections...")
+        coalescer = RequestCoalescer()
+        index = 1
+        collection_dict = await APIImageSourceStrategy.__get_collection_page()
+        if len(collection_dict['collections']) == 0:
+            raise Exception('No collections were found for the given cookie.')
+        for collection in collection_dict['collections']:
+            if not ImageValidator.should_add_collection_to_images(collection):
+                continue
+            if Config().value['debug']['debug']:
+                with open('collection_dict_dump_debug.json', 'w') as f:
+                    f.write(json.dumps(collection))
+            collection_page = collection['collectionPage']
+            next_page_task: asyncio.Task | None = None
+            try:
+                while True:
+                    continuation_token = collection_page.get('continuationToken')
+                    if continuation_token:
+                        # The next page loads while the images of this one are completed and downloaded.
+                        logging.info(f"Fetching next page of collection {collection['title']}...")
+                        next_page_task = asyncio.create_task(APIImageSourceStrategy.__get_collection_page(
+                            collection['id'], continuation_token))
+                    images = APIImageSourceStrategy.get_image_data(collection, collection_page, index)
+                    index += len(images)
+                    await APIImageSourceStrategy.__gather_additional_data(images, coalescer)
+                    ProgressBus().publish(ProgressBus.METADATA_FETCHED, len(images))
+                    for image in images:
+                        yield image
+                    if not continuation_token:
+                        if len(collection_page['items']) >= self.PAGE_SIZE:
+                            logging.warning(f"Collection {collection['title']} returned a full page without a way "
+                                            f"to fetch the next one, so it may be incomplete.")
+                            self.incomplete_collection_ids.add(collection['id'])
+                        break
+                    next_collection_dict = await next_page_task
+                    next_page_task = None
+                    collection_page = next_collection_dict['collections'][0]['collectionPage']
+            finally:
+                if next_page_task is not None:
+                    # The iteration stopped early, so the page isn't needed anymore, nor is its failure.
+                    next_page_task.cancel()
+                    await asyncio.gather(next_page_task, return_exceptions=True)
 
     @staticmethod
-    def get_image_data():
+    def get_image_data(collection: dict, collection_page: dict, start_index: int) -> List[Image]:
         """
-        Gathers all necessary data for each image from all collections.
+        Gathers all necessary data for each image of a collection page.
+        :param collection: The collection the page belongs to.
+        :param collection_page: The page containing the items.
+        :param start_index: The index of the first image on the page.
         :return: A list containing :class:`BingCreatorImage` objects.
         :rtype: List[Image]
         """
-        logging.info(f"Fetching metadata of collections...")
+        gathered_image_data = []
+        index = start_index
+        for item in collection_page['items']:
+            if ImageValidator.should_add_item_to_images(item):
+                custom_data = json.loads(item['content']['customData'])
+                image_page_url = custom_data['PageUrl']
+                image_url = custom_data['MediaUrl']
+                image_prompt = custom_data['ToolTip']
+                date_modified = item['dateModified']
+                collection_id = collection['id']
+                collection_name = collection['title']
+                pattern = r'Image \d of \d$'
+                image_prompt = re.sub(pattern, '', image_prompt)
+                image = Image(
+                    prompt=image_prompt,
+                    collection_id=collection_id,
+                    collection_name=collection_name,
+                    page_url=image_page_url,
+                    index=str(index).zfill(4),
+                    date_modified=date_modified
+                )
+                image.add_image_url(1, image_url)
+                if 'thumbnails' in item['content']:
+                    thumbnail_raw = item['content']['thumbnails'][0]['thumbnailUrl']
+                    thumbnail_url = re.match('^[^&]+', thumbnail_raw).group(0)
+                    image.add_image_url(3, thumbnail_url)
+                gathered_image_data.append(image)
+                index += 1
+        return gathered_image_data
+
+    @staticmethod
+    async def __get_collection_page(collection_id: str = None, continuation_token: str = None) -> dict:
+        """
+        Fetches a page of the collections from the collection API.
+        Without a collection id the first page of every collection is returned.
+        :param collection_id: The collection to fetch the next page of.
+        :param continuation_token: The token of the previous page of the collection.
+        :return: The collection dictionary of the response.
+        """
         header = {
             "Content-Type": "application/json",
             "cookie": os.getenv('COOKIE'),
@@ -53,95 +142,58 @@ class APIImageSourceStrategy(ImageSourceStrategy):
         }
         body = {
             "collectionItemType": "all",
-            "maxItemsToFetch": 1000,
+            "maxItemsToFetch": APIImageSourceStrategy.PAGE_SIZE,
             "shouldFetchMetadata": True
         }
-        response = NetworkUtility.create_session().post(
-            url='https://www.bing.com/mysaves/collections/get?sid=0',
-            headers=header,
-            data=json.dumps(body)
-        )
-        if response.status_code == 200:
-            collection_dict = response.json()
-            if len(collection_dict['collections']) == 0:
-                raise Exception('No collections were found for the given cookie.')
-            gathered_image_data = []
-            index = 1
-            for collection in collection_dict['collections']:
-                if ImageValidator.should_add_collection_to_images(collection):
-                    if Config().value['debug']['debug']:
-                        with open('collection_dict_dump_debug.json', 'w') as f:
-                            f.write(json.dumps(collection))
-                    for item in collection['collectionPage']['items']:
-                        if ImageValidator.should_add_item_to_images(item):
-                            custom_data = json.loads(item['content']['customData'])
-                            image_page_url = custom_data['PageUrl']
-                            image_url = custom_data['MediaUrl']
-                            image_prompt = custom_data['ToolTip']
-                            date_modified = item['dateModified']
-                            collection_id = collection['id']
-                            collection_name = collection['title']
-                            image_urls = [(1, image_url)]
-                            if 'thumbnails' in item['content']:
-                                thumbnail_raw = item['content']['thumbnails'][0]['thumbnailUrl']
-                                thumbnail_url = re.match('^[^&]+', thumbnail_raw).group(0)
-                                image_urls.append((3, thumbnail_url))
-                            pattern = r'Image \d of \d$'
-                            image_prompt = re.sub(pattern, '', image_prompt)
-                            image = Image(
-                                image_urls=image_urls,
-                                prompt=image_prompt,
-                                collection_id=collection_id,
-                                collection_name=collection_name,
-                                page_url=image_page_url,
-                                index=str(index).zfill(4),
-                                date_modified=date_modified
-                            )
-                            gathered_image_data.append(image)
-                            index += 1
-            return gathered_image_data
-        else:
-            raise Exception(f"Fetching collection failed with Error code "
-                            f"{response.status_code}: {response.reason};{response.text}")
+        if collection_id is not None:
+            body["collectionIds"] = [collection_id]
+            body["continuationToken"] = continuation_token
+        with Metrics().timer('collections_api_seconds'):
+            async with ClientManager().create_retry_client(attempts=5).post(
+                    url=f"{Config().base_url}/mysaves/collections/get?sid=0",
+                    headers=header,
+                    data=json.dumps(body)
+            ) as response:
+                if response.status == 200:
+                    return await response.json(content_type=None)
+                else:
+                    raise Exception(f"Fetching collection failed with Error code "
+                                    f"{response.status}: {response.reason};{await response.text()}")
 
     @staticmethod
-    async def __gather_additional_data(images) -> None:
+    async def __gather_additional_data(images: List[Image], coalescer: RequestCoalescer) -> None:
         """
         Sets the creation date and adds additional fetch URLs for each image.
+        :param images: The images to set the data for.
+        :param coalescer: Shares detail API requests between images of the same set.
         :return: None
         """
-        semaphore = Semaphore(250)
         tasks = [
-            APIImageSourceStrategy.__set_additional_data(image, semaphore)
+            APIImageSourceStrategy.__set_additional_data(image, coalescer)
             for image
             in images
         ]
         await asyncio.gather(*tasks)
 
     @staticmethod
-    async def __set_additional_data(image: Image, semaphore: asyncio.Semaphore) -> None:
+    async def __set_additional_data(image: Image, coalescer: RequestCoalescer) -> None:
         """
         Fetches and sets additional data from the detail API.
-        :param semaphore: Limits concurrency for the request.
+        :param coalescer: Shares detail API requests between images of the same set.
         :param image: :class:`BingCreatorImage` object to set the `creation_date` value for.
         :return: None
         """
         extracted_ids = await ImageUtility.extract_set_and_image_id(image.page_url)
         image_set_id = extracted_ids['image_set_id']
         image_id = extracted_ids['image_id']
-        response_image = await ImageUtility.get_detail_image(image_set_id, image_id, semaphore)
+        response_image = await ImageUtility.get_detail_image(image_set_id, image_id, coalescer)
         if response_image is not None:
             creation_date_string = response_image['datePublished']
-            if not any(response_image['contentUrl'] == url for _, url in image.image_urls):
-                image.image_urls.append((2, response_image['contentUrl']))
-            if not any(response_image['thumbnailUrl'] == url for _, url in image.image_urls):
-                image.image_urls.append((4, response_image['thumbnailUrl']))
-            image.image_urls = sorted(image.image_urls, key=lambda url: url[0])
+            image.add_image_url(2, response_image['contentUrl'])
+            image.add_image_url(4, response_image['thumbnailUrl'])
         elif image.date_modified is not None:
             creation_date_string = image.date_modified
         else:
             creation_date_string = date.today().isoformat()
 
-        creation_date_object = dateutil_parser.parse(creation_date_string).astimezone(timezone.utc)
-        creation_date_string_formatted = creation_date_object.strftime('%Y-%m-%dT%H%MZ')
-        image.creation_date = creation_date_string_formatted
+        image.creation_date = await CpuExecutor().run(ImageUtility.format_creation_date, creation_date_string)
@@ -1,100 +1,106 @@
 import asyncio
 import logging
-from asyncio import Semaphore
-from datetime import timezone
-from typing import List, Dict
-
-from dateutil import parser as dateutil_parser
+import random
+from typing import AsyncIterator, Dict, List, Tuple
 
 from utilities.config import Config
+from utilities.cpu_executor import CpuExecutor
 from models.image import Image
 from strategies.image_source.image_source_strategy import ImageSourceStrategy
 from utilities.image_utility import ImageUtility
+from utilities.metrics import Metrics
+from utilities.progress_bus import ProgressBus
+from utilities.request_coalescer import RequestCoalescer
 
 
 class FileImageSourceStrategy(ImageSourceStrategy):
     """
     Concrete strategy class for getting images from the images_clipboard.txt file.
     """
+    RETRY_BACKOFF_BASE = 1
+    RETRY_BACKOFF_MAX = 30
 
     async def get_images(self) -> List[Image]:
+        return [image async for image in self.iter_images()]
+
+    async def iter_images(self) -> AsyncIterator[Image]:
         logging.info(f"Fetching metadata of images...")
         image_id_list = await FileImageSourceStrategy.__get_image_ids_from_file()
-        semaphore = Semaphore(250)
-        images = await self.get_image_data_retry(image_id_list, semaphore, Config().detail_max_attempts())
-        images = [image for image in images if image is not None]
-
-        return images
+        ProgressBus().publish(ProgressBus.IMAGES_EXPECTED, len(image_id_list))
+        coalescer = RequestCoalescer()
+        async for image in self.iter_image_data_retry(image_id_list, coalescer, Config().detail_max_attempts()):
+            ProgressBus().publish(ProgressBus.METADATA_FETCHED)
+            yield image
 
     @staticmethod
-    async def get_image_data_retry(image_id_list: List[Dict], semaphore: Semaphore, attempts: int) -> List[Image]:
+    async def iter_image_data_retry(
+            image_id_list: List[Dict],
+            coalescer: RequestCoalescer,
+            attempts: int) -> AsyncIterator[Image]:
         """
-        Tries to get all image data until there are no None values or all attempts were used.
+        Yields the data of each image as soon as it was gathered.
+        Only the images whose data couldn't be gathered are tried again, after a jittered exponential backoff,
+        until all attempts were used. The attempts needed are recorded on each image.
         :param image_id_list: List of dictionaries containing the image_set_id and image_id.
-        :param semaphore: Used to regulate the maximum number of concurrent tasks.
+        :param coalescer: Shares detail API requests between images of the same set.
         :param attempts: How many times to retry.
-        :return: A list of :class:`Image` objects
+        :return: An async iterator of :class:`Image` objects.
         """
-        current_images = await FileImageSourceStrategy.gather_images(image_id_list, semaphore)
-        attempts_made = 1
-        while None in current_images and attempts_made < attempts:
-            logging.warning(f"Failed to get detailed information for some images."
-                            f"Retrying ({attempts_made}) and merging...")
-            new_images = await FileImageSourceStrategy.gather_images(image_id_list, semaphore)
-            result = map(
-                lambda current_image, new_image: current_image if current_image is not None else new_image,
-                current_images,
-                new_images
-            )
-            current_images = list(result)
+        pending_image_ids = dict(enumerate(image_id_list))
+        attempts_made = 0
+        while pending_image_ids and attempts_made < attempts:
+            if attempts_made > 0:
+                backoff = random.uniform(0, min(FileImageSourceStrategy.RETRY_BACKOFF_MAX,
+                                                FileImageSourceStrategy.RETRY_BACKOFF_BASE * 2 ** (attempts_made - 1)))
+                logging.warning(f"Failed to get detailed information for {len(pending_image_ids)} images. "
+                                f"Retrying them ({attempts_made}) in {backoff:.1f} seconds...")
+                Metrics().increment('detail_retry_images_total', len(pending_image_ids))
+                await asyncio.sleep(backoff)
             attempts_made += 1
-        return current_images
+            tasks = [
+                FileImageSourceStrategy.__get_indexed_image_data(image_ids, coalescer, index)
+                for index, image_ids
+                in pending_image_ids.items()
+            ]
+            for task in asyncio.as_completed(tasks):
+                index, image = await task
+                if image is not None:
+                    del pending_image_ids[index]
+                    image.detail_attempts = attempts_made
+                    yield image
+        if pending_image_ids:
+            logging.error(f"Failed to get detailed information for {len(pending_image_ids)} images "
+                          f"after {attempts_made} attempts.")
 
     @staticmethod
-    async def gather_images(image_id_list: List[Dict], semaphore: Semaphore) -> List[Image]:
-        """
-        Gathers all images from the image_id_list.
-        :param image_id_list: List of dictionaries containing the image_set_id and image_id.
-        :param semaphore: Used to regulate the maximum number of concurrent tasks.
-        :return: List of :class:`Image` objects.
-        """
-        tasks = [
-            FileImageSourceStrategy.get_image_data(image_ids, semaphore, index)
-            for index, image_ids
-            in enumerate(image_id_list)
-        ]
-        images = await asyncio.gather(*tasks)
-        return list(images)
+    async def __get_indexed_image_data(image_ids, coalescer, index) -> Tuple[int, Image | None]:
+        return index, await FileImageSourceStrategy.get_image_data(image_ids, coalescer, index)
 
     @staticmethod
-    async def get_image_data(image_ids, semaphore, index) -> Image | None:
+    async def get_image_data(image_ids, coalescer, index) -> Image | None:
         """
         Gathers all necessary data and creates an :class:`Image` object.
         :param image_ids: A dictionary containing the image_set_id and image_id.
-        :param semaphore: Used to regulate the maximum number of concurrent tasks.
+        :param coalescer: Shares detail API requests between images of the same set.
         :param index: Index the image should have.
         :return: An :class:`Image` object or None
         """
         image_set_id = image_ids['image_set_id']
         image_id = image_ids['image_id']
-        detail_image = await ImageUtility.get_detail_image(image_set_id, image_id, semaphore)
+        detail_image = await ImageUtility.get_detail_image(image_set_id, image_id, coalescer)
         if detail_image is not None:
-            image_urls = [
-                (1, detail_image['contentUrl']),
-                (2, detail_image['thumbnailUrl'])
-            ]
             prompt = detail_image['imageAltText']
             page_url = detail_image['hostPageUrl']
-            creation_date_string = detail_image['datePublished']
-            creation_date_object = dateutil_parser.parse(creation_date_string).astimezone(timezone.utc)
-            creation_date = creation_date_object.strftime('%Y-%m-%dT%H%MZ')
-            return Image(
-                image_urls=image_urls,
+            creation_date = await CpuExecutor().run(ImageUtility.format_creation_date, detail_image['datePublished'])
+            image = Image(
                 prompt=prompt,
                 index=str(index + 1).zfill(4),
                 page_url=page_url,
                 creation_date=creation_date
             )
+            image.add_image_url(1, detail_image['contentUrl'])
+            image.add_image_url(2, detail_image['thumbnailUrl'])
+            return image
         else:
             logging.error(f"Failed to get detailed information for image: {image_ids}"
                           f" for Reason: API response is missing data.")
@@ -103,7 +109,7 @@ class FileImageSourceStrategy(ImageSourceStrategy):
     async def __get_image_ids_from_file() -> List[dict]:
         with open("images_clipboard.txt", "r", encoding='utf8') as f:
             content = f.read().splitlines()
-        image_url_list = [line for line in content if line.startswith("https://www.bing.com/images/create")]
+        image_url_list = [line for line in content if line.startswith(f"{Config().base_url}/images/create")]
         image_ids = [await ImageUtility.extract_set_and_image_id(url) for url in reversed(image_url_list)]
 
         return image_ids
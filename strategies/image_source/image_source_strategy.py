@@ -1,7 +1,8 @@
 import abc
-from typing import List
+from typing import AsyncIterator, List, Set
 
 from models.image import Image
+from utilities.progress_bus import ProgressBus
 
 
 class ImageSourceStrategy(abc.ABC):
@@ -9,6 +10,10 @@ class ImageSourceStrategy(abc.ABC):
     Abstract base class for image source strategies.
     """
 
+    def __init__(self):
+        # Collections whose images couldn't all be gathered, so they must not be deleted.
+        self.incomplete_collection_ids: Set[str] = set()
+
     @abc.abstractmethod
     async def get_images(self) -> List[Image]:
         """
@@ -16,3 +21,14 @@ class ImageSourceStrategy(abc.ABC):
         :return: A list containing :class:`Image` objects.
         :rtype: List[Image]
         """
+
+    async def iter_images(self) -> AsyncIterator[Image]:
+        """
+        Yields the images as soon as they are ready, so they can be downloaded while the rest is still gathered.
+        Strategies that can't provide images early yield them after :meth:`get_images` finished.
+        :return: An async iterator of :class:`Image` objects.
+        """
+        images = await self.get_images()
+        ProgressBus().publish(ProgressBus.METADATA_FETCHED, len(images))
+        for image in images:
+            yield image
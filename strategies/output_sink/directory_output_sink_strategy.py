@@ -0,0 +1,91 @@
+import glob
+import logging
+import os
+import posixpath
+import shutil
+from typing import IO, Set
+
+from strategies.output_sink.output_sink_strategy import OutputSinkStrategy
+
+
+class DirectoryOutputSinkStrategy(OutputSinkStrategy):
+    """
+    Writes the images as plain files into a folder, so they don't have to be extracted from an archive afterward.
+    Every file is written under a temporary name first and renamed once it's complete, so other programs watching the
+    folder never see a partial image.
+    """
+    PARTIAL_SUFFIX = '.part'
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def open(self, append: bool) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+    def write(self, arcname: str, data: bytes | str | IO[bytes]) -> int:
+        filename = self.__get_filename(arcname)
+        partial_filename = f"{filename}{self.PARTIAL_SUFFIX}"
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        try:
+            with open(partial_filename, 'wb') as f:
+                if isinstance(data, bytes):
+                    f.write(data)
+                else:
+                    data.seek(0)
+                    shutil.copyfileobj(data, f, self.COPY_CHUNK_SIZE)
+                size = f.tell()
+            os.replace(partial_filename, filename)
+        except BaseException:
+            DirectoryOutputSinkStrategy.__remove(partial_filename)
+            raise
+        return size
+
+    def write_link(self, arcname: str, target: str) -> None:
+        filename = self.__get_filename(arcname)
+        partial_filename = f"{filename}{self.PARTIAL_SUFFIX}"
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        DirectoryOutputSinkStrategy.__remove(partial_filename)
+        try:
+            os.symlink(target.replace('/', os.sep), partial_filename)
+        except OSError:
+            # Creating symbolic links needs extra privileges on Windows, so the file is copied instead.
+            target_filename = os.path.normpath(os.path.join(os.path.dirname(filename), target.replace('/', os.sep)))
+            shutil.copyfile(target_filename, partial_filename)
+        os.replace(partial_filename, filename)
+
+    def close(self) -> None:
+        pass
+
+    def recover(self, arcnames: Set[str]) -> Set[str]:
+        """
+        Keeps the files of an earlier run that are complete and removes the ones that were still being written.
+        :param arcnames: The entries to keep.
+        :return: The entries whose files exist.
+        """
+        if not os.path.isdir(self.path):
+            return set()
+        for partial_filename in glob.glob(os.path.join(glob.escape(self.path), '**', f"*{self.PARTIAL_SUFFIX}"),
+                                          recursive=True):
+            DirectoryOutputSinkStrategy.__remove(partial_filename)
+        recovered = {arcname for arcname in arcnames if os.path.isfile(self.__get_filename(arcname))}
+        logging.info(f"Recovered {len(recovered)} images from {self.path}.")
+
+        return recovered
+
+    def __get_filename(self, arcname: str) -> str:
+        """
+        Returns the path of an entry inside the folder. Entries can't escape it, e.g. through a collection named "..".
+        :param arcname: Path of the entry.
+        :return: The path of the file.
+        """
+        relative_filename = posixpath.normpath(arcname.replace(os.sep, '/')).lstrip('/')
+        if relative_filename == '..' or relative_filename.startswith('../'):
+            raise ValueError(f"The entry {arcname} is outside of {self.path}.")
+        return os.path.join(self.path, *relative_filename.split('/'))
+
+    @staticmethod
+    def __remove(filename: str) -> None:
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
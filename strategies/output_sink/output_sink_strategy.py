@@ -0,0 +1,67 @@
+import abc
+from typing import IO, Set
+
+
+class OutputSinkStrategy(abc.ABC):
+    """
+    Abstract base class for the output the downloaded images are written to.
+    All methods except :meth:`recover` are called on the writer thread of the output, one entry at a time.
+    """
+    # Appended to the base filename, also used to find the outputs of an earlier run.
+    EXTENSION = ''
+
+    def __init__(self, base_filename: str):
+        """
+        :param base_filename: The path of the output without extension, e.g. /downloads/bing_images_2024-01-01.
+        """
+        self.base_filename = base_filename
+
+    @property
+    def path(self) -> str:
+        """
+        Returns where the output is written to.
+        :return: The path of the archive or folder.
+        """
+        return f"{self.base_filename}{self.EXTENSION}"
+
+    @abc.abstractmethod
+    def open(self, append: bool) -> None:
+        """
+        Opens the output.
+        :param append: Whether to keep the entries of an earlier run, which were restored by :meth:`recover`.
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def write(self, arcname: str, data: bytes | str | IO[bytes]) -> int:
+        """
+        Writes an entry.
+        :param arcname: Path of the entry inside the output.
+        :param data: Content of the entry or a file object to copy it from.
+        :return: The size of the entry in bytes.
+        """
+
+    @abc.abstractmethod
+    def write_link(self, arcname: str, target: str) -> None:
+        """
+        Writes a symbolic link to another entry.
+        :param arcname: Path of the link inside the output.
+        :param target: Path of the linked entry relative to the folder of the link, separated by slashes.
+        :return: None
+        """
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """
+        Finalizes the output.
+        :return: None
+        """
+
+    def recover(self, arcnames: Set[str]) -> Set[str]:
+        """
+        Restores the given entries of an earlier run, so a resumed run can append to them.
+        Outputs that can't be reopened recover nothing, so all images are fetched again.
+        :param arcnames: The entries to keep.
+        :return: The entries that were recovered.
+        """
+        return set()
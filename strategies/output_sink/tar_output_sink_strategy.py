@@ -0,0 +1,107 @@
+import io
+import logging
+import os
+import sys
+import tarfile
+import time
+from typing import IO, Set
+
+from strategies.output_sink.output_sink_strategy import OutputSinkStrategy
+
+
+class TarOutputSinkStrategy(OutputSinkStrategy):
+    """
+    Writes the images into an uncompressed TAR archive as a stream, so it can also be piped to another program through
+    the standard output, e.g. to extract it on another machine while the download is still running.
+    """
+    EXTENSION = '.tar'
+
+    def __init__(self, base_filename: str, to_stdout: bool = False):
+        """
+        :param base_filename: The path of the output without extension.
+        :param to_stdout: Whether to write the archive to the standard output instead of a file.
+        """
+        super().__init__(base_filename)
+        self.__to_stdout = to_stdout
+        self.__tar_file: tarfile.TarFile | None = None
+
+    @property
+    def path(self) -> str:
+        return '<stdout>' if self.__to_stdout else super().path
+
+    def open(self, append: bool) -> None:
+        if self.__to_stdout:
+            self.__tar_file = tarfile.open(fileobj=sys.stdout.buffer, mode='w|', format=tarfile.PAX_FORMAT)
+        elif append:
+            self.__tar_file = tarfile.open(self.path, mode='a', format=tarfile.PAX_FORMAT)
+        else:
+            self.__tar_file = tarfile.open(self.path, mode='w|', format=tarfile.PAX_FORMAT)
+
+    def write(self, arcname: str, data: bytes | str | IO[bytes]) -> int:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+        tar_info = TarOutputSinkStrategy.__create_tar_info(arcname)
+        # The size is part of the header, which is written before the content.
+        tar_info.size = data.seek(0, os.SEEK_END)
+        data.seek(0)
+        self.__tar_file.addfile(tar_info, data)
+        return tar_info.size
+
+    def write_link(self, arcname: str, target: str) -> None:
+        tar_info = TarOutputSinkStrategy.__create_tar_info(arcname)
+        tar_info.type = tarfile.SYMTYPE
+        tar_info.linkname = target
+        tar_info.mode = 0o777
+        self.__tar_file.addfile(tar_info)
+
+    def close(self) -> None:
+        if self.__tar_file is not None:
+            self.__tar_file.close()
+            self.__tar_file = None
+            if self.__to_stdout:
+                sys.stdout.buffer.flush()
+
+    def recover(self, arcnames: Set[str]) -> Set[str]:
+        """
+        Rebuilds the archive of an earlier run with the given entries. Entries that were cut off are dropped.
+        A stream to the standard output can't be reopened, so nothing is recovered then.
+        :param arcnames: The entries to keep.
+        :return: The entries that were recovered.
+        """
+        if self.__to_stdout:
+            logging.warning("The earlier run was streamed to the standard output, so all images are streamed again.")
+            return set()
+        if not os.path.exists(self.path):
+            return set()
+        partial_filename = f"{self.path}.partial"
+        os.replace(self.path, partial_filename)
+        # The journal uses the separator of the platform, the archive always slashes.
+        arcnames_by_name = {arcname.replace(os.sep, '/'): arcname for arcname in arcnames}
+        recovered = set()
+        with tarfile.open(self.path, mode='w', format=tarfile.PAX_FORMAT) as tar_file:
+            try:
+                with tarfile.open(partial_filename, mode='r|') as partial_tar_file:
+                    for tar_info in partial_tar_file:
+                        arcname = arcnames_by_name.get(tar_info.name)
+                        if arcname is None or arcname in recovered or not tar_info.isfile():
+                            continue
+                        data = partial_tar_file.extractfile(tar_info).read()
+                        if len(data) != tar_info.size:
+                            break
+                        tar_file.addfile(tar_info, io.BytesIO(data))
+                        recovered.add(arcname)
+            except (tarfile.TarError, EOFError) as e:
+                logging.info(f"Stopped reading {partial_filename} at an incomplete entry: {e}")
+        os.remove(partial_filename)
+        logging.info(f"Recovered {len(recovered)} images from {self.path}.")
+
+        return recovered
+
+    @staticmethod
+    def __create_tar_info(arcname: str) -> tarfile.TarInfo:
+        tar_info = tarfile.TarInfo(arcname.replace(os.sep, '/'))
+        tar_info.mtime = int(time.time())
+        tar_info.mode = 0o644
+        return tar_info
@@ -0,0 +1,129 @@
+import logging
+import os
+import shutil
+import stat
+import struct
+import time
+import zipfile
+import zlib
+from typing import IO, Iterator, Set, Tuple
+
+from strategies.output_sink.output_sink_strategy import OutputSinkStrategy
+
+
+class ZipOutputSinkStrategy(OutputSinkStrategy):
+    """
+    Writes the images into a ZIP archive. Entries are stored uncompressed, as JPEGs don't compress any further.
+    """
+    EXTENSION = '.zip'
+    COPY_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, base_filename: str):
+        super().__init__(base_filename)
+        self.__zip_file: zipfile.ZipFile | None = None
+
+    def open(self, append: bool) -> None:
+        self.__zip_file = zipfile.ZipFile(self.path, 'a' if append else 'w', compression=zipfile.ZIP_STORED,
+                                          allowZip64=True)
+
+    def write(self, arcname: str, data: bytes | str | IO[bytes]) -> int:
+        zip_info = ZipOutputSinkStrategy.__create_zip_info(arcname)
+        if isinstance(data, (bytes, str)):
+            self.__zip_file.writestr(zip_info, data)
+        else:
+            # The size has to be known up front, so zipfile can decide whether the entry needs zip64.
+            zip_info.file_size = data.seek(0, os.SEEK_END)
+            data.seek(0)
+            with self.__zip_file.open(zip_info, 'w') as entry_file:
+                shutil.copyfileobj(data, entry_file, self.COPY_CHUNK_SIZE)
+        return zip_info.file_size
+
+    def write_link(self, arcname: str, target: str) -> None:
+        zip_info = ZipOutputSinkStrategy.__create_zip_info(arcname)
+        # Unix mode bits mark the entry as a symbolic link whose content is the target path.
+        zip_info.create_system = 3
+        zip_info.external_attr = (stat.S_IFLNK | 0o777) << 16
+        self.__zip_file.writestr(zip_info, target)
+
+    def close(self) -> None:
+        if self.__zip_file is not None:
+            self.__zip_file.close()
+            self.__zip_file = None
+
+    def recover(self, arcnames: Set[str]) -> Set[str]:
+        """
+        Rebuilds the archive of an earlier run with the given entries.
+        Archives that were never finalized, e.g. because the program was killed, are read entry by entry from their
+        local headers. Entries that were cut off are dropped.
+        :param arcnames: The entries to keep.
+        :return: The entries that were recovered.
+        """
+        if not os.path.exists(self.path):
+            return set()
+        partial_filename = f"{self.path}.partial"
+        os.replace(self.path, partial_filename)
+        # The journal uses the separator of the platform, the archive always slashes.
+        arcnames_by_name = {arcname.replace(os.sep, '/'): arcname for arcname in arcnames}
+        recovered = set()
+        with zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+            for name, data in ZipOutputSinkStrategy.__read_entries(partial_filename):
+                arcname = arcnames_by_name.get(name)
+                if arcname is not None and arcname not in recovered:
+                    zip_file.writestr(ZipOutputSinkStrategy.__create_zip_info(arcname), data)
+                    recovered.add(arcname)
+        os.remove(partial_filename)
+        logging.info(f"Recovered {len(recovered)} images from {self.path}.")
+
+        return recovered
+
+    @staticmethod
+    def __create_zip_info(arcname: str) -> zipfile.ZipInfo:
+        zip_info = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+        zip_info.compress_type = zipfile.ZIP_STORED
+        zip_info.external_attr = 0o644 << 16
+        return zip_info
+
+    @staticmethod
+    def __read_entries(zip_filename: str) -> Iterator[Tuple[str, bytes]]:
+        """
+        Reads the stored entries of an archive, even if its central directory is missing.
+        :param zip_filename: The archive to read.
+        :return: Iterator of the entry names and contents.
+        """
+        if zipfile.is_zipfile(zip_filename):
+            with zipfile.ZipFile(zip_filename) as zip_file:
+                for zip_info in zip_file.infolist():
+                    yield zip_info.filename, zip_file.read(zip_info)
+            return
+
+        with open(zip_filename, 'rb') as f:
+            while len(header := f.read(30)) == 30 and header[0:4] == b'PK\x03\x04':
+                (flags, method, crc, compressed_size, size,
+                 name_length, extra_length) = struct.unpack('<6xHH4xIIIHH', header)
+                name = f.read(name_length).decode('utf-8' if flags & 0x800 else 'cp437')
+                extra = f.read(extra_length)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = ZipOutputSinkStrategy.__read_zip64_compressed_size(extra, size)
+                if method != zipfile.ZIP_STORED or flags & 0x08 or compressed_size is None:
+                    return
+                data = f.read(compressed_size)
+                if len(data) != compressed_size or zlib.crc32(data) != crc:
+                    return
+                yield name, data
+
+    @staticmethod
+    def __read_zip64_compressed_size(extra: bytes, size: int) -> int | None:
+        """
+        Reads the compressed size from the zip64 extra field of a local header.
+        :param extra: The extra field of the local header.
+        :param size: The uncompressed size from the local header. If it's also masked, it precedes the compressed size.
+        :return: The compressed size or None if the extra field is missing.
+        """
+        position = 0
+        while position + 4 <= len(extra):
+            header_id, data_size = struct.unpack('<HH', extra[position:position + 4])
+            if header_id == 0x0001:
+                offset = position + 4 + (8 if size == 0xFFFFFFFF else 0)
+                return struct.unpack('<Q', extra[offset:offset + 8])[0]
+            position += 4 + data_size
+        return None
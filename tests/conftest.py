@@ -0,0 +1,58 @@
+import asyncio
+import os
+import threading
+import tomllib
+from pathlib import Path
+
+import pytest
+
+from benchmarks.mock_bing_server import MockBingServer
+from utilities.config import Config
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def mock_server():
+    """
+    Runs the mock server on its own event loop in a background thread, so the tests can run the download with
+    asyncio.run while the server keeps answering.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = MockBingServer()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def config(mock_server, tmp_path, monkeypatch) -> dict:
+    """
+    Loads the config.toml for a download with the collection API from the mock server. The output and the caches are
+    written to the temporary directory of the test.
+    """
+    with open(REPOSITORY_DIR / 'config.toml', 'rb') as config_file:
+        config = tomllib.load(config_file)
+    config['network']['base_url'] = mock_server.base_url
+    config['image_source']['method'] = 'api'
+    config['collection']['collections_to_include'] = []
+    config['collection']['delete_collection_after_download']['toggle'] = False
+    config['metrics']['write_report'] = False
+    config['performance']['monitor_loop_lag'] = False
+    config['progress']['log_interval_seconds'] = 0
+    config['debug']['use_log_file'] = False
+    # The first instance takes over its argument, so it's created before the config is replaced.
+    Config()
+    monkeypatch.setattr(Config, '_config', config)
+    monkeypatch.setenv('COOKIE', 'test')
+    monkeypatch.setenv('DESTINATION_FOLDER', str(tmp_path / 'output'))
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmp_path / 'data'))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'data'))
+    monkeypatch.setattr(Path, 'home', lambda: tmp_path / 'home')
+    os.makedirs(tmp_path / 'output')
+    return config
@@ -0,0 +1,59 @@
+import asyncio
+
+from strategies.image_source.api_image_source_strategy import APIImageSourceStrategy
+from utilities.circuit_breaker import CircuitBreaker
+from utilities.client_manager import ClientManager
+from utilities.rate_limiter import RateLimiter
+
+
+async def iter_images(on_first_image=None) -> list:
+    RateLimiter().reset()
+    CircuitBreaker().reset()
+    images = []
+    async with ClientManager():
+        async for image in APIImageSourceStrategy().iter_images():
+            if not images and on_first_image is not None:
+                await on_first_image()
+            images.append(image)
+    return images
+
+
+def test_next_page_loads_while_the_current_page_is_processed(mock_server, config):
+    config['cache']['use_metadata_cache'] = False
+    config['rate_limit']['detail_per_second'] = 0
+    page_size = APIImageSourceStrategy.PAGE_SIZE
+    mock_server.create_catalog(page_size + 10)
+    requests_at_first_image = {}
+
+    async def on_first_image():
+        # The page is requested in the background, so it arrives while the first image is still being handled.
+        for _ in range(100):
+            if mock_server.request_counts['collections'] == 2:
+                break
+            await asyncio.sleep(0.01)
+        requests_at_first_image.update(mock_server.request_counts)
+
+    images = asyncio.run(iter_images(on_first_image))
+
+    assert len(images) == page_size + 10
+    assert requests_at_first_image['collections'] == 2
+    assert mock_server.request_counts['collections'] == 2
+
+
+def test_stopping_early_cancels_the_next_page(mock_server, config):
+    config['cache']['use_metadata_cache'] = False
+    config['rate_limit']['detail_per_second'] = 0
+    mock_server.create_catalog(APIImageSourceStrategy.PAGE_SIZE + 10)
+
+    async def take_first_image():
+        RateLimiter().reset()
+        CircuitBreaker().reset()
+        async with ClientManager():
+            images = APIImageSourceStrategy().iter_images()
+            image = await anext(images)
+            await images.aclose()
+        # Nothing is left running once the iteration was closed.
+        assert len(asyncio.all_tasks()) == 1
+        return image
+
+    assert asyncio.run(take_first_image()).index == '0001'
@@ -0,0 +1,73 @@
+import asyncio
+import errno
+import os
+import zipfile
+
+import pytest
+
+from models.image_download import ImageDownload
+from strategies.output_sink.zip_output_sink_strategy import ZipOutputSinkStrategy
+from utilities.archive_writer import ArchiveWriter
+from utilities.byte_budget import ByteBudget
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def write_entries(archive_writer: ArchiveWriter, entries: dict, on_commit=None) -> None:
+    for arcname, data in entries.items():
+        archive_entry = archive_writer.open_entry(arcname)
+        for offset in range(0, len(data), CHUNK_SIZE):
+            await archive_entry.write(data[offset:offset + CHUNK_SIZE])
+        await archive_entry.commit()
+        if on_commit is not None:
+            on_commit(arcname)
+
+
+@pytest.mark.parametrize('byte_budget_size', [10 * 1024 * 1024, 1], ids=['in_memory', 'spilled'])
+def test_entries_are_streamed_into_the_archive(tmp_path, byte_budget_size):
+    base_filename = str(tmp_path / 'bing_images')
+    entries = {f"Saved Images/image_{index}.jpg": os.urandom(3 * CHUNK_SIZE + index) for index in range(5)}
+    archive_sizes = []
+
+    async def main():
+        async with ArchiveWriter(base_filename, ByteBudget(byte_budget_size)) as archive_writer:
+            # A committed entry is in the archive right away, not only once it's finalized.
+            await write_entries(archive_writer, entries,
+                                lambda arcname: archive_sizes.append(os.path.getsize(f"{base_filename}.zip")))
+
+    asyncio.run(main())
+
+    assert archive_sizes[0] >= len(entries['Saved Images/image_0.jpg'])
+    assert archive_sizes == sorted(archive_sizes)
+    with zipfile.ZipFile(f"{base_filename}.zip") as zip_file:
+        assert zip_file.testzip() is None
+        assert {name: zip_file.read(name) for name in zip_file.namelist()} == entries
+
+
+def test_discarded_entry_is_not_archived(tmp_path):
+    base_filename = str(tmp_path / 'bing_images')
+    byte_budget = ByteBudget(1024 * 1024)
+
+    async def main():
+        async with ArchiveWriter(base_filename, byte_budget) as archive_writer:
+            await write_entries(archive_writer, {'kept.jpg': b'kept'})
+            archive_entry = archive_writer.open_entry('discarded.jpg')
+            await archive_entry.write(b'discarded')
+            archive_entry.discard()
+
+    asyncio.run(main())
+
+    assert byte_budget.available == byte_budget.limit
+    with zipfile.ZipFile(f"{base_filename}.zip") as zip_file:
+        assert zip_file.namelist() == ['kept.jpg']
+
+
+def test_run_fails_if_the_output_cannot_be_finalized(mock_server, config, monkeypatch):
+    mock_server.create_catalog(8)
+
+    def close(self):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(ZipOutputSinkStrategy, 'close', close)
+    with pytest.raises(OSError):
+        asyncio.run(ImageDownload().run())
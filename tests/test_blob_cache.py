@@ -0,0 +1,35 @@
+import asyncio
+
+from models.image_download import ImageDownload
+from utilities.blob_cache import BlobCache
+from utilities.image_utility import ImageUtility
+
+
+def test_failed_download_leaves_no_partial_blob(mock_server, config, monkeypatch):
+    mock_server.create_catalog(8)
+    config['cache']['use_blob_cache'] = True
+
+    def format_file_name(*args):
+        raise ValueError('Invalid file name')
+
+    # Fails before the image is streamed, right after the writer was opened.
+    monkeypatch.setattr(ImageUtility, 'format_file_name', format_file_name)
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 0
+    assert list(BlobCache().blob_dir.glob('*.partial')) == []
+
+
+def test_second_run_takes_the_images_from_the_cache(mock_server, config, monkeypatch):
+    mock_server.create_catalog(30)
+    config['cache']['use_blob_cache'] = True
+    # More images than one batch, so committed and pending entries are both read back.
+    monkeypatch.setattr(BlobCache, 'COMMIT_INTERVAL', 10)
+    asyncio.run(ImageDownload().run())
+
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 30
+    assert mock_server.not_modified_count == 30
@@ -0,0 +1,40 @@
+import asyncio
+import errno
+
+import pytest
+
+from models.image_download import ImageDownload
+from strategies.output_sink.zip_output_sink_strategy import ZipOutputSinkStrategy
+
+
+def test_safest_deletion_after_blob_cache_hits(mock_server, config):
+    mock_server.create_catalog(8)
+    config['cache']['use_blob_cache'] = True
+    asyncio.run(ImageDownload().run())
+    assert mock_server.not_modified_count == 0
+
+    config['collection']['delete_collection_after_download']['toggle'] = True
+    config['collection']['delete_collection_after_download']['mode'] = 'safest'
+    collection_id = mock_server.collections[0]['id']
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 8
+    assert mock_server.not_modified_count == 8
+    assert all(image.status_code == 200 for image in image_download.images)
+    assert mock_server.deleted_collection_ids == [collection_id]
+
+
+def test_no_deletion_if_the_output_cannot_be_finalized(mock_server, config, monkeypatch):
+    mock_server.create_catalog(8)
+    config['collection']['delete_collection_after_download']['toggle'] = True
+    config['collection']['delete_collection_after_download']['mode'] = 'dangerous'
+
+    def close(self):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(ZipOutputSinkStrategy, 'close', close)
+    with pytest.raises(OSError):
+        asyncio.run(ImageDownload().run())
+
+    assert mock_server.deleted_collection_ids == []
@@ -0,0 +1,40 @@
+import asyncio
+import glob
+import posixpath
+import stat
+import zipfile
+
+from models.image_download import ImageDownload
+
+
+def test_duplicates_are_archived_as_links(mock_server, config, tmp_path):
+    mock_server.create_catalog(8, collection_count=2)
+    config['cache']['use_blob_cache'] = False
+    saved_images = mock_server.collections[0]['images']
+    # The same image saved to a second collection.
+    mock_server.collections[1]['images'].append(dict(saved_images[0]))
+    # Another image set whose image has the same content, e.g. because it was created again.
+    mock_server.collections[1]['images'].append({
+        'image_id': saved_images[1]['image_id'],
+        'image_set_id': 'f' * 32,
+        'prompt': 'the same cat sitting on a windowsill'
+    })
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 10
+    # Only the content duplicate is downloaded, as its identity differs.
+    assert mock_server.request_counts['cdn'] == 9
+    zip_filename, = glob.glob(str(tmp_path / 'output' / '*.zip'))
+    with zipfile.ZipFile(zip_filename) as zip_file:
+        assert zip_file.testzip() is None
+        links = {zip_info.filename: zip_file.read(zip_info).decode('utf-8') for zip_info in zip_file.infolist()
+                 if stat.S_ISLNK(zip_info.external_attr >> 16)}
+        image_names = {name for name in zip_file.namelist() if name.endswith('.jpg') and name not in links}
+    assert len(image_names) == 8
+    assert len(links) == 2
+    for name, target in links.items():
+        target_name = posixpath.normpath(posixpath.join(posixpath.dirname(name), target))
+        assert name.startswith('Collection 1/')
+        assert target_name.startswith('Saved Images/')
+        assert target_name in image_names
@@ -0,0 +1,82 @@
+import asyncio
+
+from strategies.image_source.file_image_source_strategy import FileImageSourceStrategy
+from utilities.circuit_breaker import CircuitBreaker
+from utilities.client_manager import ClientManager
+from utilities.rate_limiter import RateLimiter
+from utilities.request_coalescer import RequestCoalescer
+
+ATTEMPTS = 5
+
+
+def get_image_id_list(mock_server) -> list:
+    return [{'image_set_id': image['image_set_id'], 'image_id': image['image_id']}
+            for collection in mock_server.collections
+            for image in collection['images']]
+
+
+async def gather_image_data(image_id_list: list) -> list:
+    # Every test runs on a new event loop, so the state bound to the previous one is dropped like at the start of a run.
+    RateLimiter().reset()
+    CircuitBreaker().reset()
+    async with ClientManager():
+        return [image async for image
+                in FileImageSourceStrategy.iter_image_data_retry(image_id_list, RequestCoalescer(), ATTEMPTS)]
+
+
+def run_with_failures(mock_server, image_count: int, failing_set_count: int) -> tuple:
+    """
+    Gathers the data of a catalog whose first detail request fails for the given number of image sets.
+    :return: The gathered images, the ids of the failing image sets and the number of detail requests.
+    """
+    mock_server.create_catalog(image_count)
+    image_id_list = get_image_id_list(mock_server)
+    failing_set_ids = sorted({image_ids['image_set_id'] for image_ids in image_id_list})[:failing_set_count]
+    mock_server.fail_detail_requests(failing_set_ids)
+    mock_server.reset_counts()
+    images = asyncio.run(gather_image_data(image_id_list))
+    return images, failing_set_ids, mock_server.request_counts['detail']
+
+
+def test_only_failed_image_sets_are_requested_again(mock_server, config, monkeypatch):
+    config['cache']['use_metadata_cache'] = False
+    monkeypatch.setattr(FileImageSourceStrategy, 'RETRY_BACKOFF_BASE', 0.01)
+    set_count = 100 // mock_server.IMAGES_PER_SET
+
+    images, failing_set_ids, detail_requests = run_with_failures(mock_server, 100, 3)
+
+    assert len(images) == 100
+    assert detail_requests == set_count + len(failing_set_ids)
+    failing_image_ids = {image['image_id'] for collection in mock_server.collections
+                         for image in collection['images'] if image['image_set_id'] in failing_set_ids}
+    retried_images = [image for image in images if image.detail_attempts == 2]
+    assert len(retried_images) == len(failing_image_ids)
+    assert all(image.detail_attempts == 1 for image in images if image not in retried_images)
+
+
+def test_retries_scale_with_failures_not_with_images(mock_server, config, monkeypatch):
+    config['cache']['use_metadata_cache'] = False
+    monkeypatch.setattr(FileImageSourceStrategy, 'RETRY_BACKOFF_BASE', 0.01)
+
+    retries = {}
+    for image_count, failing_set_count in [(100, 2), (400, 2), (400, 8)]:
+        images, _, detail_requests = run_with_failures(mock_server, image_count, failing_set_count)
+        assert len(images) == image_count
+        retries[image_count, failing_set_count] = detail_requests - image_count // mock_server.IMAGES_PER_SET
+
+    assert retries == {(100, 2): 2, (400, 2): 2, (400, 8): 8}
+
+
+def test_image_sets_failing_every_attempt_are_given_up(mock_server, config, monkeypatch):
+    config['cache']['use_metadata_cache'] = False
+    monkeypatch.setattr(FileImageSourceStrategy, 'RETRY_BACKOFF_BASE', 0.01)
+    mock_server.create_catalog(40)
+    image_id_list = get_image_id_list(mock_server)
+    failing_set_id = image_id_list[0]['image_set_id']
+    mock_server.fail_detail_requests([failing_set_id], times=ATTEMPTS)
+    mock_server.reset_counts()
+
+    images = asyncio.run(gather_image_data(image_id_list))
+
+    assert len(images) == 40 - mock_server.IMAGES_PER_SET
+    assert mock_server.request_counts['detail'] == 40 // mock_server.IMAGES_PER_SET + ATTEMPTS - 1
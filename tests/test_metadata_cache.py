@@ -0,0 +1,21 @@
+import asyncio
+
+from models.image_download import ImageDownload
+from utilities.metadata_cache import MetadataCache
+
+
+def test_second_run_takes_the_details_from_the_cache(mock_server, config, monkeypatch):
+    config['cache']['use_metadata_cache'] = True
+    # More image sets than one batch, so committed and pending entries are both read back.
+    monkeypatch.setattr(MetadataCache, 'COMMIT_INTERVAL', 10)
+    mock_server.create_catalog(120)
+    asyncio.run(ImageDownload().run())
+    assert mock_server.request_counts['detail'] == 120 // mock_server.IMAGES_PER_SET
+
+    mock_server.reset_counts()
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 120
+    assert mock_server.request_counts['detail'] == 0
+
@@ -0,0 +1,128 @@
+import asyncio
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from utilities.archive_writer import ArchiveWriter
+from utilities.byte_budget import ByteBudget
+
+ENTRIES = {
+    os.path.join('Saved Images', 'a.jpg'): b'a' * 1000,
+    os.path.join('Saved Images', 'b.jpg'): b'b' * 1000,
+    os.path.join('Other', 'c.jpg'): b'c' * 1000
+}
+
+
+def write_output(base_filename: str, output_sink: str, entries: dict, links: dict = None) -> ArchiveWriter:
+    archive_writer = ArchiveWriter(base_filename, ByteBudget(1024 * 1024), output_sink=output_sink)
+
+    async def main():
+        async with archive_writer:
+            for arcname, data in entries.items():
+                await archive_writer.write(arcname, data)
+            for arcname, target_arcname in (links or {}).items():
+                await archive_writer.write_link(arcname, target_arcname)
+
+    asyncio.run(main())
+    return archive_writer
+
+
+def read_output(path: str, output_sink: str) -> dict:
+    """
+    Returns the content of the files in the output by their path with slashes.
+    """
+    match output_sink:
+        case 'zip':
+            with zipfile.ZipFile(path) as zip_file:
+                assert zip_file.testzip() is None
+                return {name: zip_file.read(name) for name in zip_file.namelist()}
+        case 'tar':
+            with tarfile.open(path) as tar_file:
+                return {tar_info.name: tar_file.extractfile(tar_info).read()
+                        for tar_info in tar_file.getmembers() if tar_info.isfile()}
+        case 'directory':
+            files = {}
+            for directory, _, filenames in os.walk(path):
+                for filename in filenames:
+                    full_filename = os.path.join(directory, filename)
+                    if not os.path.islink(full_filename):
+                        with open(full_filename, 'rb') as f:
+                            files[os.path.relpath(full_filename, path).replace(os.sep, '/')] = f.read()
+            return files
+
+
+@pytest.mark.parametrize('output_sink', ['zip', 'tar', 'directory'])
+def test_recover_keeps_the_given_entries_and_appends(tmp_path, output_sink):
+    base_filename = str(tmp_path / 'bing_images')
+    kept = {os.path.join('Saved Images', 'a.jpg'), os.path.join('Other', 'c.jpg')}
+    write_output(base_filename, output_sink, ENTRIES,
+                 {os.path.join('Other', 'link.jpg'): os.path.join('Saved Images', 'a.jpg')})
+
+    archive_writer = ArchiveWriter(base_filename, ByteBudget(1024 * 1024), output_sink=output_sink)
+    recovered = archive_writer.recover(kept | {os.path.join('Other', 'missing.jpg')})
+    new_entry = os.path.join('Other', 'd.jpg')
+
+    async def main():
+        async with archive_writer:
+            await archive_writer.write(new_entry, b'd' * 1000)
+
+    asyncio.run(main())
+
+    assert recovered == kept
+    # The directory keeps the files of the earlier run as they are, while the archives are rebuilt with the kept ones.
+    expected = {**{arcname: ENTRIES[arcname] for arcname in kept}, new_entry: b'd' * 1000}
+    if output_sink == 'directory':
+        expected[os.path.join('Saved Images', 'b.jpg')] = ENTRIES[os.path.join('Saved Images', 'b.jpg')]
+    assert read_output(archive_writer.paths[0], output_sink) == {
+        arcname.replace(os.sep, '/'): data for arcname, data in expected.items()
+    }
+
+
+def test_recover_zip_without_central_directory(tmp_path):
+    base_filename = str(tmp_path / 'bing_images')
+    write_output(base_filename, 'zip', ENTRIES)
+    with zipfile.ZipFile(f"{base_filename}.zip") as zip_file:
+        last_entry = zip_file.infolist()[-1]
+    # Like a crash while the last entry was written, which also leaves out the central directory.
+    with open(f"{base_filename}.zip", 'r+b') as f:
+        f.truncate(last_entry.header_offset + 100)
+    assert not zipfile.is_zipfile(f"{base_filename}.zip")
+
+    recovered = ArchiveWriter(base_filename, ByteBudget(1024 * 1024)).recover(set(ENTRIES))
+
+    complete_entries = {arcname: data for arcname, data in ENTRIES.items()
+                        if arcname.replace(os.sep, '/') != last_entry.filename}
+    assert recovered == set(complete_entries)
+    assert read_output(f"{base_filename}.zip", 'zip') == {
+        arcname.replace(os.sep, '/'): data for arcname, data in complete_entries.items()
+    }
+
+
+def test_recover_tar_with_cut_off_entry(tmp_path):
+    base_filename = str(tmp_path / 'bing_images')
+    write_output(base_filename, 'tar', ENTRIES)
+    with tarfile.open(f"{base_filename}.tar") as tar_file:
+        last_entry = tar_file.getmembers()[-1]
+    with open(f"{base_filename}.tar", 'r+b') as f:
+        f.truncate(last_entry.offset_data + 100)
+
+    recovered = ArchiveWriter(base_filename, ByteBudget(1024 * 1024), output_sink='tar').recover(set(ENTRIES))
+
+    assert recovered == {arcname for arcname in ENTRIES if arcname.replace(os.sep, '/') != last_entry.name}
+    assert read_output(f"{base_filename}.tar", 'tar').keys() == {arcname.replace(os.sep, '/') for arcname in recovered}
+
+
+def test_recover_directory_removes_partial_files(tmp_path):
+    base_filename = str(tmp_path / 'bing_images')
+    write_output(base_filename, 'directory', ENTRIES)
+    partial_filename = os.path.join(base_filename, 'Other', 'd.jpg.part')
+    with open(partial_filename, 'wb') as f:
+        f.write(b'd' * 100)
+
+    arcnames = set(ENTRIES) | {os.path.join('Other', 'd.jpg')}
+    recovered = ArchiveWriter(base_filename, ByteBudget(1024 * 1024), output_sink='directory').recover(arcnames)
+
+    assert recovered == set(ENTRIES)
+    assert not os.path.exists(partial_filename)
@@ -0,0 +1,48 @@
+import asyncio
+import glob
+import zipfile
+
+from models.image_download import ImageDownload
+from utilities.run_control import RunControl
+from utilities.run_journal import RunJournal
+
+
+def read_image_names(output_folder) -> list:
+    zip_filename, = glob.glob(str(output_folder / '*.zip'))
+    with zipfile.ZipFile(zip_filename) as zip_file:
+        assert zip_file.testzip() is None
+        return [name for name in zip_file.namelist() if name.endswith('.jpg')]
+
+
+def test_cancelled_run_keeps_finished_images_and_resumes(mock_server, config, tmp_path, monkeypatch):
+    mock_server.create_catalog(40)
+    config['cache']['use_blob_cache'] = False
+    config['download']['max_concurrent_downloads'] = 2
+    run_control = RunControl()
+    record = RunJournal.record
+
+    async def cancel_after_ten_images(self, image, arcname):
+        await record(self, image, arcname)
+        if mock_server.request_counts['cdn'] >= 10:
+            run_control.cancel()
+
+    monkeypatch.setattr(RunJournal, 'record', cancel_after_ten_images)
+    image_download = ImageDownload(run_control=run_control)
+    asyncio.run(image_download.run())
+
+    assert image_download.is_cancelled
+    cancelled_image_count = image_download.successful_image_count
+    assert 10 <= cancelled_image_count < 40
+    # The images that were running when the run was cancelled are finished and written, the others aren't started.
+    assert mock_server.request_counts['cdn'] == cancelled_image_count
+    assert len(read_image_names(tmp_path / 'output')) == cancelled_image_count
+
+    monkeypatch.setattr(RunJournal, 'record', record)
+    mock_server.reset_counts()
+    image_download = ImageDownload(resume=True)
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 40
+    assert mock_server.request_counts['cdn'] == 40 - cancelled_image_count
+    image_names = read_image_names(tmp_path / 'output')
+    assert len(image_names) == len(set(image_names)) == 40
@@ -0,0 +1,47 @@
+import asyncio
+import errno
+import glob
+import zipfile
+
+from models.image_download import ImageDownload
+from utilities.run_journal import RunJournal
+
+
+def test_run_continues_if_the_journal_cannot_be_written(mock_server, config, monkeypatch):
+    mock_server.create_catalog(20)
+    # The workers wait for the journal instead of leaving it to the background flush.
+    monkeypatch.setattr(RunJournal, 'SYNC_RECORDS', 2)
+
+    def append(self, lines):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr(RunJournal, '_RunJournal__append', append)
+    image_download = ImageDownload()
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 20
+
+
+def test_resume_only_fetches_the_images_missing_from_the_journal(mock_server, config, tmp_path):
+    mock_server.create_catalog(20)
+    config['cache']['use_blob_cache'] = False
+    asyncio.run(ImageDownload().run())
+    journal_filename, = glob.glob(str(tmp_path / 'output' / f"*{RunJournal.SUFFIX}"))
+    # Like a crash before the last group of lines was synced, while their images are already in the archive.
+    with open(journal_filename, 'r+', encoding='utf-8') as f:
+        lines = f.readlines()
+        f.seek(0)
+        f.writelines(lines[:15])
+        f.truncate()
+
+    mock_server.reset_counts()
+    image_download = ImageDownload(resume=True)
+    asyncio.run(image_download.run())
+
+    assert image_download.successful_image_count == 20
+    assert mock_server.request_counts['cdn'] == 5
+    zip_filename, = glob.glob(str(tmp_path / 'output' / '*.zip'))
+    with zipfile.ZipFile(zip_filename) as zip_file:
+        assert zip_file.testzip() is None
+        names = [name for name in zip_file.namelist() if name.endswith('.jpg')]
+    assert len(names) == len(set(names)) == 20
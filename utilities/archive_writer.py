@@ -0,0 +1,441 @@
+import asyncio
+import glob
+import logging
+import os
+import posixpath
+import queue
+import re
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import IO, Dict, List, Set
+
+from strategies.output_sink.output_sink_strategy import OutputSinkStrategy
+from utilities.byte_budget import ByteBudget
+from utilities.metrics import Metrics
+
+
+class ArchiveShard:
+    """
+    Writes entries into one output sink on a dedicated thread, so images are written as soon as they are downloaded
+    without blocking the event loop. Every output, i.e. a ZIP or TAR archive or a folder, is fed the same way.
+    """
+    __CLOSE = object()
+
+    def __init__(self, output_sink: OutputSinkStrategy):
+        self.output_sink = output_sink
+        # The bytes of the entries that were handed to the shard, including the ones still queued.
+        self.size = 0
+        self.__queue: queue.Queue = queue.Queue()
+        self.__thread: threading.Thread | None = None
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        # Resolved by the writer thread once the output was finalized, or failed to be.
+        self.__closed: asyncio.Future | None = None
+
+    def start(self, append: bool) -> None:
+        """
+        Opens the output and starts the writer thread. Must be called from within the running event loop.
+        :param append: Whether to keep the entries the output already contains.
+        :return: None
+        """
+        self.__loop = asyncio.get_running_loop()
+        self.__closed = self.__loop.create_future()
+        self.output_sink.open(append)
+        self.__thread = threading.Thread(target=self.__write_entries, name='ArchiveWriter', daemon=True)
+        self.__thread.start()
+
+    async def write(self, arcname: str, data: bytes | str | IO[bytes], is_link: bool = False) -> None:
+        """
+        Queues an entry for the writer thread and waits until it was written to the output.
+        If the waiting task is cancelled, it still waits for the writer thread before the cancellation propagates,
+        because the caller closes the file object afterward, which would truncate an entry that is still being copied.
+        :param arcname: Path of the entry inside the output.
+        :param data: Content of the entry, a file object to copy it from or the target of a link.
+        :param is_link: Whether the entry is a symbolic link.
+        :return: None
+        """
+        future = self.__loop.create_future()
+        self.__queue.put((arcname, data, is_link, future))
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            await asyncio.wait((future,))
+            # A failure was already logged by the writer thread.
+            future.exception()
+            raise
+
+    async def close(self) -> None:
+        """
+        Writes the remaining entries, finalizes the output and stops the writer thread.
+        Raises the error of the writer thread if the output couldn't be finalized, because it is incomplete then.
+        :return: None
+        """
+        if self.__thread is None:
+            return
+        self.__queue.put(self.__CLOSE)
+        thread = self.__thread
+        self.__thread = None
+        await asyncio.to_thread(thread.join)
+        await self.__closed
+
+    def __write_entries(self) -> None:
+        """
+        Runs on the writer thread and writes queued entries to the output until it is closed.
+        :return: None
+        """
+        try:
+            while (entry := self.__queue.get()) is not self.__CLOSE:
+                arcname, data, is_link, future = entry
+                start = time.perf_counter()
+                try:
+                    if is_link:
+                        self.output_sink.write_link(arcname, data)
+                        size = len(data)
+                    else:
+                        size = self.output_sink.write(arcname, data)
+                    Metrics().observe('archive_write_seconds', time.perf_counter() - start)
+                    Metrics().increment('archive_bytes_total', size)
+                    self.__loop.call_soon_threadsafe(ArchiveShard.__set_result, future, None)
+                except Exception as e:
+                    logging.error(f"Failed to write {arcname} to {self.output_sink.path}: {e}")
+                    self.__loop.call_soon_threadsafe(ArchiveShard.__set_exception, future, e)
+        finally:
+            try:
+                self.output_sink.close()
+            except Exception as e:
+                logging.error(f"Failed to finalize {self.output_sink.path}: {e}")
+                self.__loop.call_soon_threadsafe(ArchiveShard.__set_exception, self.__closed, e)
+            else:
+                self.__loop.call_soon_threadsafe(ArchiveShard.__set_result, self.__closed, None)
+
+    @staticmethod
+    def __set_result(future: asyncio.Future, result) -> None:
+        if not future.done():
+            future.set_result(result)
+
+    @staticmethod
+    def __set_exception(future: asyncio.Future, exception: Exception) -> None:
+        if not future.done():
+            future.set_exception(exception)
+
+
+@dataclass
+class ShardGroup:
+    # The base filename of the group's outputs, without the number of the shard.
+    base_filename: str
+    shard: ArchiveShard | None = None
+    shard_number: int = 0
+    pending_images: int = 0
+    is_gathered: bool = False
+    paths: List[str] = field(default_factory=list)
+
+
+class ArchiveWriter:
+    """
+    Writes the images into one or more outputs. By default everything goes into a single output, but it can be split
+    per collection and into shards of a maximum size. Each output is finalized as soon as its images are done, so it
+    can be picked up while the run continues, and every open output is written by its own thread.
+    """
+    COLLECTION_NAME_PATTERN = r'[^\w\-]+'
+
+    def __init__(
+            self,
+            base_filename: str,
+            byte_budget: ByteBudget,
+            output_sink: str = 'zip',
+            tar_to_stdout: bool = False,
+            split_by_collection: bool = False,
+            max_shard_bytes: int = 0):
+        """
+        :param base_filename: The path of the output without extension, e.g. /downloads/bing_images_2024-01-01.
+        :param byte_budget: The budget of the memory that entries are buffered in.
+        :param output_sink: The kind of output, i.e. zip, tar or directory.
+        :param tar_to_stdout: Whether a TAR archive is streamed to the standard output instead of a file.
+        :param split_by_collection: Whether every collection gets its own outputs.
+        :param max_shard_bytes: The size after which a new output is started. 0 disables the limit.
+        """
+        if tar_to_stdout and output_sink == 'tar' and (split_by_collection or max_shard_bytes):
+            logging.warning("The tar archive is streamed to the standard output, so it isn't split.")
+            split_by_collection = False
+            max_shard_bytes = 0
+        self.base_filename = base_filename
+        self.__byte_budget = byte_budget
+        self.__output_sink = output_sink
+        self.__tar_to_stdout = tar_to_stdout
+        self.__split_by_collection = split_by_collection
+        self.__max_shard_bytes = max_shard_bytes
+        self.__groups: Dict[str | None, ShardGroup] = {}
+        # Outputs that already contain entries of this run, so they are appended to when they are opened again.
+        self.__written_filenames: Set[str] = set()
+        self.__closing_tasks: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> 'ArchiveWriter':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    @property
+    def paths(self) -> List[str]:
+        """
+        Returns the outputs that were written.
+        :return: The paths of the archives or folders.
+        """
+        return [path for group in self.__groups.values() for path in group.paths]
+
+    @staticmethod
+    def get_output_sink_strategy(setting: str, base_filename: str, tar_to_stdout: bool = False) -> OutputSinkStrategy:
+        """
+        Returns the output sink strategy based on the supplied setting.
+        :param setting: The kind of output, i.e. zip, tar or directory.
+        :param base_filename: The path of the output without extension.
+        :param tar_to_stdout: Whether a TAR archive is streamed to the standard output instead of a file.
+        :return: The output sink strategy.
+        """
+        match setting:
+            case 'zip':
+                from strategies.output_sink.zip_output_sink_strategy import ZipOutputSinkStrategy
+                return ZipOutputSinkStrategy(base_filename)
+            case 'tar':
+                from strategies.output_sink.tar_output_sink_strategy import TarOutputSinkStrategy
+                return TarOutputSinkStrategy(base_filename, tar_to_stdout)
+            case 'directory':
+                from strategies.output_sink.directory_output_sink_strategy import DirectoryOutputSinkStrategy
+                return DirectoryOutputSinkStrategy(base_filename)
+            case _:
+                raise Exception(f"Invalid output sink setting: {setting}")
+
+    def recover(self, arcnames: Set[str]) -> Set[str]:
+        """
+        Restores the given entries from the outputs of an earlier run with the same base filename.
+        The outputs are appended to when they are opened again.
+        :param arcnames: The entries to keep.
+        :return: The entries that were recovered.
+        """
+        extension = self.__create_output_sink(self.base_filename).EXTENSION
+        output_filenames = glob.glob(f"{glob.escape(self.base_filename)}*{extension}")
+        recovered = set()
+        for output_filename in sorted(output_filenames):
+            base_filename = output_filename[:len(output_filename) - len(extension)]
+            if base_filename != self.base_filename and not base_filename.startswith(f"{self.base_filename}_"):
+                continue
+            output_recovered = self.__create_output_sink(base_filename).recover(arcnames)
+            if output_recovered:
+                self.__written_filenames.add(base_filename)
+                recovered |= output_recovered
+
+        return recovered
+
+    def open_entry(self, arcname: str, collection_name: str | None = None) -> 'ArchiveEntry':
+        """
+        Creates an entry that can be streamed in chunks and is written to the output when it's committed.
+        :param arcname: Path of the entry inside the output.
+        :param collection_name: The collection the entry belongs to.
+        :return: The new :class:`ArchiveEntry`.
+        """
+        return ArchiveEntry(arcname, self, self.__byte_budget, collection_name)
+
+    async def write(self, arcname: str, data: bytes | str | IO[bytes], collection_name: str | None = None) -> None:
+        """
+        Writes an entry to the current output of its collection and waits until it was written.
+        :param arcname: Path of the entry inside the output.
+        :param data: Content of the entry or a file object to copy it from.
+        :param collection_name: The collection the entry belongs to.
+        :return: None
+        """
+        size = len(data) if isinstance(data, (bytes, str)) else data.seek(0, os.SEEK_END)
+        await self.__get_shard(collection_name, size).write(arcname, data)
+
+    async def write_link(self, arcname: str, target_arcname: str, collection_name: str | None = None) -> None:
+        """
+        Writes a symbolic link to another entry, so the same content is referenced without being stored twice.
+        The target may be in another output, so the link resolves once the outputs are extracted to the same folder.
+        :param arcname: Path of the link inside the output.
+        :param target_arcname: Path of the linked entry inside the output.
+        :param collection_name: The collection the link belongs to.
+        :return: None
+        """
+        arcname = arcname.replace(os.sep, '/')
+        target = posixpath.relpath(target_arcname.replace(os.sep, '/'), posixpath.dirname(arcname))
+        await self.__get_shard(collection_name, len(target)).write(arcname, target, is_link=True)
+
+    def add_pending_image(self, collection_name: str) -> None:
+        """
+        Counts an image whose entry may still be written, so the output of its collection stays open.
+        :param collection_name: The collection of the image.
+        :return: None
+        """
+        group = self.__get_group(collection_name)
+        group.pending_images += 1
+        group.is_gathered = False
+
+    def finish_image(self, collection_name: str) -> None:
+        """
+        Marks an image as done and finalizes the output of its collection if it was the last one.
+        :param collection_name: The collection of the image.
+        :return: None
+        """
+        group = self.__get_group(collection_name)
+        group.pending_images -= 1
+        self.__finalize_if_done(group)
+
+    def finish_collection(self, collection_name: str) -> None:
+        """
+        Marks that all images of the collection were gathered, so its output is finalized once they are done.
+        Without splitting per collection, the single output stays open until the writer is closed.
+        :param collection_name: The collection that was gathered.
+        :return: None
+        """
+        if not self.__split_by_collection:
+            return
+        group = self.__get_group(collection_name)
+        group.is_gathered = True
+        self.__finalize_if_done(group)
+
+    async def close(self) -> None:
+        """
+        Finalizes all outputs and waits until they are closed.
+        Raises the first error of an output that couldn't be finalized once all outputs were closed.
+        :return: None
+        """
+        for group in self.__groups.values():
+            self.__finalize(group)
+        closing_tasks, self.__closing_tasks = self.__closing_tasks, []
+        results = await asyncio.gather(*closing_tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def __create_output_sink(self, base_filename: str) -> OutputSinkStrategy:
+        return ArchiveWriter.get_output_sink_strategy(self.__output_sink, base_filename, self.__tar_to_stdout)
+
+    def __get_group(self, collection_name: str | None) -> ShardGroup:
+        """
+        Returns the group of outputs an entry of the collection is written to.
+        :param collection_name: The collection of the entry or None for entries like the statistics.
+        :return: The :class:`ShardGroup`.
+        """
+        key = collection_name if self.__split_by_collection else None
+        group = self.__groups.get(key)
+        if group is None:
+            base_filename = self.base_filename
+            if key is not None:
+                name = re.sub(self.COLLECTION_NAME_PATTERN, '-', key).strip('-') or 'collection'
+                base_filename = f"{self.base_filename}_{name}"
+                # Collection names that only differ in special characters get a number.
+                used_base_filenames = {group.base_filename for group in self.__groups.values()}
+                number = 2
+                while base_filename in used_base_filenames:
+                    base_filename = f"{self.base_filename}_{name}_{number}"
+                    number += 1
+            group = self.__groups[key] = ShardGroup(base_filename)
+        return group
+
+    def __get_shard(self, collection_name: str | None, size: int) -> ArchiveShard:
+        """
+        Returns the open output of the collection and starts a new one if the entry doesn't fit into it anymore.
+        :param collection_name: The collection of the entry.
+        :param size: The size of the entry in bytes.
+        :return: The :class:`ArchiveShard` to write the entry to.
+        """
+        group = self.__get_group(collection_name)
+        if (group.shard is not None and self.__max_shard_bytes
+                and group.shard.size > 0 and group.shard.size + size > self.__max_shard_bytes):
+            self.__finalize(group)
+        if group.shard is None:
+            base_filename = group.base_filename
+            if self.__max_shard_bytes:
+                group.shard_number += 1
+                base_filename = f"{group.base_filename}_{group.shard_number:03d}"
+                # A resumed run starts after the shards of the earlier run.
+                while base_filename in self.__written_filenames:
+                    group.shard_number += 1
+                    base_filename = f"{group.base_filename}_{group.shard_number:03d}"
+            shard = ArchiveShard(self.__create_output_sink(base_filename))
+            shard.start(append=base_filename in self.__written_filenames)
+            self.__written_filenames.add(base_filename)
+            group.shard = shard
+            if shard.output_sink.path not in group.paths:
+                group.paths.append(shard.output_sink.path)
+        group.shard.size += size
+        return group.shard
+
+    def __finalize_if_done(self, group: ShardGroup) -> None:
+        if group.is_gathered and group.pending_images == 0:
+            self.__finalize(group)
+
+    def __finalize(self, group: ShardGroup) -> None:
+        """
+        Closes the open output of the group in the background. Entries that were already queued are still written.
+        :param group: The :class:`ShardGroup` to finalize.
+        :return: None
+        """
+        if group.shard is None:
+            return
+        shard = group.shard
+        group.shard = None
+        self.__closing_tasks.append(asyncio.create_task(ArchiveWriter.__close_shard(shard)))
+
+    @staticmethod
+    async def __close_shard(shard: ArchiveShard) -> None:
+        await shard.close()
+        Metrics().increment('archive_outputs_finalized_total')
+        logging.info(f"Finished {shard.output_sink.path}.")
+
+
+class ArchiveEntry:
+    """
+    An archive entry that is streamed in chunks while its image is downloaded.
+    Chunks are kept in memory as long as the byte budget allows it, otherwise the entry spills to a temporary file.
+    """
+
+    def __init__(self, arcname: str, archive_writer: 'ArchiveWriter', byte_budget: ByteBudget,
+                 collection_name: str | None = None):
+        self.arcname = arcname
+        self.collection_name = collection_name
+        self.size = 0
+        self.__archive_writer = archive_writer
+        self.__byte_budget = byte_budget
+        self.__spool = tempfile.SpooledTemporaryFile(max_size=0)
+        self.__reserved = 0
+        self.__spilled = False
+
+    async def write(self, chunk: bytes) -> None:
+        """
+        Appends a chunk to the entry.
+        :param chunk: The bytes to append.
+        :return: None
+        """
+        self.size += len(chunk)
+        if not self.__spilled:
+            if self.__byte_budget.try_reserve(len(chunk)):
+                self.__reserved += len(chunk)
+                self.__spool.write(chunk)
+                return
+            await asyncio.to_thread(self.__spool.rollover)
+            self.__spilled = True
+            self.__release()
+        await asyncio.to_thread(self.__spool.write, chunk)
+
+    async def commit(self) -> None:
+        """
+        Hands the entry to the writer thread and waits until it was written to the output.
+        :return: None
+        """
+        try:
+            await self.__archive_writer.write(self.arcname, self.__spool, self.collection_name)
+        finally:
+            self.discard()
+
+    def discard(self) -> None:
+        """
+        Drops the entry and returns its memory to the byte budget.
+        :return: None
+        """
+        self.__spool.close()
+        self.__release()
+
+    def __release(self) -> None:
+        self.__byte_budget.release(self.__reserved)
+        self.__reserved = 0
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Mapping
+
+from utilities.config import Config
+from utilities.database_thread import DatabaseThread
+from utilities.path_utility import PathUtility
+
+
+class BlobCache:
+    """
+    Singleton class for the persistent cache of downloaded images in the user data directory.
+    The images are stored once per content hash and indexed by their URL in SQLite, together with the ETag and
+    Last-Modified header, so a cached image is only revalidated instead of downloaded again.
+    Above the configured size the least recently used images are evicted.
+    The database is used on its own thread and changes are committed in batches, so the event loop never waits for the
+    disk. Images that weren't committed when the program is killed are downloaded again by the next run.
+    """
+    _instance = None
+    _connection: sqlite3.Connection = None
+    _database_thread = DatabaseThread('BlobCache')
+    _uncommitted = 0
+
+    FILENAME = 'blob_cache.sqlite3'
+    BLOB_DIRECTORY = 'blobs'
+    # The number of changes that are made before they are committed.
+    COMMIT_INTERVAL = 100
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(BlobCache, cls).__new__(cls)
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+            cls._instance.bytes_saved = 0
+        return cls._instance
+
+    @property
+    def enabled(self) -> bool:
+        return Config().blob_cache_enabled
+
+    @property
+    def blob_dir(self) -> Path:
+        return PathUtility.user_data_dir() / self.BLOB_DIRECTORY
+
+    async def get(self, url: str) -> dict | None:
+        """
+        Returns the cache entry of an image URL if its blob still exists.
+        :param url: The URL the image was downloaded from.
+        :return: Dictionary containing the content_hash, size, etag and last_modified or None if it isn't cached.
+        """
+        if not self.enabled:
+            return None
+        return await self._database_thread.run(self.__select, url)
+
+    @staticmethod
+    def get_conditional_headers(blob: dict | None) -> dict:
+        """
+        Returns the headers that let the server answer with 304 Not Modified if the cached image is still valid.
+        :param blob: The cache entry returned by :meth:`get` or None.
+        :return: Dictionary containing the conditional request headers.
+        """
+        headers = {}
+        if blob is not None:
+            if blob['etag']:
+                headers['If-None-Match'] = blob['etag']
+            if blob['last_modified']:
+                headers['If-Modified-Since'] = blob['last_modified']
+        return headers
+
+    async def open_reader(self, url: str, blob: dict) -> 'BlobReader':
+        """
+        Opens a cached image that the server confirmed to be valid and marks it as recently used.
+        :param url: The URL the image was downloaded from.
+        :param blob: The cache entry returned by :meth:`get`.
+        :return: A :class:`BlobReader` with the same reading methods as a response body.
+        """
+        await self._database_thread.run(self.__write, "UPDATE blob SET last_used = ? WHERE url = ?",
+                                        (time.time(), url))
+        self.hits += 1
+        self.bytes_saved += blob['size']
+        return BlobReader(self.__get_blob_path(blob['content_hash']))
+
+    async def open_writer(self, url: str, headers: Mapping[str, str]) -> 'BlobWriter | None':
+        """
+        Creates a writer that stores a downloaded image in the cache while it is streamed.
+        The caller has to discard the writer if the image isn't committed.
+        :param url: The URL the image is downloaded from.
+        :param headers: The response headers containing the validators.
+        :return: A :class:`BlobWriter` or None if the cache is disabled.
+        """
+        if not self.enabled:
+            return None
+        # Creates the blob directory, while the temporary file itself is created right away, so it can't be left
+        # behind by a cancellation.
+        await self._database_thread.run(self.__connect)
+        self.misses += 1
+        return BlobWriter(self, url, headers.get('ETag'), headers.get('Last-Modified'))
+
+    async def put(self, url: str, temp_path: Path, content_hash: str, size: int, etag: str | None,
+                  last_modified: str | None) -> None:
+        """
+        Moves a completely written blob into place and indexes it. It's committed with the next batch.
+        :param url: The URL the image was downloaded from.
+        :param temp_path: The temporary file containing the image.
+        :param content_hash: The SHA-256 hex digest of the image.
+        :param size: The size of the image in bytes.
+        :param etag: The ETag header of the response.
+        :param last_modified: The Last-Modified header of the response.
+        :return: None
+        """
+        await self._database_thread.run(self.__insert, url, temp_path, content_hash, size, etag, last_modified)
+
+    async def close(self) -> None:
+        """
+        Commits the pending changes and evicts the least recently used images above the size limit, then closes the
+        database.
+        :return: None
+        """
+        await self._database_thread.run(self.__close)
+        await self._database_thread.shutdown()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def statistics(self) -> dict:
+        """
+        Returns the cache hits, misses and saved bytes since the cache was opened.
+        :return: Dictionary containing the hits, misses and bytes_saved.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'bytes_saved': self.bytes_saved}
+
+    def __select(self, url: str) -> dict | None:
+        row = self.__connect().execute(
+            "SELECT content_hash, size, etag, last_modified FROM blob WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        blob = dict(zip(('content_hash', 'size', 'etag', 'last_modified'), row))
+        if not self.__get_blob_path(blob['content_hash']).exists():
+            self.__write("DELETE FROM blob WHERE url = ?", (url,))
+            return None
+
+        return blob
+
+    def __insert(self, url: str, temp_path: Path, content_hash: str, size: int, etag: str | None,
+                 last_modified: str | None) -> None:
+        blob_path = self.__get_blob_path(content_hash)
+        blob_path.parent.mkdir(exist_ok=True)
+        os.replace(temp_path, blob_path)
+        self.__write(
+            "INSERT OR REPLACE INTO blob (url, content_hash, size, etag, last_modified, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, content_hash, size, etag, last_modified, time.time())
+        )
+
+    def __write(self, sql: str, parameters: tuple) -> None:
+        """
+        Executes a change and commits it together with the previous ones once the batch is full.
+        :param sql: The statement to execute.
+        :param parameters: The parameters of the statement.
+        :return: None
+        """
+        connection = self.__connect()
+        connection.execute(sql, parameters)
+        BlobCache._uncommitted += 1
+        if BlobCache._uncommitted >= self.COMMIT_INTERVAL:
+            connection.commit()
+            BlobCache._uncommitted = 0
+
+    def __close(self) -> None:
+        if BlobCache._connection is None:
+            return
+        connection = BlobCache._connection
+        try:
+            connection.commit()
+            self.__evict(connection)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Failed to evict images from the blob cache: {e}")
+        finally:
+            connection.close()
+            BlobCache._connection = None
+            BlobCache._uncommitted = 0
+
+    def __evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Deletes the least recently used blobs until the cache fits into the size limit.
+        A blob is shared by all URLs with the same content, so it's only as old as its most recently used URL.
+        :param connection: The open database.
+        :return: None
+        """
+        rows = connection.execute(
+            "SELECT content_hash, MAX(size), MAX(last_used) AS used FROM blob GROUP BY content_hash ORDER BY used DESC"
+        ).fetchall()
+        total_size = 0
+        evicted_hashes = []
+        for content_hash, size, _ in rows:
+            total_size += size
+            if total_size > Config().blob_cache_max_bytes:
+                evicted_hashes.append(content_hash)
+        for content_hash in evicted_hashes:
+            self.__get_blob_path(content_hash).unlink(missing_ok=True)
+        connection.executemany("DELETE FROM blob WHERE content_hash = ?", [(h,) for h in evicted_hashes])
+        connection.commit()
+        if evicted_hashes:
+            logging.info(f"Evicted {len(evicted_hashes)} images from the blob cache.")
+        # Leftovers of downloads that were interrupted by a crash.
+        for temp_path in self.blob_dir.glob('*.partial'):
+            if temp_path.stat().st_mtime < time.time() - 24 * 60 * 60:
+                temp_path.unlink(missing_ok=True)
+
+    def __get_blob_path(self, content_hash: str) -> Path:
+        return self.blob_dir / content_hash[:2] / content_hash
+
+    def __connect(self) -> sqlite3.Connection:
+        if BlobCache._connection is None:
+            self.blob_dir.mkdir(exist_ok=True)
+            connection = sqlite3.connect(PathUtility.user_data_dir() / self.FILENAME)
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS blob ("
+                "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, size INTEGER NOT NULL, "
+                "etag TEXT, last_modified TEXT, last_used REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS blob_content_hash ON blob (content_hash)")
+            BlobCache._connection = connection
+        return BlobCache._connection
+
+
+class BlobReader:
+    """
+    Reads a cached image with the same methods as the body of a response, i.e. :class:`aiohttp.StreamReader`.
+    """
+
+    def __init__(self, path: Path):
+        self.__file = open(path, 'rb')
+
+    def __enter__(self) -> 'BlobReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.__file.close()
+
+    async def read(self, size: int) -> bytes:
+        return await asyncio.to_thread(self.__file.read, size)
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        while chunk := await self.read(size):
+            yield chunk
+
+
+class BlobWriter:
+    """
+    Writes a downloaded image to a temporary file in the cache, which is moved into place once it's complete.
+    """
+
+    def __init__(self, blob_cache: BlobCache, url: str, etag: str | None, last_modified: str | None):
+        self.__blob_cache = blob_cache
+        self.__url = url
+        self.__etag = etag
+        self.__last_modified = last_modified
+        self.__file = tempfile.NamedTemporaryFile(dir=blob_cache.blob_dir, suffix='.partial', delete=False)
+        self.__size = 0
+        self.__committed = False
+
+    async def write(self, chunk: bytes) -> None:
+        """
+        Appends a chunk of the original image.
+        :param chunk: The bytes to append.
+        :return: None
+        """
+        self.__size += len(chunk)
+        await asyncio.to_thread(self.__file.write, chunk)
+
+    async def commit(self, content_hash: str) -> None:
+        """
+        Adds the written image to the cache.
+        :param content_hash: The SHA-256 hex digest of the image.
+        :return: None
+        """
+        self.__file.close()
+        # The temporary file belongs to the cache from now on, even if the task is cancelled while it's moved.
+        self.__committed = True
+        try:
+            await self.__blob_cache.put(self.__url, Path(self.__file.name), content_hash, self.__size, self.__etag,
+                                  self.__last_modified)
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"Failed to add {self.__url} to the blob cache: {e}")
+            Path(self.__file.name).unlink(missing_ok=True)
+
+    def discard(self) -> None:
+        """
+        Drops the written image unless it was committed.
+        :return: None
+        """
+        if self.__committed:
+            return
+        self.__file.close()
+        Path(self.__file.name).unlink(missing_ok=True)
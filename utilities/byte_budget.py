@@ -0,0 +1,71 @@
+import asyncio
+from collections import deque
+from typing import Deque, Tuple
+
+
+class ByteBudget:
+    """
+    Limits the number of bytes that downloads may hold in memory at the same time.
+    """
+
+    def __init__(self, limit: int):
+        self.__limit = max(1, limit)
+        self.__available = self.__limit
+        self.__waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    @property
+    def available(self) -> int:
+        return self.__available
+
+    def try_reserve(self, size: int) -> bool:
+        """
+        Reserves the given number of bytes if they are available right now and nobody is waiting for them.
+        :param size: Number of bytes to reserve.
+        :return: Whether the bytes were reserved.
+        """
+        if not self.__waiters and size <= self.__available:
+            self.__available -= size
+            return True
+        return False
+
+    async def reserve(self, size: int) -> int:
+        """
+        Waits until the given number of bytes is available and reserves them.
+        Requests larger than the whole budget are capped, so they can't wait forever.
+        :param size: Number of bytes to reserve.
+        :return: The number of bytes that were reserved and have to be released later.
+        """
+        size = min(size, self.__limit)
+        if self.try_reserve(size):
+            return size
+        entry = (size, asyncio.get_running_loop().create_future())
+        self.__waiters.append(entry)
+        try:
+            await entry[1]
+        except asyncio.CancelledError:
+            if entry[1].done() and not entry[1].cancelled():
+                self.release(size)
+            else:
+                self.__waiters.remove(entry)
+                self.__wake_waiters()
+            raise
+        return size
+
+    def release(self, size: int) -> None:
+        """
+        Returns previously reserved bytes to the budget.
+        :param size: Number of bytes to release.
+        :return: None
+        """
+        self.__available = min(self.__limit, self.__available + size)
+        self.__wake_waiters()
+
+    def __wake_waiters(self) -> None:
+        while self.__waiters and self.__waiters[0][0] <= self.__available:
+            size, waiter = self.__waiters.popleft()
+            self.__available -= size
+            waiter.set_result(None)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+import aiohttp
+
+from utilities.config import Config
+from utilities.metrics import Metrics
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request to a host that is considered down.
+    """
+
+
+@dataclass
+class HostState:
+    consecutive_failures: int = 0
+    open_until: float | None = None
+    is_probing: bool = False
+
+
+class CircuitBreaker:
+    """
+    Singleton class that stops sending requests to a host once too many requests to it failed in a row, e.g. because
+    it's down or throttles everything. While the circuit of a host is open, its requests fail immediately with
+    :class:`CircuitOpenError` instead of waiting through all retries. After the cooldown a single request tests whether
+    the host is back, which closes the circuit again or keeps it open for another cooldown.
+    Throttling, server errors and dropped connections count as failures, other responses like 404 don't.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CircuitBreaker, cls).__new__(cls)
+            cls._instance.__hosts = {}
+            cls._instance.__trace_config = None
+        return cls._instance
+
+    @property
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Returns a trace config that applies the circuit breaker to all requests of a session.
+        It has to be the first trace config of the session, so refused requests aren't traced by the others.
+        :return: The :class:`aiohttp.TraceConfig`.
+        """
+        if self.__trace_config is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self.__on_request_start)
+            trace_config.on_request_end.append(self.__on_request_end)
+            trace_config.on_request_exception.append(self.__on_request_exception)
+            self.__trace_config = trace_config
+        return self.__trace_config
+
+    def reset(self) -> None:
+        """
+        Closes the circuits of all hosts, so a new run starts without the failures of the previous one.
+        :return: None
+        """
+        self.__hosts.clear()
+
+    def check(self, host: str) -> None:
+        """
+        Raises if requests to the host should fail immediately. Lets a single request through once the cooldown is over.
+        :param host: The host of the request.
+        :return: None
+        """
+        state = self.__hosts.get(host)
+        if state is None or state.open_until is None:
+            return
+        if time.monotonic() < state.open_until or state.is_probing:
+            Metrics().increment('circuit_breaker_rejections_total', host=host)
+            raise CircuitOpenError(f"Requests to {host} are paused, because it failed "
+                                   f"{state.consecutive_failures} times in a row.")
+        state.is_probing = True
+
+    def record_success(self, host: str) -> None:
+        """
+        Closes the circuit of the host.
+        :param host: The host of the request.
+        :return: None
+        """
+        state = self.__hosts.pop(host, None)
+        if state is not None and state.open_until is not None:
+            logging.info(f"{host} is reachable again, resuming requests.")
+
+    def record_failure(self, host: str) -> None:
+        """
+        Counts a failed request and opens the circuit of the host once the threshold is reached.
+        :param host: The host of the request.
+        :return: None
+        """
+        state = self.__hosts.setdefault(host, HostState())
+        state.consecutive_failures += 1
+        if state.is_probing or (state.open_until is None
+                                and state.consecutive_failures >= Config().circuit_breaker_failure_threshold):
+            cooldown = Config().circuit_breaker_cooldown_seconds
+            state.open_until = time.monotonic() + cooldown
+            state.is_probing = False
+            Metrics().increment('circuit_breaker_opened_total', host=host)
+            logging.warning(f"{host} failed {state.consecutive_failures} times in a row, "
+                            f"pausing its requests for {cooldown} seconds.")
+
+    async def __on_request_start(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                 params: aiohttp.TraceRequestStartParams) -> None:
+        # Raising here aborts the request before it's sent. The retry client doesn't retry the error.
+        self.check(params.url.host)
+
+    async def __on_request_end(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                               params: aiohttp.TraceRequestEndParams) -> None:
+        if params.response.status == 429 or params.response.status >= 500:
+            self.record_failure(params.url.host)
+        else:
+            self.record_success(params.url.host)
+
+    async def __on_request_exception(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                     params: aiohttp.TraceRequestExceptionParams) -> None:
+        if isinstance(params.exception, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+            self.record_failure(params.url.host)
+        elif (state := self.__hosts.get(params.url.host)) is not None:
+            # Other errors say nothing about the host, so the next request tests it instead.
+            state.is_probing = False
+
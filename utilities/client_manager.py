@@ -0,0 +1,96 @@
+from typing import List
+
+import aiohttp
+import aiohttp_retry
+
+from utilities.circuit_breaker import CircuitBreaker
+from utilities.config import Config
+from utilities.download_scheduler import DownloadScheduler
+from utilities.metrics import Metrics
+from utilities.network_utility import NetworkUtility
+from utilities.rate_limiter import RateLimiter
+
+
+class ClientManager:
+    """
+    Singleton class that holds the HTTP session shared by the whole download pipeline.
+    All requests of a run go through one pooled connector, so connections to the Bing hosts are kept alive
+    and reused instead of doing a new TCP and TLS handshake for every single request.
+    """
+    _instance = None
+    _session: aiohttp.ClientSession = None
+    _trace_configs: List[aiohttp.TraceConfig] = []
+
+    # Connections on top of the concurrent downloads for the API requests that run meanwhile, e.g. the detail API.
+    API_CONNECTION_LIMIT = 50
+    DNS_CACHE_TTL = 300
+    KEEPALIVE_TIMEOUT = 30
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ClientManager, cls).__new__(cls)
+        return cls._instance
+
+    async def __aenter__(self) -> 'ClientManager':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    @property
+    def connection_limit(self) -> int:
+        return Config().download_max_concurrent + self.API_CONNECTION_LIMIT
+
+    @property
+    def connection_limit_per_host(self) -> int:
+        return Config().download_max_concurrent_per_host + self.API_CONNECTION_LIMIT
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Returns the shared session and creates it on first use. Must be called from within the running event loop.
+        :return: The shared :class:`aiohttp.ClientSession`.
+        """
+        if ClientManager._session is None or ClientManager._session.closed:
+            connector = aiohttp.TCPConnector(
+                # Derived from the download settings, so the pool never caps the concurrency they allow.
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.DNS_CACHE_TTL,
+                keepalive_timeout=self.KEEPALIVE_TIMEOUT
+            )
+            # Requests may queue for a pooled connection, so only the socket operations are bounded in time.
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+            ClientManager._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=timeout,
+                trace_configs=[CircuitBreaker().trace_config, RateLimiter().trace_config, Metrics().trace_config,
+                               DownloadScheduler.get_trace_config(), *self._trace_configs]
+            )
+        return ClientManager._session
+
+    def create_retry_client(self, attempts=4, max_timeout=16) -> aiohttp_retry.RetryClient:
+        """
+        Creates a retry client on top of the shared session.
+        :param attempts: How many times a request should be retried.
+        :param max_timeout: Maximum timeout in seconds.
+        :return: The created retry client.
+        """
+        return NetworkUtility.create_retry_client(self.session, attempts=attempts, max_timeout=max_timeout)
+
+    def add_trace_config(self, trace_config: aiohttp.TraceConfig) -> None:
+        """
+        Registers a trace config for sessions created from now on, e.g. to count opened connections.
+        :param trace_config: The trace config to add.
+        :return: None
+        """
+        self._trace_configs.append(trace_config)
+
+    async def close(self) -> None:
+        """
+        Closes the shared session and its pooled connections. A new session is created on the next access.
+        :return: None
+        """
+        if ClientManager._session is not None and not ClientManager._session.closed:
+            await ClientManager._session.close()
+        ClientManager._session = None
@@ -1,9 +1,11 @@
+import asyncio
 import json
 import logging
 import os
 
 from strategies.collection_deletion.collection_deletion_strategy import CollectionDeletionStrategy
-from utilities.network_utility import NetworkUtility
+from utilities.client_manager import ClientManager
+from utilities.config import Config
 
 
 class CollectionUtility:
@@ -12,11 +14,14 @@ class CollectionUtility:
     """
 
     @staticmethod
-    def delete_collection(collection_id: str = None, collection_ids: list = None) -> None:
+    async def delete_collection(collection_id: str = None, collection_ids: list = None,
+                                output_finalized: asyncio.Event = None) -> None:
         """
         Deletes the collection with the given collection_id or collection_ids.
+        All collections are deleted in a single request on the shared session.
         :param collection_id: The id of the collection to delete.
         :param collection_ids: A list of ids of the collections to delete.
+        :param output_finalized: Set once the downloaded images are stored, the request is only sent afterward.
         """
         if collection_id is not None and collection_ids is not None:
             raise ValueError("Only one of collection_id or collection_ids should be provided.")
@@ -28,7 +33,7 @@ class CollectionUtility:
         else:
             raise ValueError("Either collection_id or collection_ids must be provided.")
 
-        request_url = f"https://www.bing.com/mysaves/collections/delete?sid=0"
+        request_url = f"{Config().base_url}/mysaves/collections/delete?sid=0"
         header = {
             "Content-Type": "application/json",
             "cookie": os.getenv('COOKIE'),
@@ -37,25 +42,27 @@ class CollectionUtility:
         body = {
             "targetCollections": [{"collectionId": _id} for _id in collection_ids]
         }
-        response = NetworkUtility.create_session().post(
-            url=request_url,
-            headers=header,
-            data=json.dumps(body)
-        )
         collection_plural = 's' if len(collection_ids) > 1 else ''
-        if response.status_code == 200:
-            response_body = response.json()
-            is_success = response_body.get('isSuccess', False)
-            if is_success:
-                logging.info(f"Successfully deleted collection{collection_plural} with id{collection_plural}: "
-                             f"{', '.join(collection_ids)}")
+        if output_finalized is not None:
+            await output_finalized.wait()
+        async with ClientManager().create_retry_client(attempts=5).post(
+                url=request_url,
+                headers=header,
+                data=json.dumps(body)
+        ) as response:
+            if response.status == 200:
+                response_body = await response.json(content_type=None)
+                is_success = response_body.get('isSuccess', False)
+                if is_success:
+                    logging.info(f"Successfully deleted collection{collection_plural} with id{collection_plural}: "
+                                 f"{', '.join(collection_ids)}")
+                else:
+                    message = response_body.get('message', 'No message provided.')
+                    logging.error(f"Failed to delete collection{collection_plural} "
+                                  f"for Reason: {message}")
             else:
-                message = response_body.get('message', 'No message provided.')
                 logging.error(f"Failed to delete collection{collection_plural} "
-                              f"for Reason: {message}")
-        else:
-            logging.error(f"Failed to delete collection{collection_plural} "
-                          f"for Reason: {response.reason}: ")
+                              f"for Reason: {response.status}: {response.reason}")
 
     @staticmethod
     def get_collection_deletion_strategy(mode: str) -> CollectionDeletionStrategy or None:
@@ -51,6 +51,145 @@ class Config:
     def filename_pattern(self) -> str:
         return self._config['filename']['filename_pattern']
 
+    @property
+    def download(self) -> dict:
+        return self._config['download']
+
+    @property
+    def download_max_concurrent(self) -> int:
+        return self.download['max_concurrent_downloads']
+
+    @property
+    def download_max_concurrent_per_host(self) -> int:
+        return self.download['max_concurrent_downloads_per_host']
+
+    @property
+    def download_adaptive(self) -> bool:
+        return self.download['adaptive']
+
+    @property
+    def download_max_buffered_bytes(self) -> int:
+        return self.download['max_buffered_megabytes'] * 1024 * 1024
+
+    @property
+    def download_queue_size(self) -> int:
+        return self.download['queue_size']
+
+    @property
+    def download_deduplicate(self) -> bool:
+        return self.download['deduplicate']
+
+    @property
+    def cache(self) -> dict:
+        return self._config['cache']
+
+    @property
+    def metadata_cache_enabled(self) -> bool:
+        return self.cache['use_metadata_cache']
+
+    @property
+    def metadata_cache_ttl_seconds(self) -> int:
+        return self.cache['metadata_ttl_days'] * 24 * 60 * 60
+
+    @property
+    def metadata_cache_max_entries(self) -> int:
+        return self.cache['metadata_max_entries']
+
+    @property
+    def performance(self) -> dict:
+        return self._config['performance']
+
+    @property
+    def cpu_executor(self) -> str:
+        return self.performance['cpu_executor']
+
+    @property
+    def cpu_workers(self) -> int:
+        return self.performance['cpu_workers']
+
+    @property
+    def monitor_loop_lag(self) -> bool:
+        return self.performance['monitor_loop_lag']
+
+    @property
+    def output(self) -> dict:
+        return self._config['output']
+
+    @property
+    def output_sink(self) -> str:
+        return self.output['sink']
+
+    @property
+    def output_tar_to_stdout(self) -> bool:
+        return self.output['tar_to_stdout']
+
+    @property
+    def output_split_by_collection(self) -> bool:
+        return self.output['split_by_collection']
+
+    @property
+    def output_max_shard_bytes(self) -> int:
+        return self.output['max_shard_megabytes'] * 1024 * 1024
+
+    @property
+    def network(self) -> dict:
+        return self._config['network']
+
+    @property
+    def base_url(self) -> str:
+        return self.network['base_url'].rstrip('/')
+
+    @property
+    def no_retry_statuses(self) -> List[int]:
+        return self.network['no_retry_statuses']
+
+    @property
+    def max_retry_after_seconds(self) -> int:
+        return self.network['max_retry_after_seconds']
+
+    @property
+    def circuit_breaker_failure_threshold(self) -> int:
+        return self.network['circuit_breaker_failures']
+
+    @property
+    def circuit_breaker_cooldown_seconds(self) -> int:
+        return self.network['circuit_breaker_cooldown_seconds']
+
+    @property
+    def metrics(self) -> dict:
+        return self._config['metrics']
+
+    @property
+    def metrics_write_report(self) -> bool:
+        return self.metrics['write_report']
+
+    @property
+    def metrics_export_prometheus(self) -> bool:
+        return self.metrics['export_prometheus']
+
+    @property
+    def progress_log_interval_seconds(self) -> float:
+        return self._config['progress']['log_interval_seconds']
+
+    @property
+    def blob_cache_enabled(self) -> bool:
+        return self.cache['use_blob_cache']
+
+    @property
+    def blob_cache_max_bytes(self) -> int:
+        return self.cache['blob_max_megabytes'] * 1024 * 1024
+
+    def rate_limit(self, endpoint: str) -> dict:
+        """
+        Returns the rate limit of an endpoint.
+        :param endpoint: The endpoint, i.e. collections, detail, edit or cdn.
+        :return: Dictionary containing the per_second rate and the burst size.
+        """
+        return {
+            'per_second': self._config['rate_limit'][f"{endpoint}_per_second"],
+            'burst': self._config['rate_limit'][f"{endpoint}_burst"]
+        }
+
     def detail_max_attempts(self) -> int:
         """
         Returns the maximum number of attempts to get detailed information for an image.
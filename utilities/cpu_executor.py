@@ -0,0 +1,58 @@
+import asyncio
+import concurrent.futures
+import os
+from typing import Any, Callable
+
+from utilities.config import Config
+
+
+class CpuExecutor:
+    """
+    Singleton class that runs CPU bound work per image, like formatting file names and adding EXIF metadata,
+    in a thread or process pool, so it doesn't stall the network I/O on the event loop.
+    Functions run in a process pool have to be importable at module level, e.g. static methods of a class.
+    """
+    _instance = None
+    _executor: concurrent.futures.Executor | None = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(CpuExecutor, cls).__new__(cls)
+        return cls._instance
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Runs the function in the configured executor.
+        :param function: The function to run.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        executor = self.__get_executor()
+        if executor is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+
+    def shutdown(self) -> None:
+        """
+        Waits for the running work and stops the executor.
+        :return: None
+        """
+        if CpuExecutor._executor is not None:
+            CpuExecutor._executor.shutdown(wait=True, cancel_futures=True)
+            CpuExecutor._executor = None
+
+    @staticmethod
+    def __get_executor() -> concurrent.futures.Executor | None:
+        if CpuExecutor._executor is None:
+            max_workers = Config().cpu_workers or os.cpu_count()
+            match Config().cpu_executor:
+                case 'thread':
+                    CpuExecutor._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                                                  thread_name_prefix='CpuExecutor')
+                case 'process':
+                    CpuExecutor._executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+                case 'inline':
+                    return None
+                case _:
+                    raise Exception(f"Invalid cpu executor setting: {Config().cpu_executor}")
+        return CpuExecutor._executor
@@ -0,0 +1,39 @@
+import asyncio
+import concurrent.futures
+from typing import Any, Callable
+
+
+class DatabaseThread:
+    """
+    Runs the calls to a SQLite database on a dedicated thread, so the event loop doesn't wait for the disk.
+    A SQLite connection may only be used by the thread that created it, so all calls of a database run on the same
+    thread, one after another in the order they were made.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: The name of the thread, e.g. the class of the database.
+        """
+        self.__name = name
+        self.__executor: concurrent.futures.ThreadPoolExecutor | None = None
+
+    async def run(self, function: Callable[..., Any], *args) -> Any:
+        """
+        Runs the function on the thread of the database. It finishes even if the awaiting task is cancelled.
+        :param function: The function to run, which may use the connection of the database.
+        :param args: The arguments of the function.
+        :return: The result of the function.
+        """
+        if self.__executor is None:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.__name)
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, function, *args)
+
+    async def shutdown(self) -> None:
+        """
+        Waits for the queued calls and stops the thread. A new one is started by the next call.
+        :return: None
+        """
+        if self.__executor is not None:
+            executor = self.__executor
+            self.__executor = None
+            await asyncio.to_thread(executor.shutdown, wait=True)
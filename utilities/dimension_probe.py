@@ -0,0 +1,105 @@
+from io import BytesIO
+from typing import Tuple
+
+from PIL import Image as PIL_Image
+
+
+class DimensionProbe:
+    """
+    Reads the dimensions of JPEG, PNG and WebP images from the first bytes of the file without decoding it.
+    """
+    # Start of frame markers, excluding DHT (0xC4), JPG (0xC8) and DAC (0xCC) which share the range.
+    JPEG_START_OF_FRAME_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+    # Markers that stand alone without a length field.
+    JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+    PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+    @staticmethod
+    def get_size(data: bytes) -> Tuple[int, int]:
+        """
+        Returns the width and height of the image and falls back to PIL if the header couldn't be parsed.
+        :param data: The image or its first bytes.
+        :return: A tuple containing width and height.
+        """
+        size = DimensionProbe.probe(data)
+        if size is None:
+            with PIL_Image.open(BytesIO(data)) as pil_image:
+                size = pil_image.size
+        return size
+
+    @staticmethod
+    def probe(data: bytes) -> Tuple[int, int] | None:
+        """
+        Parses the width and height from the image header.
+        :param data: The image or its first bytes.
+        :return: A tuple containing width and height or None if the format is unknown or the header is incomplete.
+        """
+        if data[0:2] == b'\xff\xd8':
+            return DimensionProbe.probe_jpeg(data)
+        if data[0:8] == DimensionProbe.PNG_SIGNATURE:
+            return DimensionProbe.probe_png(data)
+        if data[0:4] == b'RIFF' and data[8:12] == b'WEBP':
+            return DimensionProbe.probe_webp(data)
+        return None
+
+    @staticmethod
+    def probe_jpeg(data: bytes) -> Tuple[int, int] | None:
+        """
+        Walks the JPEG segments until the start of frame segment, which contains the dimensions.
+        :param data: The JPEG or its first bytes.
+        :return: A tuple containing width and height or None if no start of frame segment was found.
+        """
+        position = 2
+        while position + 4 <= len(data):
+            if data[position] != 0xFF:
+                return None
+            marker = data[position + 1]
+            if marker == 0xFF:
+                # Fill bytes may precede a marker.
+                position += 1
+                continue
+            if marker in DimensionProbe.JPEG_STANDALONE_MARKERS:
+                position += 2
+                continue
+            if marker == 0xDA or marker == 0xD9:
+                return None
+            if marker in DimensionProbe.JPEG_START_OF_FRAME_MARKERS:
+                if position + 9 > len(data):
+                    return None
+                height = int.from_bytes(data[position + 5:position + 7], 'big')
+                width = int.from_bytes(data[position + 7:position + 9], 'big')
+                return width, height
+            position += 2 + int.from_bytes(data[position + 2:position + 4], 'big')
+        return None
+
+    @staticmethod
+    def probe_png(data: bytes) -> Tuple[int, int] | None:
+        """
+        Reads the dimensions from the IHDR chunk, which always directly follows the signature.
+        :param data: The PNG or its first bytes.
+        :return: A tuple containing width and height or None if the header is incomplete.
+        """
+        if len(data) < 24 or data[12:16] != b'IHDR':
+            return None
+        return int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big')
+
+    @staticmethod
+    def probe_webp(data: bytes) -> Tuple[int, int] | None:
+        """
+        Reads the dimensions from the first chunk of a lossy, lossless or extended WebP.
+        :param data: The WebP or its first bytes.
+        :return: A tuple containing width and height or None if the header is incomplete.
+        """
+        chunk_type = data[12:16]
+        if chunk_type == b'VP8 ' and len(data) >= 30 and data[23:26] == b'\x9d\x01\x2a':
+            width = int.from_bytes(data[26:28], 'little') & 0x3FFF
+            height = int.from_bytes(data[28:30], 'little') & 0x3FFF
+            return width, height
+        if chunk_type == b'VP8L' and len(data) >= 25 and data[20] == 0x2F:
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk_type == b'VP8X' and len(data) >= 30:
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return width, height
+        return None
@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import AsyncIterator, Deque, Dict, Tuple
+
+import aiohttp
+from yarl import URL
+
+
+class DownloadScheduler:
+    """
+    Limits how many downloads run at the same time, overall and per host.
+    In adaptive mode the overall limit is adjusted AIMD style: it is halved when the server throttles or times out
+    and raised by one after a full window of healthy responses, never exceeding the configured maximum.
+    The responses are fed in by the trace config of :meth:`get_trace_config` for every attempt, including the ones the
+    retry client repeats.
+    """
+    THROTTLE_STATUSES = {429, 503}
+    DECREASE_COOLDOWN = 1.0
+    # The key of the trace_request_ctx of a request that holds the scheduler its responses are recorded by.
+    TRACE_REQUEST_KEY = 'download_scheduler'
+    _trace_config: aiohttp.TraceConfig = None
+
+    def __init__(self, max_in_flight: int, max_per_host: int, adaptive: bool = False, min_in_flight: int = 1):
+        self.__max_in_flight = max(1, max_in_flight)
+        self.__max_per_host = max(1, max_per_host)
+        self.__min_in_flight = max(1, min(min_in_flight, self.__max_in_flight))
+        self.__adaptive = adaptive
+        self.__limit = self.__max_in_flight
+        self.__in_flight = 0
+        self.__host_in_flight: Dict[str, int] = defaultdict(int)
+        self.__waiters: Dict[str, Deque[Tuple[int, asyncio.Future]]] = defaultdict(deque)
+        self.__waiter_sequence = itertools.count()
+        self.__healthy_responses = 0
+        self.__last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return self.__limit
+
+    @staticmethod
+    def get_trace_config() -> aiohttp.TraceConfig:
+        """
+        Returns the trace config that feeds the responses of a session into the scheduler of each request.
+        Only requests that pass the scheduler in their trace_request_ctx, see :meth:`trace_request_ctx`, are recorded.
+        :return: The shared :class:`aiohttp.TraceConfig`.
+        """
+        if DownloadScheduler._trace_config is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_end.append(DownloadScheduler.__on_request_end)
+            trace_config.on_request_exception.append(DownloadScheduler.__on_request_exception)
+            DownloadScheduler._trace_config = trace_config
+        return DownloadScheduler._trace_config
+
+    def trace_request_ctx(self) -> dict:
+        """
+        Returns the trace_request_ctx that makes the trace config record the attempts of a request in this scheduler.
+        :return: Dictionary to pass as trace_request_ctx of the request.
+        """
+        return {self.TRACE_REQUEST_KEY: self}
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Waits until a download from the given url may start and holds the slot for the duration of the context.
+        :param url: The url that will be downloaded. Its host is used for the per-host limit.
+        """
+        host = URL(url).host or ''
+        if self.__waiters[host] or not self.__has_capacity(host):
+            entry = (next(self.__waiter_sequence), asyncio.get_running_loop().create_future())
+            self.__waiters[host].append(entry)
+            try:
+                await entry[1]
+            except asyncio.CancelledError:
+                if entry[1].done() and not entry[1].cancelled():
+                    # The slot was already handed over, so pass it on instead of losing it.
+                    self.__release(host)
+                else:
+                    self.__waiters[host].remove(entry)
+                raise
+        else:
+            self.__acquire(host)
+        try:
+            yield
+        finally:
+            self.__release(host)
+
+    def record_response(self, status: int) -> None:
+        """
+        Feeds the status of an attempt into the adaptive limit.
+        :param status: The HTTP status code of the response.
+        :return: None
+        """
+        if status in self.THROTTLE_STATUSES:
+            self.record_throttle()
+        elif 200 <= status < 400 and self.__adaptive:
+            self.__healthy_responses += 1
+            if self.__healthy_responses >= self.__limit and self.__limit < self.__max_in_flight:
+                self.__healthy_responses = 0
+                self.__limit += 1
+                self.__wake_waiters()
+
+    def record_throttle(self) -> None:
+        """
+        Halves the adaptive limit after a throttling response or a timeout.
+        Responses of downloads started before the last decrease are ignored for a short cooldown.
+        :return: None
+        """
+        if not self.__adaptive:
+            return
+        now = time.monotonic()
+        if now - self.__last_decrease < self.DECREASE_COOLDOWN:
+            return
+        self.__last_decrease = now
+        self.__healthy_responses = 0
+        new_limit = max(self.__min_in_flight, self.__limit // 2)
+        if new_limit != self.__limit:
+            logging.debug(f"Server is throttling, reducing concurrent downloads from {self.__limit} to {new_limit}.")
+            self.__limit = new_limit
+
+    @staticmethod
+    def __get_scheduler(context: SimpleNamespace) -> 'DownloadScheduler | None':
+        trace_request_ctx = getattr(context, 'trace_request_ctx', None)
+        if isinstance(trace_request_ctx, dict):
+            return trace_request_ctx.get(DownloadScheduler.TRACE_REQUEST_KEY)
+        return None
+
+    @staticmethod
+    async def __on_request_end(session: aiohttp.ClientSession, context: SimpleNamespace,
+                               params: aiohttp.TraceRequestEndParams) -> None:
+        if (scheduler := DownloadScheduler.__get_scheduler(context)) is not None:
+            scheduler.record_response(params.response.status)
+
+    @staticmethod
+    async def __on_request_exception(session: aiohttp.ClientSession, context: SimpleNamespace,
+                                     params: aiohttp.TraceRequestExceptionParams) -> None:
+        scheduler = DownloadScheduler.__get_scheduler(context)
+        if scheduler is not None and isinstance(params.exception, asyncio.TimeoutError):
+            scheduler.record_throttle()
+
+    def __has_capacity(self, host: str) -> bool:
+        return self.__in_flight < self.__limit and self.__host_in_flight[host] < self.__max_per_host
+
+    def __acquire(self, host: str) -> None:
+        self.__in_flight += 1
+        self.__host_in_flight[host] += 1
+
+    def __release(self, host: str) -> None:
+        self.__in_flight -= 1
+        self.__host_in_flight[host] -= 1
+        self.__wake_waiters()
+
+    def __wake_waiters(self) -> None:
+        """
+        Hands free slots to the oldest waiters whose host is below its limit.
+        :return: None
+        """
+        while self.__in_flight < self.__limit:
+            eligible_hosts = [host for host, waiters in self.__waiters.items()
+                              if waiters and self.__host_in_flight[host] < self.__max_per_host]
+            if not eligible_hosts:
+                return
+            host = min(eligible_hosts, key=lambda eligible_host: self.__waiters[eligible_host][0][0])
+            _, waiter = self.__waiters[host].popleft()
+            self.__acquire(host)
+            waiter.set_result(None)
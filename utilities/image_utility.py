@@ -2,13 +2,24 @@ import asyncio
 import json
 import logging
 import re
+import string
+from datetime import timezone
+from typing import Tuple
 from urllib.parse import unquote
 
 import aiohttp
+from dateutil import parser as dateutil_parser
 import piexif
 import unicodedata
 
-from utilities.network_utility import NetworkUtility
+from utilities.blob_cache import BlobReader
+from utilities.circuit_breaker import CircuitOpenError
+from utilities.client_manager import ClientManager
+from utilities.config import Config
+from utilities.dimension_probe import DimensionProbe
+from utilities.metadata_cache import MetadataCache
+from utilities.metrics import Metrics
+from utilities.request_coalescer import RequestCoalescer
 from strategies.image_source.image_source_strategy import ImageSourceStrategy
 from models.image import Image
 
@@ -17,6 +28,21 @@ class ImageUtility:
     """
     Contains functions that don't need a class instance.
     """
+    JPEG_START_OF_IMAGE = b'\xff\xd8'
+    JPEG_START_OF_SCAN = b'\xff\xda'
+    IMAGE_PAGE_URL_PATTERN = r"(?P<image_set_id>(?<=\/)(?:\d\-)?[a-f0-9]{32})(?:\?id=)(?P<image_id>(?<=\?id=)[^&]+)"
+
+    @staticmethod
+    def get_image_identity(image: Image) -> str:
+        """
+        Returns a key that is the same for every appearance of an image, e.g. in different collections.
+        :param image: The :class:`Image` to identify.
+        :return: The image set and image id of the page url or the first image url if the page url has no ids.
+        """
+        result = re.search(ImageUtility.IMAGE_PAGE_URL_PATTERN, image.page_url or '')
+        if result:
+            return f"{result.group('image_set_id')}/{unquote(result.group('image_id'))}"
+        return image.image_urls[0]
 
     @staticmethod
     async def extract_set_and_image_id(url: str) -> dict:
@@ -25,8 +51,7 @@ class ImageUtility:
         :param url: The image page url i.e. https://www.bing.com/images/create/$prompt/$imageSetId?id=$imageId.
         :return: A dictionary containing the image_set_id and image_id.
         """
-        pattern = r"(?P<image_set_id>(?<=\/)(?:\d\-)?[a-f0-9]{32})(?:\?id=)(?P<image_id>(?<=\?id=)[^&]+)"
-        result = re.search(pattern, url)
+        result = re.search(ImageUtility.IMAGE_PAGE_URL_PATTERN, url)
         image_set_id = result.group('image_set_id')
         image_id = result.group('image_id')
         id_dict = {'image_set_id': image_set_id, 'image_id': image_id}
@@ -50,55 +75,182 @@ class ImageUtility:
             raise Exception(f"Invalid image source setting: {setting}")
 
     @staticmethod
-    async def add_exif_metadata(image: Image) -> None:
+    def get_user_comment(image: Image) -> dict:
         """
-        Adds the prompt, image url and creation date to the image as EXIF metadata in JSON format.
+        Returns the metadata that is added to the image as EXIF user comment.
         :param image: :class:`BingCreatorImage` object containing the properties to save.
-        :return: None
-        """
-        with open(image.file_name, 'rb') as f:
-            exif_dict = piexif.load(f.read())
-            user_comment = {
-                'prompt': image.prompt,
-                'image_url': image.used_image_url,
-                'creation_date': image.creation_date
-            }
-            user_comment_utf_8 = json.dumps(user_comment, ensure_ascii=False).encode("utf-8")
-            exif_dict['Exif'][piexif.ExifIFD.UserComment] = user_comment_utf_8
-            user_comment_utf_16le = json.dumps(user_comment, ensure_ascii=False).encode('utf-16le')
-            exif_dict['0th'][piexif.ImageIFD.XPComment] = user_comment_utf_16le
-            exif_bytes = piexif.dump(exif_dict)
-            piexif.insert(exif_bytes, image.file_name)
+        :return: Dictionary containing the prompt, image url and creation date.
+        """
+        return {
+            'prompt': image.prompt,
+            'image_url': image.used_image_url,
+            'creation_date': image.creation_date
+        }
+
+    @staticmethod
+    def process_image_head(image_bytes: bytes, user_comment: dict) -> Tuple[int, bytes]:
+        """
+        Reads the width of the image and adds the user comment as EXIF metadata in JSON format.
+        Both only need the header segments, so the start of a JPEG is enough as long as it reaches the scan data.
+        Meant to be run in the :class:`CpuExecutor`.
+        :param image_bytes: The downloaded JPEG or its first bytes.
+        :param user_comment: Dictionary that is saved as JSON in the EXIF metadata.
+        :return: A tuple containing the width and the given bytes including the EXIF metadata.
+        """
+        width, _ = DimensionProbe.get_size(image_bytes)
+        return width, ImageUtility.insert_exif_metadata(image_bytes, user_comment)
+
+    @staticmethod
+    def format_file_name(prompt: str, creation_date: str, index: str, filename_pattern: str,
+                         use_local_time_zone: bool) -> str:
+        """
+        Formats the file name of an image, without extension, using the pattern from the config.
+        Meant to be run in the :class:`CpuExecutor`.
+        :param prompt: The prompt of the image.
+        :param creation_date: The creation date in UTC, formatted as %Y-%m-%dT%H%MZ.
+        :param index: The index of the image.
+        :param filename_pattern: The template of the file name.
+        :param use_local_time_zone: Whether to convert the creation date to the local time zone.
+        :return: The formatted file name.
+        """
+        if use_local_time_zone:
+            creation_date = (dateutil_parser.parse(creation_date)
+                             .astimezone()
+                             .strftime('%Y-%m-%dT%H%M%z'))
+        file_name_substitute_dict = {
+            'date': creation_date,
+            'index': index,
+            'prompt': ImageUtility.slugify(prompt)[:50],
+            'sep': '_'
+        }
+        template = string.Template(filename_pattern)
+
+        return template.safe_substitute(file_name_substitute_dict)
+
+    @staticmethod
+    def format_creation_date(date_string: str) -> str:
+        """
+        Converts a date from the APIs to UTC, formatted as %Y-%m-%dT%H%MZ.
+        Meant to be run in the :class:`CpuExecutor`.
+        :param date_string: The date in any format dateutil understands.
+        :return: The formatted date.
+        """
+        return dateutil_parser.parse(date_string).astimezone(timezone.utc).strftime('%Y-%m-%dT%H%MZ')
 
     @staticmethod
-    async def get_detail_image(image_set_id: str, image_id: str, semaphore: asyncio.Semaphore) -> dict | None:
+    def insert_exif_metadata(image_bytes: bytes, user_comment: dict) -> bytes:
         """
-        Fetches the detailed information for an image from the detail API.
+        Splices an EXIF segment containing the user comment into the JPEG header in a single pass.
+        Existing EXIF tags are kept. Like :func:`piexif.insert`, a leading JFIF segment is replaced by the EXIF segment.
+        :param image_bytes: The JPEG or its first bytes up to at least the start of the scan data.
+        :param user_comment: Dictionary that is saved as JSON in the UserComment and XPComment tags.
+        :return: The given bytes including the EXIF segment.
+        """
+        if image_bytes[0:2] != ImageUtility.JPEG_START_OF_IMAGE:
+            raise ValueError("The image is not a JPEG.")
+        header_segments = []
+        exif_dict = None
+        position = 2
+        while image_bytes[position:position + 2] != ImageUtility.JPEG_START_OF_SCAN:
+            if position + 4 > len(image_bytes):
+                raise ValueError("The JPEG header is incomplete.")
+            segment_end = position + 2 + int.from_bytes(image_bytes[position + 2:position + 4], 'big')
+            is_exif = image_bytes[position:position + 2] == b'\xff\xe1' and \
+                image_bytes[position + 4:position + 10] == b'Exif\x00\x00'
+            if is_exif and exif_dict is None:
+                exif_dict = piexif.load(image_bytes[position + 4:segment_end])
+            elif not (position == 2 and image_bytes[position:position + 2] == b'\xff\xe0'):
+                header_segments.append(image_bytes[position:segment_end])
+            position = segment_end
+
+        if exif_dict is None:
+            exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}, 'Interop': {}, '1st': {}, 'thumbnail': None}
+        user_comment_utf_8 = json.dumps(user_comment, ensure_ascii=False).encode("utf-8")
+        exif_dict['Exif'][piexif.ExifIFD.UserComment] = user_comment_utf_8
+        user_comment_utf_16le = json.dumps(user_comment, ensure_ascii=False).encode('utf-16le')
+        exif_dict['0th'][piexif.ImageIFD.XPComment] = user_comment_utf_16le
+        exif_bytes = piexif.dump(exif_dict)
+        exif_segment = b'\xff\xe1' + (len(exif_bytes) + 2).to_bytes(2, 'big') + exif_bytes
+
+        return b''.join([
+            ImageUtility.JPEG_START_OF_IMAGE,
+            exif_segment,
+            *header_segments,
+            memoryview(image_bytes)[position:]
+        ])
+
+    @staticmethod
+    async def read_image_head(content: aiohttp.StreamReader | BlobReader, size: int, max_size: int) -> bytes:
+        """
+        Reads the first bytes of an image body without consuming the rest of it.
+        Reading continues past the given size until the start of the JPEG scan data, so all header segments are included.
+        :param content: The body of the response or the cached image to read from.
+        :param size: The number of bytes to read at least.
+        :param max_size: The number of bytes to read at most while looking for the scan data.
+        :return: The first bytes of the body.
+        """
+        head = bytearray()
+        while len(head) < size or (ImageUtility.JPEG_START_OF_SCAN not in head and len(head) < max_size):
+            chunk = await content.read(size)
+            if not chunk:
+                break
+            head += chunk
+        return bytes(head)
+
+    @staticmethod
+    async def get_detail_image(
+            image_set_id: str,
+            image_id: str,
+            coalescer: RequestCoalescer) -> dict | None:
+        """
+        Fetches the detailed information for an image from the metadata cache or the detail API.
+        The API returns all images of the set, so images of the same set share a single request.
         :param image_set_id: Supplied image set id to use in URL.
         :param image_id: Supplied image id to use in URL.
-        :param semaphore: Semaphore to limit concurrency.
+        :param coalescer: Shares the request between all images of the set.
         :return: Dictionary containing relevant data or None if the request failed.
         """
-        request_url = f"https://www.bing.com/images/create/detail/async/{image_set_id}/?imageId={image_id}"
+        detail_image = await MetadataCache().get(image_set_id, image_id)
+        if detail_image is not None:
+            return detail_image
+        images = await coalescer.run(
+            image_set_id,
+            lambda: ImageUtility.__get_detail_image_set(image_set_id, image_id)
+        )
+        if images is not None:
+            decoded_image_id = unquote(image_id)
+            detail_image_list = [img for img in images if img['imageId'] == decoded_image_id]
+            detail_image = images[0] if len(detail_image_list) == 0 else detail_image_list[0]
+            return detail_image
+
+    @staticmethod
+    async def __get_detail_image_set(image_set_id: str, image_id: str) -> list | None:
+        """
+        Fetches the detailed information for all images of a set from the detail API.
+        :param image_set_id: Supplied image set id to use in URL.
+        :param image_id: Supplied image id to use in URL.
+        :return: List containing the data of each image or None if the request failed.
+        """
+        request_url = f"{Config().base_url}/images/create/detail/async/{image_set_id}/?imageId={image_id}"
 
-        async with semaphore:
-            async with aiohttp.ClientSession() as session:
-                retry_client = NetworkUtility.create_retry_client(session, attempts=8, max_timeout=128)
+        retry_client = ClientManager().create_retry_client(attempts=8, max_timeout=128)
+        try:
+            with Metrics().timer('detail_api_seconds'):
                 async with retry_client.get(request_url) as response:
                     if response.status == 200:
                         data = await response.json()
-                        if 'value' in data and data['value'] is not None:
-                            images = data['value']
-                            decoded_image_id = unquote(image_id)
-                            detail_image_list = [img for img in images if img['imageId'] == decoded_image_id]
-                            detail_image = images[0] if len(detail_image_list) == 0 else detail_image_list[0]
-                            return detail_image
+                        if 'value' in data and data['value'] is not None and len(data['value']) > 0:
+                            await MetadataCache().put(image_set_id, data['value'])
+                            return data['value']
                     else:
                         logging.error(f"Failed to get detailed information for image: {image_set_id}/{image_id} "
                                       f"for Reason: {response.status}: {response.reason}.")
+        except CircuitOpenError as e:
+            logging.error(f"Failed to get detailed information for image: {image_set_id}/{image_id}: {e}")
+        Metrics().increment('detail_api_failures_total')
 
     @staticmethod
-    async def slugify(text: str) -> str:
+    def slugify(text: str) -> str:
         """
         Convert spaces or repeated dashes to single dashes. Remove characters that aren't alphanumerics,
         underscores, or hyphens. Convert to lowercase. Also strip leading and
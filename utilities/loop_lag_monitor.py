@@ -0,0 +1,85 @@
+import asyncio
+import heapq
+import logging
+from typing import List, Tuple
+
+
+class LoopLagMonitor:
+    """
+    Measures how long the event loop is blocked by checking how late a task that sleeps for a fixed interval wakes up.
+    The worst stalls are kept, so they can be reported at the end of the run.
+    """
+
+    def __init__(self, interval: float = 0.01, worst_stall_count: int = 5):
+        self.__interval = interval
+        self.__worst_stall_count = worst_stall_count
+        self.__worst_stalls: List[Tuple[float, float]] = []
+        self.__sample_count = 0
+        self.__total_lag = 0.0
+        self.__task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> 'LoopLagMonitor':
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
+
+    def start(self) -> None:
+        """
+        Starts measuring on the running event loop.
+        :return: None
+        """
+        self.__task = asyncio.create_task(self.__measure())
+
+    async def stop(self) -> None:
+        """
+        Stops measuring.
+        :return: None
+        """
+        if self.__task is None:
+            return
+        self.__task.cancel()
+        try:
+            await self.__task
+        except asyncio.CancelledError:
+            pass
+        self.__task = None
+
+    def statistics(self) -> dict:
+        """
+        Returns the mean and maximum lag and the worst stalls in milliseconds.
+        :return: Dictionary containing the mean_ms, max_ms and the worst_stalls as tuples of the seconds since the
+            start and the lag.
+        """
+        worst_stalls = sorted(self.__worst_stalls, reverse=True)
+        return {
+            'mean_ms': self.__total_lag / self.__sample_count * 1000 if self.__sample_count else 0.0,
+            'max_ms': worst_stalls[0][0] * 1000 if worst_stalls else 0.0,
+            'worst_stalls': [(round(at, 2), round(lag * 1000, 1)) for lag, at in worst_stalls]
+        }
+
+    def log_statistics(self) -> None:
+        """
+        Logs the mean and maximum lag and the worst stalls.
+        :return: None
+        """
+        statistics = self.statistics()
+        worst_stalls = ', '.join(f"{lag_ms} ms at {at}s" for at, lag_ms in statistics['worst_stalls'])
+        logging.info(f"Event loop lag: mean {statistics['mean_ms']:.1f} ms, max {statistics['max_ms']:.1f} ms. "
+                     f"Worst stalls: {worst_stalls or 'none'}.")
+
+    async def __measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            expected = loop.time() + self.__interval
+            await asyncio.sleep(self.__interval)
+            lag = max(0.0, loop.time() - expected)
+            self.__sample_count += 1
+            self.__total_lag += lag
+            stall = (lag, expected - start)
+            if len(self.__worst_stalls) < self.__worst_stall_count:
+                heapq.heappush(self.__worst_stalls, stall)
+            else:
+                heapq.heappushpop(self.__worst_stalls, stall)
@@ -0,0 +1,154 @@
+import logging
+import sqlite3
+import time
+from urllib.parse import unquote
+
+from utilities.config import Config
+from utilities.database_thread import DatabaseThread
+from utilities.path_utility import PathUtility
+
+
+class MetadataCache:
+    """
+    Singleton class for the persistent cache of the detail API, stored in SQLite in the user data directory.
+    Entries expire after the configured time to live and the oldest entries are evicted above the configured size.
+    The database is used on its own thread and new entries are committed in batches, so the event loop never waits for
+    the disk. Entries that weren't committed when the program is killed are fetched again by the next run.
+    """
+    _instance = None
+    _connection: sqlite3.Connection = None
+    _database_thread = DatabaseThread('MetadataCache')
+
+    FILENAME = 'metadata_cache.sqlite3'
+    # The number of image sets that are stored before they are committed.
+    COMMIT_INTERVAL = 100
+    # Maps the cached columns to the keys used by the detail API.
+    COLUMNS = {
+        'content_url': 'contentUrl',
+        'thumbnail_url': 'thumbnailUrl',
+        'date_published': 'datePublished',
+        'image_alt_text': 'imageAltText',
+        'host_page_url': 'hostPageUrl'
+    }
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(MetadataCache, cls).__new__(cls)
+            cls._instance.hits = 0
+            cls._instance.misses = 0
+            cls._instance.__uncommitted = 0
+        return cls._instance
+
+    @property
+    def enabled(self) -> bool:
+        return Config().metadata_cache_enabled
+
+    async def get(self, image_set_id: str, image_id: str) -> dict | None:
+        """
+        Returns the cached detail API data of an image if it hasn't expired.
+        :param image_set_id: The id of the image set.
+        :param image_id: The id of the image.
+        :return: Dictionary with the same keys as the detail API or None if there is no valid entry.
+        """
+        if not self.enabled:
+            return None
+        min_fetched_at = time.time() - Config().metadata_cache_ttl_seconds
+        row = await self._database_thread.run(self.__select, image_set_id, unquote(image_id), min_fetched_at)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        detail_image = {api_key: value for api_key, value in zip(self.COLUMNS.values(), row)}
+        detail_image['imageId'] = unquote(image_id)
+
+        return detail_image
+
+    async def put(self, image_set_id: str, detail_images: list) -> None:
+        """
+        Stores the detail API data of all images of a set. It's committed with the next batch.
+        :param image_set_id: The id of the image set.
+        :param detail_images: The images as returned by the detail API.
+        :return: None
+        """
+        if not self.enabled:
+            return
+        rows = [
+            (image_set_id, detail_image['imageId'], *(detail_image.get(key) for key in self.COLUMNS.values()),
+             time.time())
+            for detail_image in detail_images
+            if 'imageId' in detail_image
+        ]
+        self.__uncommitted += 1
+        commit = self.__uncommitted >= self.COMMIT_INTERVAL
+        if commit:
+            self.__uncommitted = 0
+        await self._database_thread.run(self.__insert, rows, commit)
+
+    async def close(self) -> None:
+        """
+        Commits the pending entries, evicts expired entries and the oldest entries above the size limit, then closes
+        the database.
+        :return: None
+        """
+        await self._database_thread.run(self.__close)
+        await self._database_thread.shutdown()
+        self.hits = 0
+        self.misses = 0
+        self.__uncommitted = 0
+
+    def statistics(self) -> dict:
+        """
+        Returns the cache hits and misses since the cache was opened.
+        :return: Dictionary containing the hits and misses.
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def __select(self, image_set_id: str, image_id: str, min_fetched_at: float) -> tuple | None:
+        return self.__connect().execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM detail_image "
+            f"WHERE image_set_id = ? AND image_id = ? AND fetched_at >= ?",
+            (image_set_id, image_id, min_fetched_at)
+        ).fetchone()
+
+    def __insert(self, rows: list, commit: bool) -> None:
+        connection = self.__connect()
+        connection.executemany(
+            f"INSERT OR REPLACE INTO detail_image (image_set_id, image_id, {', '.join(self.COLUMNS)}, fetched_at) "
+            f"VALUES ({', '.join('?' * (len(self.COLUMNS) + 3))})",
+            rows
+        )
+        if commit:
+            connection.commit()
+
+    def __close(self) -> None:
+        if MetadataCache._connection is None:
+            return
+        connection = MetadataCache._connection
+        try:
+            connection.commit()
+            connection.execute("DELETE FROM detail_image WHERE fetched_at < ?",
+                               (time.time() - Config().metadata_cache_ttl_seconds,))
+            connection.execute(
+                "DELETE FROM detail_image WHERE rowid IN "
+                "(SELECT rowid FROM detail_image ORDER BY fetched_at DESC LIMIT -1 OFFSET ?)",
+                (Config().metadata_cache_max_entries,)
+            )
+            connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to evict entries from the metadata cache: {e}")
+        finally:
+            connection.close()
+            MetadataCache._connection = None
+
+    def __connect(self) -> sqlite3.Connection:
+        if MetadataCache._connection is None:
+            connection = sqlite3.connect(PathUtility.user_data_dir() / self.FILENAME)
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS detail_image ("
+                f"image_set_id TEXT NOT NULL, image_id TEXT NOT NULL, "
+                f"{', '.join(f'{column} TEXT' for column in self.COLUMNS)}, fetched_at REAL NOT NULL, "
+                f"PRIMARY KEY (image_set_id, image_id))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS detail_image_fetched_at ON detail_image (fetched_at)")
+            MetadataCache._connection = connection
+        return MetadataCache._connection
@@ -0,0 +1,263 @@
+import bisect
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Iterator, Tuple
+
+import aiohttp
+
+
+class Histogram:
+    """
+    Counts observations in cumulative buckets, like a Prometheus histogram, and keeps their sum, minimum and maximum.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        """
+        Adds an observation to the first bucket it fits into.
+        :param value: The observed value.
+        :return: None
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def cumulative_counts(self) -> Iterator[Tuple[float, int]]:
+        """
+        Returns the number of observations less than or equal to each bucket bound, ending with infinity.
+        :return: Iterator of the bucket bounds and their cumulative counts.
+        """
+        cumulative_count = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative_count += bucket_count
+            yield bound, cumulative_count
+        yield math.inf, self.count
+
+    def quantile(self, quantile: float) -> float | None:
+        """
+        Estimates a quantile as the upper bound of the bucket it falls into, clamped to the observed maximum.
+        :param quantile: The quantile between 0 and 1.
+        :return: The estimated value or None if nothing was observed.
+        """
+        if self.count == 0:
+            return None
+        rank = quantile * self.count
+        for bound, cumulative_count in self.cumulative_counts():
+            if cumulative_count >= rank:
+                return round(min(bound, self.max), 6)
+        return round(self.max, 6)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'min': round(self.min, 6) if self.count else None,
+            'max': round(self.max, 6) if self.count else None,
+            'mean': round(self.sum / self.count, 6) if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in self.cumulative_counts()}
+        }
+
+
+class Metrics:
+    """
+    Singleton registry of the counters and histograms of a run, e.g. request latencies, downloaded bytes and retries.
+    It's safe to use from other threads, like the archive writer, and is exported as JSON and optionally in the
+    Prometheus text format at the end of every run.
+    Metrics are identified by their name and optional labels, e.g. ``increment('http_requests_total', host=host)``.
+    """
+    _instance = None
+
+    SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+    DESCRIPTIONS = {
+        'http_requests_total': "HTTP requests sent, including retries.",
+        'http_retries_total': "HTTP requests that were retries of a failed request.",
+        'http_responses_total': "HTTP responses by status code.",
+        'collections_api_seconds': "Duration of a collection API request, including retries.",
+        'detail_api_seconds': "Duration of a detail API request, including retries.",
+        'detail_api_failures_total': "Detail API requests that returned no data.",
+        'detail_retry_images_total': "Images whose detail data was requested again after a failed attempt.",
+        'download_response_seconds': "Time until the headers of an image response arrived, including retries.",
+        'image_seconds': "Duration of downloading and archiving an image.",
+        'image_bytes_total': "Bytes of the archived images by source.",
+        'images_total': "Images by result.",
+        'exif_seconds': "Duration of probing the dimensions and adding the EXIF metadata of an image.",
+        'archive_write_seconds': "Duration of writing an entry to the archive on the writer thread.",
+        'archive_bytes_total': "Bytes written to the archive.",
+        'archive_outputs_finalized_total': "Archives or folders that were finalized, e.g. the shard of a collection.",
+        'circuit_breaker_opened_total': "Times requests to a host were paused after too many failures in a row.",
+        'circuit_breaker_rejections_total': "Requests that failed immediately, because their host was paused.",
+        'rate_limit_wait_seconds': "Time a request waited for a token of its endpoint's rate limit."
+    }
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Metrics, cls).__new__(cls)
+            cls._instance.__lock = threading.Lock()
+            cls._instance.__counters = {}
+            cls._instance.__histograms = {}
+            cls._instance.__trace_config = None
+        return cls._instance
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increases a counter.
+        :param name: The name of the counter.
+        :param value: The amount to add.
+        :param labels: The labels of the counter.
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SECONDS_BUCKETS, **labels) -> None:
+        """
+        Adds an observation to a histogram.
+        :param name: The name of the histogram.
+        :param value: The observed value.
+        :param buckets: The upper bounds of the buckets, only used when the histogram is created.
+        :param labels: The labels of the histogram.
+        :return: None
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """
+        Observes the duration of the enclosed block in seconds, also if it raises.
+        :param name: The name of the histogram.
+        :param labels: The labels of the histogram.
+        :return: Context manager measuring the block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @property
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Returns a trace config that counts the requests, retries and response statuses of a session.
+        :return: The :class:`aiohttp.TraceConfig`.
+        """
+        if self.__trace_config is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self.__on_request_start)
+            trace_config.on_request_end.append(self.__on_request_end)
+            self.__trace_config = trace_config
+        return self.__trace_config
+
+    def reset(self) -> None:
+        """
+        Removes all metrics, so a new run starts from zero.
+        :return: None
+        """
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def to_dict(self) -> dict:
+        """
+        Returns the current values of all metrics.
+        :return: Dictionary containing the counters and histograms by their name including the labels.
+        """
+        with self.__lock:
+            return {
+                'counters': {Metrics.__format_key(key): value for key, value in sorted(self.__counters.items())},
+                'histograms': {Metrics.__format_key(key): histogram.to_dict()
+                               for key, histogram in sorted(self.__histograms.items())}
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Returns the current values of all metrics in the Prometheus text format, e.g. for the node exporter's
+        textfile collector.
+        :return: The metrics, prefixed with ``bing_image_downloader_``.
+        """
+        lines = []
+        with self.__lock:
+            metric_types = [(key, 'counter', value) for key, value in self.__counters.items()]
+            metric_types += [(key, 'histogram', histogram) for key, histogram in self.__histograms.items()]
+            described_names = set()
+            for (name, labels), metric_type, value in sorted(metric_types, key=lambda metric: metric[0]):
+                full_name = f"bing_image_downloader_{name}"
+                if name not in described_names:
+                    described_names.add(name)
+                    if name in self.DESCRIPTIONS:
+                        lines.append(f"# HELP {full_name} {self.DESCRIPTIONS[name]}")
+                    lines.append(f"# TYPE {full_name} {metric_type}")
+                if metric_type == 'counter':
+                    lines.append(f"{Metrics.__format_key((full_name, labels))} {value}")
+                    continue
+                for bound, cumulative_count in value.cumulative_counts():
+                    bound_label = ('le', '+Inf' if bound == math.inf else str(bound))
+                    lines.append(f"{Metrics.__format_key((f'{full_name}_bucket', labels + (bound_label,)))} "
+                                 f"{cumulative_count}")
+                lines.append(f"{Metrics.__format_key((f'{full_name}_sum', labels))} {value.sum}")
+                lines.append(f"{Metrics.__format_key((f'{full_name}_count', labels))} {value.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, base_filename: str, run: dict, export_prometheus: bool = False, **sections) -> None:
+        """
+        Writes the metrics to ``<base_filename>_metrics.json`` and optionally ``<base_filename>_metrics.prom``.
+        :param base_filename: The path of the files without the suffix, e.g. the archive without its extension.
+        :param run: Summary of the run, like the elapsed time and the number of images.
+        :param export_prometheus: Whether to write the Prometheus text file as well.
+        :param sections: Additional statistics to include in the JSON report, e.g. those of the caches.
+        :return: None
+        """
+        report = {'run': run, **self.to_dict(), **sections}
+        json_filename = f"{base_filename}_metrics.json"
+        with open(json_filename, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Metrics written to {json_filename}.")
+        if export_prometheus:
+            prometheus_filename = f"{base_filename}_metrics.prom"
+            with open(prometheus_filename, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            logging.info(f"Prometheus metrics written to {prometheus_filename}.")
+
+    @staticmethod
+    def __format_key(key: Tuple[str, tuple]) -> str:
+        name, labels = key
+        if not labels:
+            return name
+        formatted_labels = ','.join(f'{label}="{value}"' for label, value in labels)
+        return f"{name}{{{formatted_labels}}}"
+
+    async def __on_request_start(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                 params: aiohttp.TraceRequestStartParams) -> None:
+        self.increment('http_requests_total', host=params.url.host)
+        # The retry client passes the number of the attempt along with each request.
+        trace_request_ctx = context.trace_request_ctx or {}
+        if trace_request_ctx.get('current_attempt', 1) > 1:
+            self.increment('http_retries_total', host=params.url.host)
+
+    async def __on_request_end(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                               params: aiohttp.TraceRequestEndParams) -> None:
+        self.increment('http_responses_total', host=params.url.host, status=params.response.status)
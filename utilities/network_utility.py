@@ -1,10 +1,9 @@
 import aiohttp
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-
 import aiohttp_retry
-from aiohttp_retry import ExponentialRetry, RetryClient
+from aiohttp_retry import RetryClient
+
+from utilities.config import Config
+from utilities.retry_policy import RetryPolicy
 
 
 class NetworkUtility:
@@ -12,30 +11,23 @@ class NetworkUtility:
     Different request related functions.
     """
 
-    @staticmethod
-    def create_session() -> requests.Session:
-        """
-        Create a new request.Session with retry.
-        :return: A new request.Session with retry.
-        """
-        session = requests.session()
-        statuses = {x for x in range(100, 600) if x != 200}
-        retries = Retry(total=5, backoff_factor=1, status_forcelist=statuses)
-        session.mount('https://', HTTPAdapter(max_retries=retries))
-
-        return session
-
     @staticmethod
     def create_retry_client(session: aiohttp.ClientSession, attempts=4, max_timeout=16) -> aiohttp_retry.RetryClient:
         """
         Creates a retry client used for making requests to the different APIs.
+        Only transient failures are retried, see :class:`RetryPolicy`.
         :param session: Session to use in the retry client.
         :param attempts: How many times a request should be retried.
         :param max_timeout: Maximum timeout in seconds.
         :return: The created retry client.
         """
-        statuses = {x for x in range(100, 600) if x != 200}
-        retry_options = ExponentialRetry(attempts=attempts, start_timeout=1, max_timeout=max_timeout, statuses=statuses)
+        retry_options = RetryPolicy(
+            attempts=attempts,
+            start_timeout=1,
+            max_timeout=max_timeout,
+            no_retry_statuses=Config().no_retry_statuses,
+            max_retry_after=Config().max_retry_after_seconds
+        )
         retry_client = RetryClient(client_session=session, retry_options=retry_options)
 
         return retry_client
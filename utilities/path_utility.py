@@ -0,0 +1,28 @@
+import os
+import platform
+from pathlib import Path
+
+
+class PathUtility:
+    """
+    Contains functions related to paths on the different platforms.
+    """
+    APP_NAME = 'BingImageDownloader'
+
+    @staticmethod
+    def user_data_dir() -> Path:
+        """
+        Returns the directory for persistent application data of the current user and creates it if necessary.
+        :return: The platform specific user data directory.
+        """
+        match platform.system():
+            case 'Windows':
+                base_dir = Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local'))
+            case 'Darwin':
+                base_dir = Path.home() / 'Library' / 'Application Support'
+            case _:
+                base_dir = Path(os.environ.get('XDG_DATA_HOME', Path.home() / '.local' / 'share'))
+        data_dir = base_dir / PathUtility.APP_NAME
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        return data_dir
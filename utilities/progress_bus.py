@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    """
+    The progress of a run at one point in time, as it's handed to the subscribers of the :class:`ProgressBus`.
+    """
+    # Images whose metadata was fetched, i.e. that can be downloaded.
+    images_found: int
+    # Images the image source announced up front, if it knows them before fetching their metadata.
+    images_expected: int
+    is_gathering_finished: bool
+    images_done: int
+    images_failed: int
+    # Images that were already archived by an earlier run. They are included in images_done.
+    images_restored: int
+    bytes_downloaded: int
+    elapsed_seconds: float
+    images_per_second: float
+    # The estimated seconds until all images are finished or None while the total isn't known yet.
+    eta_seconds: float | None
+
+    @property
+    def images_total(self) -> int:
+        if self.is_gathering_finished:
+            return self.images_found
+        return max(self.images_found, self.images_expected)
+
+    @property
+    def images_finished(self) -> int:
+        return self.images_done + self.images_failed
+
+    @property
+    def percent(self) -> int:
+        """
+        Returns the finished share of the images. It stays below 100 while more images may still be found.
+        :return: The percentage from 0 to 100.
+        """
+        if self.images_total == 0:
+            return 100 if self.is_gathering_finished else 0
+        percent = math.floor(self.images_finished * 100 / self.images_total)
+        return percent if self.is_gathering_finished else min(percent, 99)
+
+    def describe(self) -> str:
+        """
+        Returns the progress as a line for the log.
+        :return: The description, e.g. "120 of 1000 images (12%), 3 failed, 25.3 MB downloaded, ...".
+        """
+        total = str(self.images_total) if self.is_gathering_finished or self.images_expected else \
+            f"{self.images_total}+"
+        description = (f"{self.images_finished} of {total} images ({self.percent}%), {self.images_failed} failed, "
+                       f"{self.bytes_downloaded / 1024 / 1024:.1f} MB downloaded, "
+                       f"{self.images_per_second:.1f} images/s")
+        if self.eta_seconds is not None:
+            description += f", about {ProgressSnapshot.format_duration(self.eta_seconds)} left"
+        return description
+
+    @staticmethod
+    def format_duration(seconds: float) -> str:
+        """
+        Formats a duration for humans.
+        :param seconds: The duration in seconds.
+        :return: The duration, e.g. 1h 02m, 3m 05s or 42s.
+        """
+        seconds = math.ceil(seconds)
+        hours, remainder = divmod(seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        if hours:
+            return f"{hours}h {minutes:02d}m"
+        if minutes:
+            return f"{minutes}m {seconds:02d}s"
+        return f"{seconds}s"
+
+
+class ProgressSubscription:
+    """
+    A subscriber of the :class:`ProgressBus`. Events arriving faster than the interval are coalesced, so the subscriber
+    receives at most one snapshot per interval and always the latest one.
+    """
+
+    def __init__(self, progress_bus: 'ProgressBus', callback: Callable[[ProgressSnapshot], None], interval: float):
+        self.callback = callback
+        self.interval = interval
+        self.__progress_bus = progress_bus
+        self.__last_delivery = -math.inf
+        self.__timer: asyncio.TimerHandle | None = None
+
+    def notify(self) -> None:
+        """
+        Delivers the current snapshot right away or schedules it for the end of the interval.
+        :return: None
+        """
+        if self.__timer is not None:
+            return
+        wait = self.__last_delivery + self.interval - time.monotonic()
+        if wait <= 0:
+            self.deliver()
+            return
+        try:
+            self.__timer = asyncio.get_running_loop().call_later(wait, self.deliver)
+        except RuntimeError:
+            # Published outside of the event loop, so there is nothing to schedule the delivery on.
+            self.deliver()
+
+    def deliver(self) -> None:
+        """
+        Hands the current snapshot to the callback, cancelling a scheduled delivery.
+        :return: None
+        """
+        self.cancel()
+        self.__last_delivery = time.monotonic()
+        try:
+            self.callback(self.__progress_bus.snapshot())
+        except Exception as e:
+            logging.error(f"Failed to deliver the progress: {e}")
+
+    def cancel(self) -> None:
+        """
+        Cancels a scheduled delivery.
+        :return: None
+        """
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+
+class ProgressBus:
+    """
+    Singleton class that collects the progress events of a run, e.g. fetched metadata, downloaded bytes and finished
+    images, and hands snapshots of the progress to its subscribers, like the progress bar of the GUI or the log of the
+    CLI. Each subscriber sets how often it wants to be updated, so thousands of events don't flood it.
+    Events are published and delivered on the event loop.
+    """
+    _instance = None
+
+    IMAGES_EXPECTED = 'images_expected'
+    METADATA_FETCHED = 'metadata_fetched'
+    GATHERING_FINISHED = 'gathering_finished'
+    IMAGE_DONE = 'image_done'
+    IMAGE_FAILED = 'image_failed'
+    IMAGE_RESTORED = 'image_restored'
+    BYTES_DOWNLOADED = 'bytes_downloaded'
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ProgressBus, cls).__new__(cls)
+            cls._instance.__counts = Counter()
+            cls._instance.__subscriptions = []
+            cls._instance.__start = time.monotonic()
+        return cls._instance
+
+    def subscribe(self, callback: Callable[[ProgressSnapshot], None], interval: float) -> ProgressSubscription:
+        """
+        Registers a callback that receives the progress.
+        :param callback: Called with a :class:`ProgressSnapshot`.
+        :param interval: The minimum seconds between two calls.
+        :return: The :class:`ProgressSubscription`, which is needed to unsubscribe.
+        """
+        subscription = ProgressSubscription(self, callback, interval)
+        self.__subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription) -> None:
+        """
+        Removes a subscriber.
+        :param subscription: The subscription returned by :meth:`subscribe`.
+        :return: None
+        """
+        subscription.cancel()
+        if subscription in self.__subscriptions:
+            self.__subscriptions.remove(subscription)
+
+    def publish(self, event: str, value: int = 1) -> None:
+        """
+        Records an event and notifies the subscribers.
+        :param event: One of the event constants, e.g. :attr:`IMAGE_DONE`.
+        :param value: The amount, e.g. the number of bytes of :attr:`BYTES_DOWNLOADED`.
+        :return: None
+        """
+        self.__counts[event] += value
+        for subscription in self.__subscriptions:
+            subscription.notify()
+
+    def flush(self) -> None:
+        """
+        Delivers the current snapshot to all subscribers right away, e.g. at the end of a run.
+        :return: None
+        """
+        for subscription in list(self.__subscriptions):
+            subscription.deliver()
+
+    def reset(self) -> None:
+        """
+        Clears the progress, so a new run starts from zero. The subscribers are kept.
+        :return: None
+        """
+        for subscription in self.__subscriptions:
+            subscription.cancel()
+        self.__counts.clear()
+        self.__start = time.monotonic()
+
+    def snapshot(self) -> ProgressSnapshot:
+        """
+        Returns the current progress. The rate only counts the images that were finished by this run.
+        :return: The :class:`ProgressSnapshot`.
+        """
+        elapsed = time.monotonic() - self.__start
+        counts = self.__counts
+        images_finished = counts[self.IMAGE_DONE] + counts[self.IMAGE_FAILED]
+        images_per_second = images_finished / elapsed if elapsed > 0 else 0.0
+        is_gathering_finished = counts[self.GATHERING_FINISHED] > 0
+        images_total = counts[self.METADATA_FETCHED] if is_gathering_finished else max(counts[self.METADATA_FETCHED],
+                                                                                       counts[self.IMAGES_EXPECTED])
+        images_remaining = images_total - images_finished - counts[self.IMAGE_RESTORED]
+        eta_seconds = None
+        if (is_gathering_finished or counts[self.IMAGES_EXPECTED]) and images_per_second > 0:
+            eta_seconds = max(0.0, images_remaining / images_per_second)
+
+        return ProgressSnapshot(
+            images_found=counts[self.METADATA_FETCHED],
+            images_expected=counts[self.IMAGES_EXPECTED],
+            is_gathering_finished=is_gathering_finished,
+            images_done=counts[self.IMAGE_DONE] + counts[self.IMAGE_RESTORED],
+            images_failed=counts[self.IMAGE_FAILED],
+            images_restored=counts[self.IMAGE_RESTORED],
+            bytes_downloaded=counts[self.BYTES_DOWNLOADED],
+            elapsed_seconds=elapsed,
+            images_per_second=images_per_second,
+            eta_seconds=eta_seconds
+        )
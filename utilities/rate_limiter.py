@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from types import SimpleNamespace
+from typing import Dict
+
+import aiohttp
+
+from utilities.config import Config
+from utilities.metrics import Metrics
+
+
+class TokenBucket:
+    """
+    Lets requests through at a steady rate. Tokens refill continuously up to the burst size, so a short burst is
+    sent at once after an idle phase. Waiting requests are served in the order they arrived.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        :param rate: The tokens added per second. 0 disables the limit.
+        :param burst: The maximum number of tokens that can be saved up.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.__tokens = float(self.burst)
+        self.__updated = time.monotonic()
+        self.__lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Takes a token and waits for it if none is left.
+        :return: The seconds waited.
+        """
+        if self.rate <= 0:
+            return 0.0
+        async with self.__lock:
+            self.__refill()
+            wait = 0.0
+            if self.__tokens < 1:
+                wait = (1 - self.__tokens) / self.rate
+                await asyncio.sleep(wait)
+                self.__refill()
+            self.__tokens -= 1
+            return wait
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+        self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+
+class RateLimiter:
+    """
+    Singleton class that limits the request rate to each Bing endpoint with a token bucket, as Bing throttles by the
+    number of requests per time and not by the number of open requests. It's applied to every request of the shared
+    session, including retries, and records the time spent waiting for tokens.
+    The limits are configured per endpoint in the config file.
+    """
+    _instance = None
+
+    ENDPOINTS = ('collections', 'detail', 'edit', 'cdn')
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(RateLimiter, cls).__new__(cls)
+            cls._instance.__buckets = {}
+            cls._instance.__waits = {}
+            cls._instance.__trace_config = None
+        return cls._instance
+
+    @property
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """
+        Returns a trace config that delays the requests of a session until their endpoint has a token.
+        :return: The :class:`aiohttp.TraceConfig`.
+        """
+        if self.__trace_config is None:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self.__on_request_start)
+            self.__trace_config = trace_config
+        return self.__trace_config
+
+    @staticmethod
+    def get_endpoint(path: str) -> str:
+        """
+        Returns the endpoint a request belongs to.
+        :param path: The path of the request URL.
+        :return: One of :attr:`ENDPOINTS`. Everything that isn't an API is an image of the CDN.
+        """
+        if path.startswith('/mysaves/collections/get'):
+            return 'collections'
+        if path.startswith('/mysaves/collections/'):
+            return 'edit'
+        if path.startswith('/images/create/detail/'):
+            return 'detail'
+        return 'cdn'
+
+    async def acquire(self, endpoint: str) -> None:
+        """
+        Waits until a request to the endpoint may be sent.
+        :param endpoint: One of :attr:`ENDPOINTS`.
+        :return: None
+        """
+        bucket = self.__buckets.get(endpoint)
+        if bucket is None:
+            limit = Config().rate_limit(endpoint)
+            bucket = self.__buckets[endpoint] = TokenBucket(limit['per_second'], limit['burst'])
+        wait = await bucket.acquire()
+        Metrics().observe('rate_limit_wait_seconds', wait, endpoint=endpoint)
+        total_wait, count = self.__waits.get(endpoint, (0.0, 0))
+        self.__waits[endpoint] = (total_wait + wait, count + 1)
+
+    def statistics(self) -> Dict[str, dict]:
+        """
+        Returns the time spent waiting for tokens per endpoint since the last reset.
+        :return: Dictionary containing the wait_seconds and requests by endpoint.
+        """
+        return {endpoint: {'wait_seconds': round(total_wait, 3), 'requests': count}
+                for endpoint, (total_wait, count) in self.__waits.items()}
+
+    def log_statistics(self) -> None:
+        """
+        Logs the time spent waiting for tokens per endpoint.
+        :return: None
+        """
+        statistics = self.statistics()
+        if statistics:
+            waits = ', '.join(f"{endpoint} {values['wait_seconds']:.1f} s for {values['requests']} requests"
+                              for endpoint, values in statistics.items())
+            logging.info(f"Waited for the rate limit: {waits}.")
+
+    def reset(self) -> None:
+        """
+        Recreates the token buckets from the config and clears the waits, so a new run starts from zero.
+        :return: None
+        """
+        self.__buckets.clear()
+        self.__waits.clear()
+
+    async def __on_request_start(self, session: aiohttp.ClientSession, context: SimpleNamespace,
+                                 params: aiohttp.TraceRequestStartParams) -> None:
+        await self.acquire(RateLimiter.get_endpoint(params.url.path))
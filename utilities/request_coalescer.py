@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class RequestCoalescer:
+    """
+    Shares one in-flight request per key between all callers.
+    Successful results are kept, so later callers with the same key get them without a new request.
+    Failed requests, i.e. ones that raise or return None, are forgotten, so they can be retried.
+    """
+
+    def __init__(self):
+        self.__tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Returns the result of the request for the key and only starts the request if none is running or finished.
+        :param key: Identifies requests that return the same result.
+        :param request: Function creating the awaitable for the request.
+        :return: The result of the shared request.
+        """
+        task = self.__tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(request())
+            self.__tasks[key] = task
+            task.add_done_callback(lambda done_task: self.__forget_failure(key, done_task))
+        # Shielded, so a cancelled caller doesn't cancel the request for everybody else.
+        return await asyncio.shield(task)
+
+    def __forget_failure(self, key: Hashable, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            if self.__tasks.get(key) is task:
+                del self.__tasks[key]
@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterable
+
+import aiohttp
+from aiohttp_retry import RetryOptionsBase
+
+
+class RetryPolicy(RetryOptionsBase):
+    """
+    Retry options that only retry transient failures, like throttling, server errors and dropped connections.
+    Statuses that can't change by asking again, e.g. 404 Not Found, are returned immediately.
+    The waits grow exponentially with full jitter, so failed requests don't retry in lockstep, and a Retry-After header
+    on 429 and 503 responses is honored instead.
+    """
+    RETRY_AFTER_STATUSES = (429, 503)
+
+    def __init__(
+            self,
+            attempts: int = 4,
+            start_timeout: float = 1,
+            max_timeout: float = 16,
+            no_retry_statuses: Iterable[int] = (401, 404, 410),
+            max_retry_after: float = 120):
+        """
+        :param attempts: How many times a request is sent at most.
+        :param start_timeout: The longest wait in seconds before the first retry.
+        :param max_timeout: The longest wait in seconds between two attempts without a Retry-After header.
+        :param no_retry_statuses: Statuses that are permanent and never retried.
+        :param max_retry_after: The longest wait in seconds a Retry-After header is honored for.
+        """
+        no_retry_statuses = set(no_retry_statuses)
+        # Only errors are retried, e.g. 304 Not Modified means that the cached copy is still valid.
+        statuses = {status for status in range(400, 600) if status not in no_retry_statuses}
+        super().__init__(
+            attempts=attempts,
+            statuses=statuses,
+            exceptions={aiohttp.ClientConnectionError},
+            retry_all_server_errors=False
+        )
+        self.__start_timeout = start_timeout
+        self.__max_timeout = max_timeout
+        self.__max_retry_after = max_retry_after
+
+    def get_timeout(self, attempt: int, response: aiohttp.ClientResponse | None = None) -> float:
+        """
+        Returns the wait before the next attempt.
+        :param attempt: The number of the attempt that failed, starting at 1.
+        :param response: The failed response or None if the request raised.
+        :return: The wait in seconds.
+        """
+        if response is not None and response.status in self.RETRY_AFTER_STATUSES:
+            retry_after = RetryPolicy.parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.__max_retry_after)
+        return random.uniform(0, min(self.__max_timeout, self.__start_timeout * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def parse_retry_after(value: str | None) -> float | None:
+        """
+        Parses a Retry-After header, which is either a number of seconds or an HTTP date.
+        :param value: The value of the header or None.
+        :return: The wait in seconds or None if the header is missing or invalid.
+        """
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            retry_date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import Callable, Coroutine
+
+
+class RunControl:
+    """
+    Lets a run be paused, resumed and cancelled cooperatively, e.g. from the GUI or a Ctrl+C handler.
+    Pausing and cancelling don't interrupt running downloads. They stop new images from being started, so the running
+    ones finish and everything downloaded is written to the output, which is finalized as usual.
+    The methods can be called from any thread.
+    """
+
+    def __init__(self):
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        # Set while the run may continue, i.e. it isn't paused or it was cancelled, which wakes up the paused tasks.
+        self.__running = asyncio.Event()
+        self.__running.set()
+        self.__cancelled = asyncio.Event()
+
+    @property
+    def is_paused(self) -> bool:
+        return not self.__running.is_set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Binds the control to the event loop of the run, so other threads can change its state.
+        :param loop: The running event loop.
+        :return: None
+        """
+        self.__loop = loop
+
+    def pause(self) -> None:
+        """
+        Pauses the run once the running downloads are finished.
+        :return: None
+        """
+        self.__call(self.__pause)
+
+    def resume(self) -> None:
+        """
+        Continues a paused run.
+        :return: None
+        """
+        self.__call(self.__running.set)
+
+    def cancel(self) -> None:
+        """
+        Stops the run once the running downloads are finished. Images that weren't started are left for a resumed run.
+        :return: None
+        """
+        self.__call(self.__cancel)
+
+    async def proceed(self) -> bool:
+        """
+        Waits while the run is paused.
+        :return: Whether the run may continue or was cancelled.
+        """
+        await self.__running.wait()
+        return not self.__cancelled.is_set()
+
+    async def run_until_cancelled(self, coroutine: Coroutine) -> bool:
+        """
+        Runs the coroutine and cancels it as soon as the run is cancelled.
+        :param coroutine: The coroutine to run, e.g. gathering the images.
+        :return: Whether the coroutine finished or was cancelled.
+        """
+        task = asyncio.create_task(coroutine)
+        cancelled = asyncio.create_task(self.__cancelled.wait())
+        try:
+            await asyncio.wait((task, cancelled), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            cancelled.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if task.cancelled():
+            return False
+        task.result()
+        return True
+
+    def __call(self, callback: Callable[[], None]) -> None:
+        if self.__loop is None or self.__loop.is_closed():
+            callback()
+        else:
+            self.__loop.call_soon_threadsafe(callback)
+
+    def __pause(self) -> None:
+        if not self.__cancelled.is_set():
+            self.__running.clear()
+            logging.info("Pausing after the running downloads.")
+
+    def __cancel(self) -> None:
+        if not self.__cancelled.is_set():
+            logging.warning("Cancelling after the running downloads. "
+                            "Images that weren't downloaded yet can be fetched by resuming the run.")
+        self.__cancelled.set()
+        self.__running.set()
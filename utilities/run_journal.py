@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+from typing import IO, Dict, List
+
+from models.image import Image
+
+
+class RunJournal:
+    """
+    Crash-safe journal of a run, written next to the output. Every finished image is appended as a JSON line, so a
+    resumed run knows which images are already in the output and only fetches the rest.
+    The lines are written and synced to disk in groups, at most every :attr:`SYNC_INTERVAL` seconds or once
+    :attr:`SYNC_RECORDS` lines are pending, so the downloads don't wait for the disk one image at a time. A crash loses
+    at most the last group, whose images are downloaded again by the resumed run.
+    A failure to write the journal is logged and the run continues, as the images are in the output anyway.
+    """
+    SUFFIX = '.journal'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    SYNC_INTERVAL = 1.0
+    SYNC_RECORDS = 256
+
+    def __init__(self, base_filename: str):
+        """
+        :param base_filename: The path of the output without extension, which the journal shares.
+        """
+        self.base_filename = base_filename
+        self.journal_filename = f"{base_filename}{self.SUFFIX}"
+        self.__lock = threading.Lock()
+        self.__file: IO[str] | None = None
+        self.__pending_lines: List[str] = []
+        self.__flush_lock = asyncio.Lock()
+        self.__flush_task: asyncio.Task | None = None
+        # Set after a failed write, which may have cut off the last line, so the next one starts on a new line.
+        self.__is_line_open = False
+
+    @staticmethod
+    def find_latest(destination_folder: str) -> 'RunJournal | None':
+        """
+        Finds the journal of the most recent run in the destination folder.
+        :param destination_folder: The folder the outputs are saved to.
+        :return: The latest :class:`RunJournal` or None if there is none.
+        """
+        journal_filenames = glob.glob(os.path.join(glob.escape(destination_folder), f"bing_images_*{RunJournal.SUFFIX}"))
+        if not journal_filenames:
+            return None
+        latest_journal_filename = max(journal_filenames, key=os.path.getmtime)
+        return RunJournal(os.path.splitext(latest_journal_filename)[0])
+
+    @staticmethod
+    def key(image: Image) -> str:
+        """
+        Returns the key that identifies the image across runs.
+        :param image: The :class:`Image` to identify.
+        :return: The key consisting of the collection and the page url.
+        """
+        return f"{image.collection_id or image.collection_name}/{image.page_url}"
+
+    def reset(self) -> None:
+        """
+        Starts a new, empty journal.
+        :return: None
+        """
+        with open(self.journal_filename, 'w', encoding='utf-8'):
+            pass
+
+    def completed_entries(self) -> Dict[str, dict]:
+        """
+        Reads the journal and returns the entries of all successfully archived images.
+        A line that was cut off by a crash is ignored.
+        :return: Dictionary mapping the image key to its journal entry.
+        """
+        entries = {}
+        if not os.path.exists(self.journal_filename):
+            return entries
+        with open(self.journal_filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping incomplete line in journal {self.journal_filename}.")
+                    continue
+                if entry['status'] == self.STATUS_SUCCESS:
+                    entries[entry['key']] = entry
+                else:
+                    entries.pop(entry['key'], None)
+        return entries
+
+    async def record(self, image: Image, arcname: str | None) -> None:
+        """
+        Appends the result of an image to the journal. It is synced to disk with the next group of lines.
+        Only waits for the disk when :attr:`SYNC_RECORDS` lines are pending.
+        :param image: The finished :class:`Image`.
+        :param arcname: Path of the image or its link inside the archive or None if it wasn't archived.
+        :return: None
+        """
+        entry = {
+            'key': RunJournal.key(image),
+            'index': image.index,
+            'page_url': image.page_url,
+            'used_image_url': image.used_image_url,
+            'file_name': image.file_name,
+            'arcname': arcname,
+            'link_target': image.link_target,
+            'is_thumbnail': image.is_thumbnail,
+            'status': self.STATUS_SUCCESS if image.is_success else self.STATUS_FAILED,
+            'status_code': image.status_code,
+            'reason': image.reason
+        }
+        self.__pending_lines.append(json.dumps(entry, ensure_ascii=False))
+        if len(self.__pending_lines) >= self.SYNC_RECORDS:
+            await self.flush()
+        elif self.__flush_task is None:
+            self.__flush_task = asyncio.create_task(self.__flush_later())
+
+    async def flush(self) -> None:
+        """
+        Writes the pending lines and syncs them to disk. If that fails, the error is logged and the lines are dropped.
+        :return: None
+        """
+        async with self.__flush_lock:
+            if not self.__pending_lines:
+                return
+            lines = self.__pending_lines
+            self.__pending_lines = []
+            try:
+                await asyncio.to_thread(self.__append, lines)
+            except OSError as e:
+                logging.error(f"Failed to write {len(lines)} images to the journal {self.journal_filename}, "
+                              f"a resumed run downloads them again: {e}")
+
+    async def close(self) -> None:
+        """
+        Writes and syncs the pending lines, then closes the journal. It's reopened if further images are recorded.
+        :return: None
+        """
+        if self.__flush_task is not None:
+            self.__flush_task.cancel()
+            self.__flush_task = None
+        await self.flush()
+        try:
+            await asyncio.to_thread(self.__close_file)
+        except OSError as e:
+            logging.error(f"Failed to close the journal {self.journal_filename}: {e}")
+
+    async def __flush_later(self) -> None:
+        await asyncio.sleep(self.SYNC_INTERVAL)
+        # Lines recorded from now on schedule the next flush.
+        self.__flush_task = None
+        await self.flush()
+
+    def __append(self, lines: List[str]) -> None:
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.journal_filename, 'a', encoding='utf-8')
+            data = ''.join(f"{line}\n" for line in lines)
+            if self.__is_line_open:
+                data = f"\n{data}"
+            try:
+                self.__file.write(data)
+                self.__file.flush()
+                os.fsync(self.__file.fileno())
+            except OSError:
+                # The buffered rest of the lines is dropped with the file, which is reopened by the next write.
+                self.__is_line_open = True
+                file = self.__file
+                self.__file = None
+                with contextlib.suppress(OSError):
+                    file.close()
+                raise
+            self.__is_line_open = False
+
+    def __close_file(self) -> None:
+        with self.__lock:
+            if self.__file is not None:
+                file = self.__file
+                self.__file = None
+                file.close()
@@ -6,8 +6,10 @@ from models.image import Image
 
 
 class Statistics:
-    def __init__(self, images: List[Image]):
+    def __init__(self, images: List[Image], metadata_cache_statistics: dict = None, blob_cache_statistics: dict = None):
         self.__images = images
+        self.__metadata_cache_statistics = metadata_cache_statistics
+        self.__blob_cache_statistics = blob_cache_statistics
 
     def create_statistics(self) -> str:
         """
@@ -23,11 +25,27 @@ class Statistics:
                 image.is_success,
                 image.reason,
                 image.attempts,
+                image.detail_attempts,
                 image.is_thumbnail
             ])
         table_str = tabulate(
             data,
-            headers=["Index", "Prompt", "Page URL", "Success", "Reason", "Attempts", "Thumbnail"],
+            headers=["Index", "Prompt", "Page URL", "Success", "Reason", "Attempts", "Detail Attempts", "Thumbnail"],
             tablefmt='pipe'
         )
+        if self.__metadata_cache_statistics is not None:
+            cache_table_str = tabulate(
+                [[self.__metadata_cache_statistics['hits'], self.__metadata_cache_statistics['misses']]],
+                headers=["Metadata Cache Hits", "Metadata Cache Misses"],
+                tablefmt='pipe'
+            )
+            table_str = f"{table_str}\n\n{cache_table_str}"
+        if self.__blob_cache_statistics is not None:
+            blob_cache_table_str = tabulate(
+                [[self.__blob_cache_statistics['hits'], self.__blob_cache_statistics['misses'],
+                  f"{self.__blob_cache_statistics['bytes_saved'] / 1024 / 1024:.1f}"]],
+                headers=["Image Cache Hits", "Image Cache Misses", "Megabytes Not Downloaded"],
+                tablefmt='pipe'
+            )
+            table_str = f"{table_str}\n\n{blob_cache_table_str}"
         return table_str